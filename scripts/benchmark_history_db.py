@@ -0,0 +1,190 @@
+"""
+历史数据库查询基准测试脚本
+在合成的大数据库（默认 100 万条记录）上测量历史窗口各查询的耗时和查询计划，
+并与引入复合覆盖索引之前的单列索引对比
+
+使用方法：
+    python scripts/benchmark_history_db.py --rows 1000000
+"""
+
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.database import Database
+
+# 引入复合覆盖索引之前的索引
+LEGACY_INDEXES = {
+    'idx_trigger_time': 'capture_history(trigger_time)',
+    'idx_trigger_type': 'capture_history(trigger_type)'
+}
+
+# 当前的列表索引
+LIST_INDEXES = {
+    'idx_list_time': 'capture_history(trigger_time, id, trigger_type, notification_sent, notification_method)',
+    'idx_list_type_time': 'capture_history(trigger_type, trigger_time, id, notification_sent, notification_method)',
+    'idx_list_sent_time': 'capture_history(notification_sent, trigger_time, id, trigger_type, notification_method)'
+}
+
+
+def populate(db: Database, rows: int, batch_size: int = 50000):
+    """写入合成记录：约每 5 分钟一次触发，唤醒最多，约 10% 通知失败"""
+    conn = db._connect()
+    start = datetime.now() - timedelta(minutes=5 * rows)
+    methods = ['base64', 'base64', 'base64', 'url', 'text']
+
+    print(f"正在生成 {rows} 条记录...")
+    began = time.perf_counter()
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for i in range(offset, min(rows, offset + batch_size)):
+            trigger_time = start + timedelta(minutes=5 * i, seconds=random.randint(0, 240))
+            sent = random.random() > 0.1
+            batch.append((
+                random.choices(['boot', 'wake', 'manual'], weights=[2, 7, 1])[0],
+                trigger_time.isoformat(),
+                Database.to_epoch_ms(trigger_time),
+                f"data/captures/camera/{i}.jpg",
+                f"data/captures/screen/{i}.jpg",
+                1 if sent else 0,
+                random.choice(methods) if sent else 'failed',
+                trigger_time.isoformat()
+            ))
+        with conn:
+            conn.executemany('''
+                INSERT INTO capture_history
+                (trigger_type, trigger_time, trigger_ts, camera_path, screenshot_path,
+                 notification_sent, notification_method, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+    print(f"生成完成，耗时 {time.perf_counter() - began:.1f} 秒")
+
+
+def use_indexes(conn: sqlite3.Connection, legacy: bool):
+    """切换为单列索引（legacy）或复合覆盖索引"""
+    drop, create = (LIST_INDEXES, LEGACY_INDEXES) if legacy else (LEGACY_INDEXES, LIST_INDEXES)
+    with conn:
+        for name in drop:
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+        for name, target in create.items():
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+        conn.execute('ANALYZE capture_history')
+
+
+def measure(db: Database, query, repeat: int):
+    """
+    执行查询并记录耗时和实际执行的 SQL
+
+    Returns:
+        (耗时中位数 ms, 最后一条 SQL 的查询计划)
+    """
+    conn = db._connect()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    query()
+    conn.set_trace_callback(None)
+
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        query()
+        timings.append((time.perf_counter() - began) * 1000)
+
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+    plan = []
+    if selects:
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {selects[-1]}')]
+    return statistics.median(timings), plan
+
+
+def build_queries(db: Database):
+    """历史窗口的典型查询"""
+    # 深翻页游标：翻到约 90% 深度的位置
+    conn = db._connect()
+    total = conn.execute('SELECT COUNT(*) FROM capture_history').fetchone()[0]
+    deep = conn.execute('''
+        SELECT trigger_time, id FROM capture_history ORDER BY trigger_time DESC, id DESC LIMIT 1 OFFSET ?
+    ''', (int(total * 0.9),)).fetchone()
+    deep_cursor = db._encode_cursor('next', {'trigger_time': deep[0], 'id': deep[1]})
+    month = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    return [
+        ("列表第一页", lambda: db.get_records_page(limit=100)),
+        ("列表深翻页 (90%)", lambda: db.get_records_page(limit=100, cursor=deep_cursor)),
+        ("类型筛选第一页", lambda: db.get_records_page(limit=100, trigger_type='manual')),
+        ("类型筛选深翻页", lambda: db.get_records_page(limit=100, cursor=deep_cursor, trigger_type='manual')),
+        ("通知失败筛选", lambda: db.get_records_page(limit=100, notification_sent=False)),
+        ("类型+通知失败筛选", lambda: db.get_records_page(limit=100, trigger_type='boot', notification_sent=False)),
+        ("按类型查询 (旧接口)", lambda: db.get_records_by_type('manual', limit=100)),
+        ("最近 30 天", lambda: db.get_records_by_date(month, today)),
+        ("统计信息", lambda: db.get_statistics()),
+    ]
+
+
+def run(db: Database, repeat: int, title: str) -> dict:
+    """执行全部查询并打印结果"""
+    print(f"\n{title}")
+    print("-" * 78)
+    results = {}
+    for name, query in build_queries(db):
+        elapsed, plan = measure(db, query, repeat)
+        results[name] = elapsed
+        print(f"{name:<20}{elapsed:>10.2f} ms")
+        for line in plan:
+            print(f"{'':<6}{line}")
+    return results
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='历史数据库查询基准测试')
+    parser.add_argument('--rows', type=int, default=1000000, help='合成记录数')
+    parser.add_argument('--repeat', type=int, default=20, help='每个查询的重复次数')
+    parser.add_argument('--db', type=Path, help='数据库路径，默认使用临时文件')
+    parser.add_argument('--no-legacy', action='store_true', help='不测量单列索引的对比结果')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = args.db or Path(temp_dir) / 'benchmark.db'
+        db = Database(db_path)
+
+        existing = db._connect().execute('SELECT COUNT(*) FROM capture_history').fetchone()[0]
+        if existing < args.rows:
+            populate(db, args.rows - existing)
+
+        conn = db._connect()
+        size_mb = db_path.stat().st_size / 1024 / 1024
+        print(f"数据库: {db_path} ({size_mb:.1f}MB, {max(existing, args.rows)} 条记录)")
+
+        legacy = {}
+        if not args.no_legacy:
+            use_indexes(conn, legacy=True)
+            legacy = run(db, args.repeat, "单列索引 (idx_trigger_time, idx_trigger_type)")
+            use_indexes(conn, legacy=False)
+
+        current = run(db, args.repeat, "复合覆盖索引")
+
+        if legacy:
+            print(f"\n{'查询':<20}{'单列索引':>12}{'复合索引':>12}{'加速':>10}")
+            print("-" * 54)
+            for name, elapsed in current.items():
+                speedup = legacy[name] / elapsed if elapsed > 0 else 0
+                print(f"{name:<20}{legacy[name]:>10.2f}ms{elapsed:>10.2f}ms{speedup:>9.1f}x")
+
+        db.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
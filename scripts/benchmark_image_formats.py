@@ -0,0 +1,113 @@
+"""
+图片格式画质基准测试脚本
+比较 JPEG / WebP / AVIF 在相同目标大小下的画质（SSIM）和每 KB 画质
+"""
+
+import sys
+import time
+import argparse
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.image_helper import ImageHelper
+
+
+def _box_filter(arr: np.ndarray, window: int) -> np.ndarray:
+    """使用积分图计算 window x window 窗口的均值"""
+    integral = np.pad(arr, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    total = (integral[window:, window:] - integral[:-window, window:]
+             - integral[window:, :-window] + integral[:-window, :-window])
+    return total / (window * window)
+
+
+def compute_ssim(reference: Image.Image, candidate: Image.Image, window: int = 8) -> float:
+    """
+    计算两张图片的平均 SSIM（灰度，均匀窗口）
+
+    Args:
+        reference: 参考图片（原图）
+        candidate: 待评估图片，尺寸不一致时会放大到参考图尺寸
+
+    Returns:
+        SSIM 值（0-1，越大越接近原图）
+    """
+    if candidate.size != reference.size:
+        candidate = candidate.resize(reference.size, Image.Resampling.BICUBIC)
+
+    x = np.asarray(reference.convert('L'), dtype=np.float64)
+    y = np.asarray(candidate.convert('L'), dtype=np.float64)
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+
+    mu_x = _box_filter(x, window)
+    mu_y = _box_filter(y, window)
+    sigma_x = _box_filter(x * x, window) - mu_x ** 2
+    sigma_y = _box_filter(y * y, window) - mu_y ** 2
+    sigma_xy = _box_filter(x * y, window) - mu_x * mu_y
+
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * sigma_xy + c2)) / \
+               ((mu_x ** 2 + mu_y ** 2 + c1) * (sigma_x + sigma_y + c2))
+    return float(ssim_map.mean())
+
+
+def benchmark(image_path: Path, sizes_kb: list, formats: list):
+    """对单张图片执行基准测试并打印结果"""
+    reference = Image.open(image_path).convert('RGB')
+    print(f"\n图片: {image_path.name} ({reference.width}x{reference.height}, "
+          f"{ImageHelper.get_image_size_kb(image_path):.1f}KB)")
+    print("-" * 72)
+    print(f"{'格式':<8}{'目标KB':>8}{'实际字节':>10}{'SSIM':>10}{'SSIM/KB':>10}{'耗时ms':>10}")
+    print("-" * 72)
+
+    for size_kb in sizes_kb:
+        for image_format in formats:
+            start = time.perf_counter()
+            data = ImageHelper.encode_to_size(image_path, max_size_kb=size_kb, image_format=image_format)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if data is None:
+                print(f"{image_format:<8}{size_kb:>8}{'失败':>10}")
+                continue
+
+            decoded = Image.open(BytesIO(data))
+            ssim = compute_ssim(reference, decoded)
+            per_kb = ssim / (len(data) / 1024)
+            print(f"{image_format:<8}{size_kb:>8}{len(data):>10}{ssim:>10.4f}{per_kb:>10.4f}{elapsed_ms:>10.1f}")
+
+        print()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='比较不同图片格式在目标大小下的画质')
+    parser.add_argument('images', nargs='*', type=Path, help='测试图片，默认使用 data/captures 下的图片')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 15, 30], help='目标大小（KB）')
+    args = parser.parse_args()
+
+    images = args.images
+    if not images:
+        captures_dir = Path(__file__).parent.parent / 'data' / 'captures'
+        images = sorted(captures_dir.glob('*/*.jpg'))[:3]
+
+    if not images:
+        print("未找到测试图片，请指定图片路径或先运行摄像头/截图模块生成图片")
+        return 1
+
+    formats = [f for f in ImageHelper.IMAGE_FORMATS if ImageHelper.is_format_supported(f)]
+    print(f"可用格式: {', '.join(formats)}")
+
+    for image_path in images:
+        benchmark(image_path, args.sizes, formats)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+通知渠道本地替身服务
+- HTTP：Webhook（POST /hook/<名称>，JSON）和 Server酱（POST /<SendKey>.send，表单）
+- SMTP：最小的明文 SMTP 服务（EHLO/AUTH/MAIL/RCPT/DATA），记录收到的邮件和附件
+支持注入延迟和前几次请求失败，用于在离线环境中测试多渠道并发、熔断和发件箱重试
+
+使用方法：
+    python scripts/channel_stub.py --http-port 8767 --smtp-port 8025 --fail-first 1
+然后在 data/config.json 的 notification.channels 中设置：
+    {"provider": "webhook", "url": "http://127.0.0.1:8767/hook/home"},
+    {"provider": "serverchan", "sendkey": "SCT1", "api_url": "http://127.0.0.1:8767/{sendkey}.send"},
+    {"provider": "smtp", "host": "127.0.0.1", "port": 8025, "use_ssl": false, "recipients": ["me@example.com"]}
+
+自检（启动替身服务并用各通知渠道和发件箱逐项验证）：
+    python scripts/channel_stub.py --self-test
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+import socketserver
+from email import message_from_bytes
+from email.policy import default as default_policy
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.channels import create_notifier
+from src.core.database import Database
+from src.core.outbox import NotificationOutbox
+
+
+class StubState:
+    """替身服务的配置、收到的消息和统计（各请求线程共享）"""
+
+    def __init__(self, latency: float = 0, fail_first: int = 0, verbose: bool = False):
+        self.latency = latency / 1000.0
+        self.fail_first = fail_first
+        self.verbose = verbose
+
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.failures = {}
+        self.messages = []
+        self.stats = {'requests': 0, 'webhook': 0, 'serverchan': 0, 'smtp': 0, 'errors': 0}
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def fail_next(self, target: str, count: int = 1):
+        """让指定目标接下来的 count 次请求失败"""
+        with self.lock:
+            self.failures[target] = count
+
+    def should_fail(self, target: str) -> bool:
+        """每个目标（Webhook 路径、SendKey 或收件人）的前 fail_first 次请求失败，或按 fail_next 失败"""
+        with self.lock:
+            if self.failures.get(target):
+                self.failures[target] -= 1
+                return True
+            self.attempts[target] = self.attempts.get(target, 0) + 1
+            return self.attempts[target] <= self.fail_first
+
+    def record(self, channel: str, target: str, title: str, content: str, images: int):
+        with self.lock:
+            self.messages.append({'channel': channel, 'target': target, 'title': title,
+                                  'content': content, 'images': images})
+        self.count(channel)
+        if self.verbose:
+            print(f"  [{channel}] {target}: {title} ({images} 张图片)")
+
+
+class ChannelStubHandler(BaseHTTPRequestHandler):
+    """Webhook 和 Server酱 接口处理器"""
+
+    protocol_version = 'HTTP/1.1'
+    state: StubState = None
+
+    def log_message(self, format, *args):
+        if self.state.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/stats':
+            with self.state.lock:
+                stats = dict(self.state.stats)
+            self._reply(200, stats)
+            return
+        self._reply(404, {'code': 404, 'message': '接口不存在'})
+
+    def do_POST(self):
+        state = self.state
+        state.count('requests')
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        time.sleep(state.latency)
+
+        path = urlparse(self.path).path
+        if path.startswith('/hook/'):
+            if state.should_fail(path):
+                state.count('errors')
+                self._reply(503, {'message': '服务暂不可用'})
+                return
+
+            payload = json.loads(raw.decode('utf-8') or '{}')
+            state.record('webhook', path, payload.get('title', ''), payload.get('content', ''),
+                         len(payload.get('images') or []))
+            self._reply(200, {'ok': True})
+            return
+
+        if path.endswith('.send'):
+            sendkey = path[1:-len('.send')]
+            params = {k: v[0] for k, v in parse_qs(raw.decode('utf-8')).items()}
+            if state.should_fail(sendkey):
+                state.count('errors')
+                self._reply(200, {'code': 40001, 'message': '发送失败（替身服务注入）'})
+                return
+
+            desp = params.get('desp', '')
+            state.record('serverchan', sendkey, params.get('title', ''), desp, desp.count(']('))
+            self._reply(200, {'code': 0, 'message': '', 'data': {'pushid': str(len(state.messages))}})
+            return
+
+        self._reply(404, {'code': 404, 'message': '接口不存在'})
+
+
+class SmtpStubHandler(socketserver.StreamRequestHandler):
+    """最小的 SMTP 会话处理器（不支持 TLS，接受任意登录）"""
+
+    state: StubState = None
+
+    def _send(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode('utf-8'))
+
+    def _read_line(self) -> str:
+        return self.rfile.readline().decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def _read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+    def handle(self):
+        state = self.state
+        recipients = []
+        self._send('220 dontouchme-stub ESMTP')
+
+        while True:
+            line = self._read_line()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+
+            if command == 'EHLO':
+                self._send('250-dontouchme-stub')
+                self._send('250-AUTH PLAIN LOGIN')
+                self._send('250 8BITMIME')
+            elif command == 'HELO':
+                self._send('250 dontouchme-stub')
+            elif command == 'AUTH':
+                if line.upper().startswith('AUTH LOGIN') and len(line.split()) < 3:
+                    self._send('334 VXNlcm5hbWU6')
+                    self._read_line()
+                    self._send('334 UGFzc3dvcmQ6')
+                    self._read_line()
+                self._send('235 Authentication successful')
+            elif command == 'MAIL':
+                recipients = []
+                self._send('250 OK')
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip().strip('<>'))
+                self._send('250 OK')
+            elif command == 'DATA':
+                self._send('354 End data with <CR><LF>.<CR><LF>')
+                data = self._read_data()
+                state.count('requests')
+                time.sleep(state.latency)
+
+                target = ','.join(recipients)
+                if state.should_fail(target):
+                    state.count('errors')
+                    self._send('451 Temporary failure (stub)')
+                    continue
+
+                message = message_from_bytes(data, policy=default_policy)
+                body = message.get_body(preferencelist=('plain',))
+                state.record('smtp', target, str(message['Subject'] or ''),
+                             body.get_content() if body else '', len(list(message.iter_attachments())))
+                self._send('250 OK: queued')
+            elif command == 'RSET':
+                recipients = []
+                self._send('250 OK')
+            elif command == 'NOOP':
+                self._send('250 OK')
+            elif command == 'QUIT':
+                self._send('221 Bye')
+                return
+            else:
+                self._send('502 Command not implemented')
+
+
+class ThreadingSmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_servers(state: StubState, host: str = '127.0.0.1', http_port: int = 0, smtp_port: int = 0):
+    """在后台线程中启动 HTTP 和 SMTP 替身服务"""
+    ChannelStubHandler.state = state
+    SmtpStubHandler.state = state
+    http_server = ThreadingHTTPServer((host, http_port), ChannelStubHandler)
+    smtp_server = ThreadingSmtpServer((host, smtp_port), SmtpStubHandler)
+    for name, server in (('channel-stub-http', http_server), ('channel-stub-smtp', smtp_server)):
+        threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    return http_server, smtp_server
+
+
+def self_test() -> int:
+    """
+    启动替身服务，验证各渠道发送、同类型渠道的独立熔断和发件箱按渠道名称重试
+
+    Returns:
+        退出码，全部通过为 0
+    """
+    state = StubState()
+    http_server, smtp_server = start_servers(state)
+    base = f"http://127.0.0.1:{http_server.server_address[1]}"
+    smtp_port = smtp_server.server_address[1]
+    checks = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        db = Database(temp_dir / 'history.db')
+        images = []
+        for name in ('camera.jpg', 'screen.jpg'):
+            image_path = temp_dir / name
+            image_path.write_bytes(b'\xff\xd8\xff\xe0' + bytes(range(256)) * 8 + b'\xff\xd9')
+            images.append(image_path)
+
+        notifier = create_notifier({
+            'provider': 'serverchan',
+            'token': 'SCT1',
+            'api_url': f"{base}/{{sendkey}}.send",
+            'breaker': {'failure_threshold': 3},
+            'channels': [
+                {'provider': 'webhook', 'url': f"{base}/hook/home"},
+                {'provider': 'webhook', 'url': f"{base}/hook/office"},
+                {'provider': 'smtp', 'host': '127.0.0.1', 'port': smtp_port, 'use_ssl': False,
+                 'sender': 'stub@example.com', 'recipients': ['me@example.com']}
+            ]
+        }, db)
+        names = [channel.name for channel in notifier.channels]
+        checks.append(('渠道名称不重复', names == ['serverchan', 'webhook', 'webhook-2', 'smtp']))
+
+        # 文字通知：所有渠道并发送达
+        ok = notifier.send_text("替身测试", "文字通知")
+        received = sorted(message['channel'] for message in state.messages)
+        checks.append(('文字通知并发送达', ok and received == ['serverchan', 'smtp', 'webhook', 'webhook']))
+
+        # SMTP 附件
+        state.messages.clear()
+        smtp = notifier.get_channel('smtp')
+        ok = smtp.send_with_images("替身测试", "附件通知", images)
+        checks.append(('SMTP 附件', ok and state.messages and state.messages[-1]['images'] == 2))
+
+        # 第二个 Webhook 失败：只影响自己的熔断计数，发件箱条目按名称路由回它
+        state.messages.clear()
+        state.fail_next('/hook/office')
+        notifier.reset_delivery_state()
+        notifier.send_text("替身测试", "单个渠道失败")
+        pending = [name for name, _, _ in notifier.get_pending_payloads()]
+        home_state = db.get_provider_state('webhook') or {}
+        office_state = db.get_provider_state('webhook-2') or {}
+        checks.append(('同类型渠道独立熔断计数', pending == ['webhook-2'] and not home_state.get('failures')
+                       and office_state.get('failures') == 1))
+
+        outbox = NotificationOutbox(db)
+        outbox.enqueue(None, notifier)
+        conn = sqlite3.connect(db.db_path)
+        conn.execute('UPDATE notification_outbox SET next_attempt_at = 0')
+        conn.commit()
+        conn.close()
+        state.messages.clear()
+        sent = outbox.process_due(notifier)
+        targets = [message['target'] for message in state.messages]
+        checks.append(('发件箱按渠道名称重试', sent == 1 and targets == ['/hook/office']))
+
+        # SMTP 重试时附件已被清理：正文注明，发件箱条目记录原因
+        images[1].unlink()
+        db.add_outbox_entry(None, 'smtp', {'subject': '替身测试', 'body': '重试通知',
+                                           'attachments': [str(path) for path in images]}, 'attachment', 0)
+        state.messages.clear()
+        sent = outbox.process_due(notifier)
+        conn = sqlite3.connect(db.db_path)
+        last_error = conn.execute(
+            "SELECT last_error FROM notification_outbox WHERE provider = 'smtp' ORDER BY id DESC LIMIT 1"
+        ).fetchone()[0]
+        conn.close()
+        message = state.messages[-1] if state.messages else {}
+        checks.append(('SMTP 重试附件缺失', sent == 1 and message.get('images') == 1
+                       and '已被清理' in message.get('content', '') and bool(last_error)))
+
+        db.close()
+
+    for server in (http_server, smtp_server):
+        server.shutdown()
+        server.server_close()
+
+    print()
+    for name, passed in checks:
+        print(f"  [{'通过' if passed else '失败'}] {name}")
+    return 0 if all(passed for _, passed in checks) else 1
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='通知渠道本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--http-port', type=int, default=8767, help='Webhook / Server酱 端口')
+    parser.add_argument('--smtp-port', type=int, default=8025, help='SMTP 端口')
+    parser.add_argument('--latency', type=float, default=0, help='固定延迟（毫秒）')
+    parser.add_argument('--fail-first', type=int, default=0, help='每个目标的前几次请求失败')
+    parser.add_argument('--verbose', action='store_true', help='打印每条消息')
+    parser.add_argument('--self-test', action='store_true', help='启动替身服务并用各通知渠道自检后退出')
+    args = parser.parse_args()
+
+    if args.self_test:
+        return self_test()
+
+    state = StubState(args.latency, args.fail_first, args.verbose)
+    http_server, smtp_server = start_servers(state, args.host, args.http_port, args.smtp_port)
+
+    print(f"Webhook 替身服务已启动: http://{args.host}:{http_server.server_address[1]}/hook/<名称>")
+    print(f"Server酱 替身服务已启动: http://{args.host}:{http_server.server_address[1]}/<SendKey>.send")
+    print(f"SMTP 替身服务已启动: {args.host}:{smtp_server.server_address[1]}")
+    print("按 Ctrl+C 停止")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in (http_server, smtp_server):
+            server.shutdown()
+            server.server_close()
+
+    print()
+    print("统计信息:")
+    for key, value in state.stats.items():
+        print(f"  {key}: {value}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
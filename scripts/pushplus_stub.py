@@ -0,0 +1,216 @@
+"""
+PushPlus 本地替身服务
+实现 /send 接口（code/msg 响应和内容长度限制），支持注入延迟、错误和限流，
+用于在离线环境中测试通知吞吐量、重试行为和消息大小限制
+
+使用方法：
+    python scripts/pushplus_stub.py --port 8765 --latency 200 --error-rate 0.1 --per-minute 10
+然后在 data/config.json 中设置：
+    "notification": {"api_url": "http://127.0.0.1:8765/send", ...}
+"""
+
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import deque
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.notifier import PushPlusNotifier
+
+# PushPlus 返回码（替身服务使用的子集）
+CODE_OK = 200
+CODE_RESTRICTED = 900  # 用户账号使用受限（超出调用次数）
+CODE_INVALID_TOKEN = 903  # 无效的用户令牌
+CODE_ERROR = 999  # 服务端错误（包括内容过长）
+
+
+class StubState:
+    """替身服务的配置和统计（各请求线程共享）"""
+
+    def __init__(self, args):
+        self.token = args.token
+        self.latency = args.latency / 1000.0
+        self.jitter = args.jitter / 1000.0
+        self.error_rate = args.error_rate
+        self.drop_rate = args.drop_rate
+        self.per_minute = args.per_minute
+        self.content_limit = args.content_limit
+        self.verbose = args.verbose
+
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.stats = {
+            'requests': 0,
+            'ok': 0,
+            'deliveries': 0,  # 按好友令牌（to）计算的送达人数
+            'throttled': 0,
+            'invalid_token': 0,
+            'too_long': 0,
+            'errors': 0,
+            'dropped': 0,
+            'bytes': 0
+        }
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def take_quota(self) -> bool:
+        """滑动窗口限流：一分钟内超过 per_minute 次返回 False"""
+        if self.per_minute <= 0:
+            return True
+
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if len(self.recent) >= self.per_minute:
+                return False
+            self.recent.append(now)
+            return True
+
+
+class PushPlusStubHandler(BaseHTTPRequestHandler):
+    """PushPlus /send 接口处理器"""
+
+    protocol_version = 'HTTP/1.1'
+    state: StubState = None
+
+    def log_message(self, format, *args):
+        if self.state.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_params(self) -> dict:
+        """读取请求参数（查询字符串、表单或 JSON）"""
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            raw = self.rfile.read(length)
+            self.state.count('bytes', length)
+            if 'json' in (self.headers.get('Content-Type') or ''):
+                params.update(json.loads(raw.decode('utf-8')))
+            else:
+                params.update({k: v[0] for k, v in parse_qs(raw.decode('utf-8')).items()})
+
+        return params
+
+    def _handle(self):
+        state = self.state
+        if urlparse(self.path).path == '/stats':
+            with state.lock:
+                stats = dict(state.stats)
+            self._reply(200, stats)
+            return
+
+        if urlparse(self.path).path != '/send':
+            self._reply(404, {'code': 404, 'msg': '接口不存在'})
+            return
+
+        state.count('requests')
+        params = self._read_params()
+
+        delay = state.latency + random.uniform(0, state.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        # 模拟网络中断：不返回响应直接断开
+        if random.random() < state.drop_rate:
+            state.count('dropped')
+            self.close_connection = True
+            self.connection.close()
+            return
+
+        if random.random() < state.error_rate:
+            state.count('errors')
+            self._reply(500, {'code': CODE_ERROR, 'msg': '服务端错误'})
+            return
+
+        token = params.get('token', '')
+        if not token or (state.token and token != state.token):
+            state.count('invalid_token')
+            self._reply(200, {'code': CODE_INVALID_TOKEN, 'msg': '无效的用户令牌', 'data': None})
+            return
+
+        content = params.get('content', '')
+        if len(content) > state.content_limit:
+            state.count('too_long')
+            self._reply(200, {'code': CODE_ERROR, 'msg': f'内容长度超过限制 ({len(content)} > {state.content_limit})',
+                              'data': None})
+            return
+
+        if not state.take_quota():
+            state.count('throttled')
+            self._reply(200, {'code': CODE_RESTRICTED, 'msg': '用户账号使用受限', 'data': None})
+            return
+
+        state.count('ok')
+        state.count('deliveries', max(1, len([t for t in params.get('to', '').split(',') if t])))
+        if state.verbose:
+            print(f"  收到消息: {params.get('title', '')} ({len(content)} 字符)")
+        self._reply(200, {'code': CODE_OK, 'msg': '请求成功', 'data': uuid.uuid4().hex})
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='PushPlus 本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--token', default='', help='只接受指定的 Token，默认接受任意非空 Token')
+    parser.add_argument('--latency', type=float, default=0, help='固定延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='额外随机延迟上限（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回 HTTP 500 的比例（0-1）')
+    parser.add_argument('--drop-rate', type=float, default=0, help='不响应直接断开连接的比例（0-1）')
+    parser.add_argument('--per-minute', type=int, default=0, help='每分钟允许的成功请求数，0 表示不限流')
+    parser.add_argument('--content-limit', type=int, default=PushPlusNotifier.CONTENT_LIMIT,
+                        help='消息内容长度上限（字符数）')
+    parser.add_argument('--verbose', action='store_true', help='打印每个请求')
+    args = parser.parse_args()
+
+    PushPlusStubHandler.state = StubState(args)
+    server = ThreadingHTTPServer((args.host, args.port), PushPlusStubHandler)
+
+    print(f"PushPlus 替身服务已启动: http://{args.host}:{server.server_address[1]}/send")
+    print(f"统计信息: http://{args.host}:{server.server_address[1]}/stats")
+    print("按 Ctrl+C 停止")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    print()
+    print("统计信息:")
+    for key, value in PushPlusStubHandler.state.stats.items():
+        print(f"  {key}: {value}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
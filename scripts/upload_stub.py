@@ -0,0 +1,268 @@
+"""
+图床本地替身服务
+实现 multipart 表单上传（POST /upload）和原始字节上传（PUT /files/<文件名>），
+支持注入延迟、错误和前几次请求失败，用于在离线环境中测试 HttpUploader 的解析和重试退避
+
+使用方法：
+    python scripts/upload_stub.py --port 8766 --fail-first 1
+然后在 data/config.json 中设置：
+    "imgbed": {"service": "http", "url": "http://127.0.0.1:8766/upload", "url_field": "data.url"}
+或（PUT 上传，返回地址按模板生成）：
+    "imgbed": {"service": "http", "method": "PUT", "url": "http://127.0.0.1:8766/files/{filename}",
+               "public_url": "http://127.0.0.1:8766/files/{filename}"}
+
+自检（启动替身服务并用 HttpUploader 逐项验证）：
+    python scripts/upload_stub.py --self-test
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from urllib.parse import unquote, urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.image_uploader import create_uploader
+
+
+class StubState:
+    """替身服务的配置、已上传文件和统计（各请求线程共享）"""
+
+    def __init__(self, latency: float = 0, error_rate: float = 0, fail_first: int = 0, verbose: bool = False):
+        self.latency = latency / 1000.0
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.verbose = verbose
+
+        self.lock = threading.Lock()
+        self.files = {}
+        self.attempts = {}
+        self.stats = {'requests': 0, 'uploaded': 0, 'errors': 0, 'bytes': 0}
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def should_fail(self, filename: str) -> bool:
+        """每个文件的前 fail_first 次请求返回 503，之后按 error_rate 随机失败"""
+        with self.lock:
+            self.attempts[filename] = self.attempts.get(filename, 0) + 1
+            if self.attempts[filename] <= self.fail_first:
+                return True
+        return random.random() < self.error_rate
+
+
+class UploadStubHandler(BaseHTTPRequestHandler):
+    """图床上传接口处理器"""
+
+    protocol_version = 'HTTP/1.1'
+    state: StubState = None
+
+    def log_message(self, format, *args):
+        if self.state.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status: int, body: bytes = b'', content_type: str = 'application/json; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply_json(self, status: int, body: dict):
+        self._reply(status, json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.state.count('bytes', len(body))
+        return body
+
+    def _read_multipart(self, body: bytes):
+        """解析 multipart 表单，返回第一个文件字段的 (文件名, 内容)"""
+        header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode('utf-8')
+        message = BytesParser(policy=default_policy).parsebytes(header + body)
+        for part in message.iter_parts():
+            if part.get_filename():
+                return part.get_filename(), part.get_payload(decode=True)
+        return None, None
+
+    def _file_url(self, filename: str) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/files/{filename}"
+
+    def _store(self, filename: str, data: bytes):
+        with self.state.lock:
+            self.state.files[filename] = data
+        self.state.count('uploaded')
+
+    def do_POST(self):
+        state = self.state
+        state.count('requests')
+        body = self._read_body()
+        time.sleep(state.latency)
+
+        if urlparse(self.path).path != '/upload':
+            self._reply_json(404, {'code': 404, 'msg': '接口不存在'})
+            return
+
+        filename, data = self._read_multipart(body)
+        if not filename:
+            self._reply_json(400, {'code': 400, 'msg': '缺少文件字段'})
+            return
+
+        if state.should_fail(filename):
+            state.count('errors')
+            self._reply_json(503, {'code': 503, 'msg': '服务暂不可用'})
+            return
+
+        self._store(filename, data)
+        self._reply_json(200, {'code': 200, 'data': {'url': self._file_url(filename), 'size': len(data)}})
+
+    def do_PUT(self):
+        state = self.state
+        state.count('requests')
+        body = self._read_body()
+        time.sleep(state.latency)
+
+        path = urlparse(self.path).path
+        if not path.startswith('/files/'):
+            self._reply_json(404, {'code': 404, 'msg': '接口不存在'})
+            return
+
+        filename = unquote(path[len('/files/'):])
+        if state.should_fail(filename):
+            state.count('errors')
+            self._reply_json(503, {'code': 503, 'msg': '服务暂不可用'})
+            return
+
+        # 对象存储风格：成功时不返回地址，由 public_url 模板生成
+        self._store(filename, body)
+        self._reply(201)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/stats':
+            with self.state.lock:
+                stats = dict(self.state.stats)
+            self._reply_json(200, stats)
+            return
+
+        with self.state.lock:
+            data = self.state.files.get(unquote(path[len('/files/'):])) if path.startswith('/files/') else None
+        if data is None:
+            self._reply_json(404, {'code': 404, 'msg': '文件不存在'})
+            return
+        self._reply(200, data, 'application/octet-stream')
+
+
+def start_server(state: StubState, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程中启动替身服务"""
+    UploadStubHandler.state = state
+    server = ThreadingHTTPServer((host, port), UploadStubHandler)
+    threading.Thread(target=server.serve_forever, name='upload-stub', daemon=True).start()
+    return server
+
+
+def self_test() -> int:
+    """
+    启动替身服务，用 HttpUploader 验证 POST/PUT 上传、url_field/public_url 解析和重试退避
+
+    Returns:
+        退出码，全部通过为 0
+    """
+    state = StubState()
+    server = start_server(state)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_path = Path(temp_dir) / 'stub.jpg'
+        image_path.write_bytes(b'\xff\xd8\xff\xe0' + bytes(range(256)) * 16 + b'\xff\xd9')
+
+        def upload(settings: dict):
+            uploader = create_uploader('http', dict({'retries': 0, 'backoff': 0.2, 'timeout': 5}, **settings))
+            return uploader.upload(image_path)
+
+        file_url = f"{base}/files/{image_path.name}"
+        checks = []
+
+        url = upload({'url': f"{base}/upload", 'url_field': 'data.url'})
+        checks.append(('POST + url_field', url == file_url and state.files.get(image_path.name) == image_path.read_bytes()))
+
+        url = upload({'url': f"{base}/upload", 'url_field': 'data.missing'})
+        checks.append(('POST + 缺少 url_field', url is None))
+
+        state.files.clear()
+        url = upload({'url': f"{base}/files/{{filename}}", 'method': 'PUT', 'public_url': f"{base}/files/{{filename}}"})
+        checks.append(('PUT + public_url', url == file_url and state.files.get(image_path.name) == image_path.read_bytes()))
+
+        # 前两次返回 503：重试两次后成功，等待 0.2 + 0.4 秒
+        state.fail_first = 2
+        state.attempts.clear()
+        started = time.monotonic()
+        url = upload({'url': f"{base}/upload", 'url_field': 'data.url', 'retries': 2})
+        elapsed = time.monotonic() - started
+        checks.append(('重试退避', url == file_url and state.attempts[image_path.name] == 3 and elapsed >= 0.6))
+
+        state.attempts.clear()
+        url = upload({'url': f"{base}/upload", 'url_field': 'data.url', 'retries': 1})
+        checks.append(('重试次数用完', url is None and state.attempts[image_path.name] == 2))
+
+    server.shutdown()
+    server.server_close()
+
+    print()
+    for name, passed in checks:
+        print(f"  [{'通过' if passed else '失败'}] {name}")
+    return 0 if all(passed for _, passed in checks) else 1
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='图床本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8766, help='监听端口')
+    parser.add_argument('--latency', type=float, default=0, help='固定延迟（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回 HTTP 503 的比例（0-1）')
+    parser.add_argument('--fail-first', type=int, default=0, help='每个文件的前几次请求返回 HTTP 503')
+    parser.add_argument('--verbose', action='store_true', help='打印每个请求')
+    parser.add_argument('--self-test', action='store_true', help='启动替身服务并用 HttpUploader 自检后退出')
+    args = parser.parse_args()
+
+    if args.self_test:
+        return self_test()
+
+    state = StubState(args.latency, args.error_rate, args.fail_first, args.verbose)
+    server = start_server(state, args.host, args.port)
+
+    print(f"图床替身服务已启动: http://{args.host}:{server.server_address[1]}/upload")
+    print(f"统计信息: http://{args.host}:{server.server_address[1]}/stats")
+    print("按 Ctrl+C 停止")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print()
+    print("统计信息:")
+    for key, value in state.stats.items():
+        print(f"  {key}: {value}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
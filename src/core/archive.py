@@ -0,0 +1,420 @@
+"""
+历史归档模块
+把早于阈值的历史记录按月移出 history.db，实时数据库和图片目录只保留近期数据
+
+每个月两个文件（data/archive）：
+- history-YYYY-MM.jsonl.gz：每行一条完整记录（含图片信息），每批追加一个 gzip 成员，
+  归档索引记录成员的字节偏移和行号，读取单条记录时直接定位到该成员
+- images-YYYY-MM.zip：重新编码为紧凑格式（默认 WebP）的图片，成员名为 <记录ID>/<类型>_<显示器>_<序号><后缀>
+
+图片容器不在原文件上追加：每批把已有成员和新图片写入同目录的临时文件，fsync 后用 os.replace 替换，
+中途退出只会留下临时文件，已归档的图片不会损坏。
+先写归档文件，再在一个写事务中写入归档索引（archive_index）并删除历史记录，最后删除原图片；
+中途退出时下次会重复追加同一记录，读取时以最后一次为准。
+整个归档过程持有 archive_dir 下的文件锁，托盘进程和命令行进程不会同时追加同一个月份文件
+"""
+
+import os
+import gzip
+import json
+import time
+import shutil
+import zipfile
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .database import Database
+from .retention import RetentionEngine
+from ..utils.deadline import Deadline
+from ..utils.file_lock import FileLock
+from ..utils.image_helper import ImageHelper
+from ..utils.logger import Logger
+
+logger = Logger()
+
+
+class HistoryArchive:
+    """历史记录按月归档"""
+
+    # 每批（一个写事务）最多归档的记录数
+    BATCH_SIZE = 200
+
+    # 每次运行默认最多处理的批数
+    MAX_BATCHES = 5
+
+    # 批次之间的暂停时间（秒）
+    BATCH_PAUSE = 0.2
+
+    # 归档进程锁文件名（位于 archive_dir）
+    LOCK_NAME = '.archive.lock'
+
+    def __init__(self, db: Database, archive_dir: Optional[Path] = None, after_days: float = 90,
+                 image_format: str = 'webp', image_quality: int = 60, max_dimension: int = 1280):
+        """
+        初始化归档器
+
+        Args:
+            db: 数据库实例
+            archive_dir: 归档目录，默认为 data/archive
+            after_days: 早于多少天的记录需要归档
+            image_format: 归档图片格式（jpeg/webp/avif）
+            image_quality: 归档图片质量（1-100）
+            max_dimension: 归档图片最大边长（像素），0 表示不缩放
+        """
+        if archive_dir is None:
+            archive_dir = Path(__file__).parent.parent.parent / 'data' / 'archive'
+
+        self.db = db
+        self.archive_dir = Path(archive_dir)
+        self.after_days = after_days
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.max_dimension = max_dimension
+
+    @classmethod
+    def from_config(cls, db: Database, storage_config: Dict) -> Optional['HistoryArchive']:
+        """
+        按 storage.archive 配置创建归档器
+
+        Args:
+            db: 数据库实例
+            storage_config: 配置中的 storage 部分
+
+        Returns:
+            归档器，未开启归档时返回 None
+        """
+        archive_config = storage_config.get('archive', {})
+        if not archive_config.get('enabled', False):
+            return None
+
+        return cls(
+            db,
+            after_days=archive_config.get('after_days', 90),
+            image_format=archive_config.get('image_format', 'webp'),
+            image_quality=archive_config.get('image_quality', 60),
+            max_dimension=archive_config.get('max_dimension', 1280)
+        )
+
+    def records_path(self, month: str) -> Path:
+        """月份的记录归档文件"""
+        return self.archive_dir / f"history-{month}.jsonl.gz"
+
+    def images_path(self, month: str) -> Path:
+        """月份的图片归档文件"""
+        return self.archive_dir / f"images-{month}.zip"
+
+    def run(self, max_batches: Optional[int] = MAX_BATCHES, deadline: Optional[Deadline] = None) -> Dict:
+        """
+        执行一次归档
+
+        Args:
+            max_batches: 本次最多处理的批数，None 表示归档到没有需要归档的记录为止
+            deadline: 截止时间，时间用完时停止（已开始的批次会完成）
+
+        Returns:
+            {'archived_records', 'archived_images', 'bytes_before', 'bytes_after', 'months', 'complete', 'locked'}，
+            bytes_before 为删除的原图片大小，bytes_after 为归档文件增加的大小，
+            locked 表示其它进程正在归档、本次没有执行
+        """
+        report = {'archived_records': 0, 'archived_images': 0, 'bytes_before': 0, 'bytes_after': 0,
+                  'months': [], 'complete': True, 'locked': False}
+        if self.after_days <= 0:
+            return report
+
+        lock = FileLock(self.archive_dir / self.LOCK_NAME)
+        if not lock.acquire():
+            logger.info("其它进程正在归档，本次跳过")
+            report['complete'] = False
+            report['locked'] = True
+            return report
+
+        try:
+            self._run_batches(max_batches, deadline, report)
+        finally:
+            lock.release()
+
+        if report['archived_records']:
+            logger.info(
+                f"历史归档: {report['archived_records']} 条记录、{report['archived_images']} 张图片 "
+                f"({', '.join(report['months'])})，图片 {report['bytes_before'] / 1024 / 1024:.1f}MB → "
+                f"归档 {report['bytes_after'] / 1024 / 1024:.1f}MB"
+                f"{'' if report['complete'] else '（未完成，下次继续）'}"
+            )
+        return report
+
+    def _run_batches(self, max_batches: Optional[int], deadline: Optional[Deadline], report: Dict):
+        """持有归档锁时逐批归档，参数和报告参见 run"""
+        before_ts = Database.to_epoch_ms(datetime.now()) - int(self.after_days * 86400 * 1000)
+
+        batches = 0
+        while True:
+            if max_batches is not None and batches >= max_batches:
+                report['complete'] = False
+                break
+            if deadline and deadline.expired():
+                report['complete'] = False
+                break
+            if batches:
+                time.sleep(self.BATCH_PAUSE)
+
+            records = self.db.get_archive_candidates(before_ts, self.BATCH_SIZE)
+            if not records:
+                break
+
+            batches += 1
+            by_month: Dict[str, List[Dict]] = {}
+            for record in records:
+                by_month.setdefault(record['trigger_time'][:7], []).append(record)
+
+            for month, month_records in by_month.items():
+                self._archive_month(month, month_records, report)
+                if month not in report['months']:
+                    report['months'].append(month)
+
+            if len(records) < self.BATCH_SIZE:
+                break
+
+    def _archive_month(self, month: str, records: List[Dict], report: Dict):
+        """
+        归档同一月份的一批记录
+
+        Args:
+            month: 月份（YYYY-MM）
+            records: get_archive_candidates 返回的记录
+            report: 归档报告，累加统计
+        """
+        records_path = self.records_path(month)
+        images_path = self.images_path(month)
+        size_before = sum(path.stat().st_size for path in (records_path, images_path) if path.exists())
+
+        # 本批追加的 gzip 成员从文件当前末尾开始
+        records_offset = records_path.stat().st_size if records_path.exists() else 0
+
+        lines = []
+        entries = []
+        original_paths: Dict[int, List[str]] = {}
+        image_count = 0
+
+        # 图片已是压缩格式，不再压缩；新容器写完并落盘后才替换原容器
+        temp_path = images_path.with_name(images_path.name + '.tmp')
+        with open(temp_path, 'wb') as raw:
+            with zipfile.ZipFile(raw, 'w', compression=zipfile.ZIP_STORED) as container:
+                existing = self._copy_members(images_path, container)
+                copied = len(existing)
+                for record in records:
+                    images = self._pack_images(container, record, existing)
+                    image_count += len(images)
+                    original_paths[record['id']] = [image['original_path'] for image in images]
+
+                    record = dict(record, images=images)
+                    entries.append({
+                        'id': record['id'],
+                        'trigger_type': record['trigger_type'],
+                        'trigger_time': record['trigger_time'],
+                        'trigger_ts': record['trigger_ts'],
+                        'notification_sent': record['notification_sent'],
+                        'notification_method': record['notification_method'],
+                        'month': month,
+                        'image_count': len(images),
+                        'records_offset': records_offset,
+                        'record_line': len(lines)
+                    })
+                    lines.append(json.dumps(record, ensure_ascii=False))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        if len(existing) > copied:
+            os.replace(temp_path, images_path)
+        else:
+            # 本批没有新图片（都已在容器中或没有图片），保留原容器
+            temp_path.unlink()
+
+        # 记录文件只在末尾追加新的 gzip 成员，已有成员不会被改写；同样落盘后再提交索引、删除原图片
+        with open(records_path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as f:
+                f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        archived_ids = self.db.archive_records(entries)
+        if not archived_ids:
+            return
+
+        # 归档索引已提交，删除原图片（含历史记录中引用但未进入图片子表的路径）
+        paths = []
+        for record in records:
+            if record['id'] in archived_ids:
+                paths.extend(original_paths[record['id']])
+                paths.extend(path for path in (record['camera_path'], record['screenshot_path']) if path)
+        _, reclaimed = RetentionEngine.remove_files(dict.fromkeys(paths))
+
+        size_after = sum(path.stat().st_size for path in (records_path, images_path) if path.exists())
+        report['archived_records'] += len(archived_ids)
+        report['archived_images'] += image_count
+        report['bytes_before'] += reclaimed
+        report['bytes_after'] += size_after - size_before
+
+    @staticmethod
+    def _copy_members(images_path: Path, container: zipfile.ZipFile) -> set:
+        """
+        把月份容器中已有的成员复制到新容器
+
+        Args:
+            images_path: 月份图片容器（不存在时不复制）
+            container: 正在写入的新容器
+
+        Returns:
+            已复制的成员名
+        """
+        if not images_path.exists():
+            return set()
+
+        with zipfile.ZipFile(images_path) as source:
+            for info in source.infolist():
+                with source.open(info) as src, container.open(info, 'w') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            return set(source.namelist())
+
+    def _pack_images(self, container: zipfile.ZipFile, record: Dict, existing: set) -> List[Dict]:
+        """
+        重新编码记录的图片并写入月份容器
+
+        图片子表之前的记录只有 camera_path 和 screenshot_path，按摄像头和截图归档；
+        上次归档中途退出时已写入容器的成员直接复用，不会重复写入同名成员
+
+        Args:
+            container: 月份图片容器
+            record: 历史记录（含 images）
+            existing: 容器中已有的成员名
+
+        Returns:
+            归档后的图片信息列表（member 为容器中的成员名）
+        """
+        images = list(record['images'])
+        known = {image['path'] for image in images}
+        for kind, path in (('camera', record['camera_path']), ('screenshot', record['screenshot_path'])):
+            if path and path not in known:
+                images.append({'kind': kind, 'monitor_index': 0 if kind == 'screenshot' else None, 'path': path})
+
+        image_format = ImageHelper.resolve_format(self.image_format)
+        suffix = ImageHelper.IMAGE_FORMATS[image_format]['suffix']
+
+        packed = []
+        for index, image in enumerate(images):
+            member = f"{record['id']}/{image['kind']}_{image.get('monitor_index') or 0}_{index}{suffix}"
+            if member in existing:
+                archived_size = container.getinfo(member).file_size
+            else:
+                if not Path(image['path']).exists():
+                    continue
+
+                data = ImageHelper.reencode(Path(image['path']), image_format, self.image_quality, self.max_dimension)
+                if data is None:
+                    continue
+
+                container.writestr(member, data)
+                existing.add(member)
+                archived_size = len(data)
+
+            packed.append({
+                'kind': image['kind'],
+                'monitor_index': image.get('monitor_index'),
+                'member': member,
+                'original_path': image['path'],
+                'byte_size': image.get('byte_size'),
+                'archived_size': archived_size,
+                'width': image.get('width'),
+                'height': image.get('height'),
+                'content_hash': image.get('content_hash')
+            })
+
+        return packed
+
+    def open_record(self, record_id: int) -> Optional[Dict]:
+        """
+        读取一条已归档的完整记录
+
+        Args:
+            record_id: 原历史记录ID
+
+        Returns:
+            记录字典（含 month 和 images），不存在时返回 None
+        """
+        entry = self.db.get_archived_record(record_id)
+        if entry is None:
+            return None
+
+        records_path = self.records_path(entry['month'])
+        try:
+            found = None
+            if entry.get('records_offset') is not None:
+                found = self._read_line(records_path, entry['records_offset'], entry['record_line'])
+                if found is not None and found.get('id') != record_id:
+                    logger.warning(f"归档索引位置与记录不符 (ID={record_id})，改为扫描整个文件")
+                    found = None
+
+            if found is None:
+                found = self._scan(records_path, record_id)
+
+            if found is None:
+                logger.warning(f"归档文件中没有记录 {record_id}: {records_path}")
+                return None
+
+            found['month'] = entry['month']
+            return found
+
+        except Exception as e:
+            logger.error(f"读取归档记录失败 (ID={record_id}): {e}")
+            return None
+
+    @staticmethod
+    def _read_line(records_path: Path, offset: int, line_number: int) -> Optional[Dict]:
+        """
+        从指定偏移处的 gzip 成员中读取一行记录
+
+        Args:
+            records_path: 月份记录文件
+            offset: gzip 成员的字节偏移
+            line_number: 成员内的行号（从 0 开始）
+
+        Returns:
+            解析后的记录，行不存在时返回 None
+        """
+        with open(records_path, 'rb') as raw:
+            raw.seek(offset)
+            with gzip.GzipFile(fileobj=raw) as f:
+                for index, line in enumerate(f):
+                    if index == line_number:
+                        return json.loads(line)
+        return None
+
+    @staticmethod
+    def _scan(records_path: Path, record_id: int) -> Optional[Dict]:
+        """扫描整个月份记录文件查找记录（没有位置信息的旧归档条目），重复归档的记录以最后一次为准"""
+        found = None
+        with gzip.open(records_path, 'rb') as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('id') == record_id:
+                    found = record
+        return found
+
+    def read_image(self, month: str, member: str) -> Optional[bytes]:
+        """
+        读取归档图片
+
+        Args:
+            month: 月份（YYYY-MM）
+            member: open_record 返回的图片成员名
+
+        Returns:
+            图片字节，失败返回 None
+        """
+        try:
+            with zipfile.ZipFile(self.images_path(month)) as container:
+                return container.read(member)
+
+        except Exception as e:
+            logger.error(f"读取归档图片失败 ({month}/{member}): {e}")
+            return None
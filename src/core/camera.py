@@ -7,9 +7,10 @@ import cv2
 import time
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 from ..utils.logger import Logger
+from ..utils.deadline import Deadline
 
 logger = Logger()
 
@@ -28,18 +29,24 @@ class CameraCapture:
         self.device_id = device_id
         self.resolution = resolution
 
-    def capture(self, save_path: Optional[Path] = None, warmup_frames: int = 5) -> Optional[Path]:
+        # 最近一次拍照各文件的编码和写入耗时（毫秒）
+        self.encode_times: Dict[Path, float] = {}
+
+    def capture(self, save_path: Optional[Path] = None, warmup_frames: int = 5,
+                deadline: Optional[Deadline] = None) -> Optional[Path]:
         """
         拍照并保存
 
         Args:
             save_path: 保存路径，如果为 None 则自动生成
             warmup_frames: 预热帧数，让摄像头稳定后再拍照
+            deadline: 截止时间，时间不足时跳过剩余预热帧直接拍照
 
         Returns:
             保存的文件路径，失败返回 None
         """
         cap = None
+        self.encode_times = {}
 
         try:
             logger.info(f"正在打开摄像头 (设备 ID: {self.device_id})...")
@@ -60,6 +67,9 @@ class CameraCapture:
             # 预热摄像头，让其自动调整曝光和白平衡
             logger.debug(f"预热摄像头 ({warmup_frames} 帧)...")
             for i in range(warmup_frames):
+                if deadline and deadline.expired():
+                    logger.warning(f"时间不足，跳过剩余 {warmup_frames - i} 帧预热")
+                    break
                 ret = cap.read()
                 if not ret[0]:
                     logger.warning(f"预热第 {i+1} 帧读取失败")
@@ -86,12 +96,14 @@ class CameraCapture:
             # 保存图片（使用 imencode 支持中文路径）
             try:
                 # 编码为 JPEG 格式
+                began = time.perf_counter()
                 success, encoded_img = cv2.imencode('.jpg', frame)
 
                 if success:
                     # 写入文件（支持中文路径）
                     with open(save_path, 'wb') as f:
                         f.write(encoded_img.tobytes())
+                    self.encode_times[save_path] = round((time.perf_counter() - began) * 1000, 1)
                     logger.info(f"拍照成功，保存到: {save_path}")
                     return save_path
                 else:
@@ -0,0 +1,472 @@
+"""
+通知渠道模块
+提供 PushPlus 之外的通知渠道（通用 Webhook、SMTP 邮件、Server酱），
+以及根据配置创建通知器的工厂函数
+"""
+
+import smtplib
+import mimetypes
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from .database import Database
+from .notifier import BaseNotifier, PushPlusNotifier, MultiNotifier
+from .throttle import create_guard
+from ..utils.image_helper import ImageHelper
+from ..utils.http_session import get_session, reset_session
+from ..utils.logger import Logger
+
+logger = Logger()
+
+
+class WebhookNotifier(BaseNotifier):
+    """
+    通用 Webhook 通知器
+
+    以 JSON 形式 POST 到指定地址：
+    {"title": ..., "content": ..., "images": [{"mime_type": ..., "base64": ...}]}
+    """
+
+    PROVIDER = 'webhook'
+
+    def __init__(self, url: str, headers: Optional[Dict] = None, max_image_kb: float = 200, **options):
+        """
+        初始化 Webhook 通知器
+
+        Args:
+            url: Webhook 地址
+            headers: 额外请求头
+            max_image_kb: 每张图片的最大大小（KB）
+            options: 通用选项，参见 BaseNotifier
+        """
+        super().__init__(**options)
+        self.url = url
+        self.headers = headers or {}
+        self.max_image_kb = max_image_kb
+
+    @property
+    def endpoint(self) -> str:
+        return self.url
+
+    def _deliver(self, payload: Dict, method: str) -> bool:
+        """发送 JSON 请求，2xx 视为成功"""
+        try:
+            response = get_session().post(self.url, json=payload, headers=self.headers, timeout=self._request_timeout())
+            self._track_request_error()
+        except requests.RequestException as e:
+            self._track_request_error(e)
+            logger.error(f"Webhook 发送异常: {e}")
+            self._remember_pending(payload, method)
+            reset_session()
+            return False
+
+        if response.ok:
+            self.last_method = method
+            logger.info(f"Webhook 通知发送成功 ({method})")
+            return True
+
+        logger.error(f"Webhook 通知发送失败: HTTP {response.status_code}")
+        if response.status_code == 429:
+            self.blocked = True
+        if response.status_code >= 500:
+            self._remember_pending(payload, method)
+        return False
+
+    def _text_payload(self, title: str, content: str) -> Dict:
+        return {'title': title, 'content': content, 'images': []}
+
+    def send_text(self, title: str, content: str) -> bool:
+        return self._deliver(self._text_payload(title, content), 'text')
+
+    def send_with_images(self, title: str, content: str, image_paths: List[Path],
+                         weights: Optional[List[float]] = None) -> bool:
+        if not image_paths:
+            return self.send_text(title, content)
+
+        results = ImageHelper.prepare_base64_images(
+            image_paths, [self.max_image_kb] * len(image_paths), image_format=self.image_format,
+            deadline=self.deadline
+        )
+        mime_type = ImageHelper.get_mime_type(self.image_format)
+        images = [{'mime_type': mime_type, 'base64': item['base64']} for item in results if item['base64']]
+
+        method = 'base64' if images else 'text'
+        return self._deliver({'title': title, 'content': content, 'images': images}, method)
+
+    def send_payload(self, payload: Dict) -> bool:
+        return self._deliver(payload, 'retry')
+
+
+class ServerChanNotifier(BaseNotifier):
+    """
+    Server酱通知器
+
+    消息为 Markdown，图片通过图床 URL 引用。
+    Server酱 每个 SendKey 对应一个接收者且不支持一次请求发送给多人，
+    多个接收者时同一份请求内容（图片只上传一次）并发发送到各 SendKey
+    """
+
+    PROVIDER = 'serverchan'
+
+    API_URL = "https://sctapi.ftqq.com/{sendkey}.send"
+
+    def __init__(self, sendkey: str, api_url: Optional[str] = None, recipients: Optional[List[str]] = None,
+                 **options):
+        """
+        初始化 Server酱通知器
+
+        Args:
+            sendkey: Server酱 SendKey
+            api_url: 接口地址，默认为官方地址，可包含 {sendkey} 占位符
+            recipients: 其他接收者的 SendKey 列表
+            options: 通用选项，参见 BaseNotifier
+        """
+        super().__init__(**options)
+        self.sendkey = sendkey
+        sendkeys = [sendkey] + [key for key in (recipients or []) if key and key != sendkey]
+        self.api_urls = [(api_url or self.API_URL).replace('{sendkey}', key) for key in sendkeys]
+        self.api_url = self.api_urls[0]
+
+    @property
+    def endpoint(self) -> str:
+        return self.api_url
+
+    def _post(self, api_url: str, payload: Dict) -> Tuple[bool, Optional[requests.RequestException]]:
+        """
+        向单个 SendKey 发送请求
+
+        Returns:
+            (是否成功, 网络异常)，收到响应时网络异常为 None
+        """
+        try:
+            response = get_session().post(api_url, data=payload, timeout=self._request_timeout())
+            result = response.json()
+        except requests.RequestException as e:
+            logger.error(f"Server酱 发送异常: {e}")
+            reset_session()
+            return False, e
+        except ValueError as e:
+            logger.error(f"Server酱 响应解析失败: {e}")
+            return False, None
+
+        if result.get('code') == 0:
+            return True, None
+
+        logger.error(f"Server酱 通知发送失败: {result.get('message', '未知错误')}")
+        return False, None
+
+    def _deliver(self, payload: Dict, method: str) -> bool:
+        """发送请求，code 为 0 视为成功；多个接收者时任一接收者成功即成功"""
+        if len(self.api_urls) == 1:
+            results = [self._post(self.api_url, payload)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(self.api_urls)) as executor:
+                results = list(executor.map(lambda url: self._post(url, payload), self.api_urls))
+
+        delivered = sum(1 for ok, _ in results if ok)
+        if delivered:
+            self.last_method = method
+            if delivered < len(results):
+                logger.warning(f"Server酱 部分接收者发送失败 ({delivered}/{len(results)})")
+            logger.info(f"Server酱 通知发送成功 ({method})")
+            return True
+
+        # 全部因网络原因失败时才加入发件箱，避免重试时重复发送给已收到的接收者
+        errors = [error for _, error in results]
+        if all(errors):
+            self._remember_pending(payload, method)
+        self.network_error = all(isinstance(error, requests.ConnectionError) for error in errors)
+        return False
+
+    def _text_payload(self, title: str, content: str) -> Dict:
+        return {'title': title, 'desp': content}
+
+    def send_text(self, title: str, content: str) -> bool:
+        return self._deliver(self._text_payload(title, content), 'text')
+
+    def send_with_images(self, title: str, content: str, image_paths: List[Path],
+                         weights: Optional[List[float]] = None) -> bool:
+        if not image_paths:
+            return self.send_text(title, content)
+
+        urls = ImageHelper.upload_images(image_paths, self.imgbed, deadline=self.deadline)
+        urls = [url for url in urls if url]
+        if not urls:
+            return self.send_text(title, f"{content}\n\n注意：图片上传失败，请在程序中查看历史记录。")
+
+        desp = content + ''.join(f"\n\n![图片 {i}]({url})" for i, url in enumerate(urls, 1))
+        return self._deliver({'title': title, 'desp': desp}, 'url')
+
+    def send_payload(self, payload: Dict) -> bool:
+        return self._deliver(payload, 'retry')
+
+
+class SmtpNotifier(BaseNotifier):
+    """
+    SMTP 邮件通知器
+
+    图片作为附件发送，超过大小限制时按通知图片格式压缩
+    """
+
+    PROVIDER = 'smtp'
+
+    def __init__(self, host: str, port: int = 465, username: str = '', password: str = '',
+                 sender: str = '', recipients: Optional[List[str]] = None, use_ssl: bool = True,
+                 starttls: bool = False, max_attachment_kb: float = 1024, **options):
+        """
+        初始化 SMTP 通知器
+
+        Args:
+            host: SMTP 服务器
+            port: 端口
+            username: 登录用户名，为空时不登录
+            password: 登录密码或授权码
+            sender: 发件人，默认为 username
+            recipients: 收件人列表
+            use_ssl: 是否使用 SMTP over SSL
+            starttls: 非 SSL 连接时是否使用 STARTTLS
+            max_attachment_kb: 单个附件的最大大小（KB）
+            options: 通用选项，参见 BaseNotifier
+        """
+        super().__init__(**options)
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.recipients = recipients or []
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.max_attachment_kb = max_attachment_kb
+
+    @property
+    def endpoint(self) -> str:
+        return f"smtp://{self.host}"
+
+    def _attachment(self, image_path: Path):
+        """读取附件内容，超过大小限制时压缩"""
+        if ImageHelper.get_image_size_kb(image_path) <= self.max_attachment_kb:
+            mime_type = mimetypes.guess_type(image_path.name)[0] or 'application/octet-stream'
+            return image_path.name, image_path.read_bytes(), mime_type
+
+        data = ImageHelper.encode_to_size(image_path, self.max_attachment_kb, image_format=self.image_format,
+                                          deadline=self.deadline)
+        if data is None:
+            return None
+
+        suffix = ImageHelper.IMAGE_FORMATS[self.image_format]['suffix']
+        return f"{image_path.stem}{suffix}", data, ImageHelper.get_mime_type(self.image_format)
+
+    def _build_message(self, payload: Dict) -> EmailMessage:
+        """
+        根据请求内容构建邮件
+
+        发件箱重试时附件图片可能已被清理或归档，缺失的附件在正文中注明并记录到 payload_warning
+        """
+        attachments = []
+        missing = []
+        for path in payload.get('attachments', []):
+            path = Path(path)
+            if not path.exists():
+                missing.append(path.name)
+                continue
+            attachment = self._attachment(path)
+            if attachment is not None:
+                attachments.append(attachment)
+
+        body = payload['body']
+        if missing:
+            self.payload_warning = f"{len(missing)} 个附件图片已不存在: {', '.join(missing)}"
+            logger.warning(f"邮件通知 {self.payload_warning}")
+            body += f"\n\n注意：{len(missing)} 张图片已被清理，未能附上，请在程序中查看历史记录。"
+
+        message = EmailMessage()
+        message['Subject'] = payload['subject']
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(body)
+
+        for filename, data, mime_type in attachments:
+            maintype, subtype = mime_type.split('/', 1)
+            message.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+
+        return message
+
+    def _deliver(self, payload: Dict, method: str) -> bool:
+        """发送邮件"""
+        if not self.recipients:
+            logger.error("SMTP 未配置收件人")
+            return False
+
+        connected = False
+        try:
+            message = self._build_message(payload)
+
+            smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+            with smtp_class(self.host, self.port, timeout=self._request_timeout()[1]) as server:
+                connected = True
+                if not self.use_ssl and self.starttls:
+                    server.starttls()
+                if self.username:
+                    server.login(self.username, self.password)
+                server.send_message(message)
+
+            self.last_method = method
+            logger.info(f"邮件通知发送成功 ({method})")
+            return True
+
+        except smtplib.SMTPAuthenticationError as e:
+            logger.error(f"SMTP 登录失败: {e}")
+            return False
+
+        except (OSError, smtplib.SMTPException) as e:
+            # 连接失败、服务器断开等网络问题，稍后重试；没连上服务器时不计入熔断
+            self.network_error = not connected and not isinstance(e, smtplib.SMTPException)
+            logger.error(f"邮件通知发送异常: {e}")
+            self._remember_pending(payload, method)
+            return False
+
+    def _text_payload(self, title: str, content: str) -> Dict:
+        return {'subject': title, 'body': content, 'attachments': []}
+
+    def send_text(self, title: str, content: str) -> bool:
+        return self._deliver(self._text_payload(title, content), 'text')
+
+    def send_with_images(self, title: str, content: str, image_paths: List[Path],
+                         weights: Optional[List[float]] = None) -> bool:
+        attachments = [str(path) for path in image_paths]
+        method = 'attachment' if attachments else 'text'
+        return self._deliver({'subject': title, 'body': content, 'attachments': attachments}, method)
+
+    def send_payload(self, payload: Dict) -> bool:
+        return self._deliver(payload, 'retry')
+
+
+# 渠道名称到通知器类的映射
+CHANNEL_CLASSES = {
+    'pushplus': PushPlusNotifier,
+    'webhook': WebhookNotifier,
+    'serverchan': ServerChanNotifier,
+    'smtp': SmtpNotifier
+}
+
+# 使用 notification.token 作为凭据的主渠道及其参数名
+PRIMARY_CREDENTIALS = {
+    'pushplus': 'token',
+    'serverchan': 'sendkey'
+}
+
+# 配置文件中的 Token 占位符
+TOKEN_PLACEHOLDER = "请在此处填写您的 PushPlus Token"
+
+
+def _unique_channel_name(name: str, existing: List[str]) -> str:
+    """
+    生成不重复的渠道名称
+
+    Args:
+        name: 配置的名称或渠道类型
+        existing: 已使用的名称
+
+    Returns:
+        name 未被使用时原样返回，否则为 name-2、name-3……中第一个未使用的
+    """
+    if name not in existing:
+        return name
+
+    index = 2
+    while f"{name}-{index}" in existing:
+        index += 1
+    return f"{name}-{index}"
+
+
+def create_notifier(notification_config: Dict, db: Optional[Database] = None) -> Optional[BaseNotifier]:
+    """
+    根据通知配置创建通知器
+
+    主渠道由 provider + token（可选 api_url 覆盖接口地址）指定（兼容旧配置），
+    recipients 为主渠道的其他接收者（PushPlus 好友令牌或 Server酱 SendKey），
+    topic 为 PushPlus 群组编码；额外渠道在 channels 中配置，例如：
+    "channels": [
+        {"provider": "webhook", "name": "home", "url": "http://127.0.0.1:8080/hook"},
+        {"provider": "smtp", "host": "smtp.example.com", "username": "...", "password": "...",
+         "recipients": ["me@example.com"]},
+        {"provider": "serverchan", "sendkey": "...", "enabled": false}
+    ]
+    多个渠道时按 policy（any/all/primary）判定整体是否成功；
+    每个渠道按 rate_limits 和 breaker 配置设置速率限制和熔断器。
+    渠道名称（name）用作限流熔断状态和发件箱条目的键，未配置时主渠道和每类第一个渠道为类型名，
+    同类型的其它渠道依次为 <类型>-2、<类型>-3……
+
+    Args:
+        notification_config: notification 配置节
+        db: 保存限流和熔断状态的数据库实例，默认为 data/history.db
+
+    Returns:
+        通知器，没有可用渠道时返回 None
+    """
+    options = {
+        'image_format': notification_config.get('image_format', 'jpeg'),
+        'image_weights': notification_config.get('image_weights'),
+        'collage': notification_config.get('collage'),
+        'imgbed': notification_config.get('imgbed'),
+        'connect_timeout': notification_config.get('connect_timeout', 5),
+        'read_timeout': notification_config.get('read_timeout', 20)
+    }
+
+    channels = []
+
+    # 主渠道
+    provider = notification_config.get('provider', 'pushplus')
+    token = notification_config.get('token', '')
+    if token and token != TOKEN_PLACEHOLDER:
+        if provider in PRIMARY_CREDENTIALS:
+            channel_class = CHANNEL_CLASSES[provider]
+            settings = {
+                PRIMARY_CREDENTIALS[provider]: token,
+                'api_url': notification_config.get('api_url') or None,
+                'recipients': notification_config.get('recipients') or None
+            }
+            if provider == 'pushplus':
+                settings['topic'] = notification_config.get('topic', '')
+            channels.append(channel_class(**settings, **options))
+        else:
+            logger.warning(f"不支持的通知服务: {provider}")
+
+    # 额外渠道
+    for channel_config in notification_config.get('channels', []):
+        settings = dict(channel_config)
+        if not settings.pop('enabled', True):
+            continue
+
+        channel_provider = settings.pop('provider', '')
+        channel_class = CHANNEL_CLASSES.get(channel_provider)
+        if channel_class is None:
+            logger.warning(f"不支持的通知渠道: {channel_provider}")
+            continue
+
+        settings['name'] = _unique_channel_name(settings.get('name') or channel_provider,
+                                                [channel.name for channel in channels])
+        try:
+            channels.append(channel_class(**{**options, **settings}))
+        except TypeError as e:
+            logger.error(f"通知渠道 {channel_provider} 配置错误: {e}")
+
+    if not channels:
+        return None
+
+    db = db or Database()
+    for channel in channels:
+        channel.guard = create_guard(db, channel.name, notification_config.get('rate_limits'),
+                                     notification_config.get('breaker'), provider=channel.PROVIDER)
+
+    logger.info(f"通知渠道: {', '.join(channel.name for channel in channels)}")
+
+    if len(channels) == 1:
+        return channels[0]
+
+    return MultiNotifier(channels, policy=notification_config.get('policy', 'any'), **options)
@@ -3,18 +3,46 @@
 使用 SQLite 存储历史记录
 """
 
+import json
+import base64
 import sqlite3
+import tempfile
+import threading
 from pathlib import Path
-from typing import List, Dict, Optional
-from datetime import datetime
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
 
+from .migrations import migrate, rebuild_capture_stats
+from .writer import WriteQueue, WriteOperation
 from ..utils.logger import Logger
 
 logger = Logger()
 
 
 class Database:
-    """SQLite 数据库管理器"""
+    """
+    SQLite 数据库管理器
+
+    每个线程使用一个长期连接（首次访问时打开），避免每次查询都重新连接；
+    WAL 模式下历史窗口的读取不会阻塞监控任务的写入。
+    写操作统一交给同一数据库文件共用的写队列，在专用线程中按顺序批量提交
+    """
+
+    # 等待其它进程释放写锁的最长时间（毫秒）
+    BUSY_TIMEOUT_MS = 5000
+
+    # 内存映射大小（字节）
+    MMAP_SIZE = 64 * 1024 * 1024
+
+    # 页缓存大小（KB）
+    CACHE_SIZE_KB = 8192
+
+    # 历史列表需要的列（均包含在复合覆盖索引中，查询只扫描索引）
+    LIST_COLUMNS = 'id, trigger_type, trigger_time, notification_sent, notification_method'
+
+    # capture_images 表的图片属性列（kind 和 path 必填）
+    IMAGE_COLUMNS = ('kind', 'monitor_index', 'path', 'byte_size', 'width', 'height', 'content_hash', 'encode_ms')
 
     def __init__(self, db_path: Path = None):
         """
@@ -29,57 +57,123 @@ class Database:
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
+        # 各线程的长期连接
+        self._local = threading.local()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+
         logger.info(f"初始化数据库: {self.db_path}")
         self._init_database()
 
-    def _init_database(self):
-        """创建数据库表（如果不存在）"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        # 写队列在迁移完成后再使用
+        self._writer = WriteQueue.for_path(self.db_path, self._open)
+
+    def _open(self) -> sqlite3.Connection:
+        """打开新连接并设置 WAL 模式和性能参数"""
+        conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}')
+        conn.execute(f'PRAGMA mmap_size={self.MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size=-{self.CACHE_SIZE_KB}')
+        conn.execute('PRAGMA foreign_keys=ON')  # 删除历史记录时级联删除图片行
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        获取当前线程的连接
 
-            # 创建历史记录表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS capture_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    trigger_type TEXT NOT NULL,
-                    trigger_time TEXT NOT NULL,
-                    camera_path TEXT,
-                    screenshot_path TEXT,
-                    notification_sent INTEGER DEFAULT 0,
-                    notification_method TEXT,
-                    created_at TEXT NOT NULL
-                )
-            ''')
+        连接用作上下文管理器：正常结束时提交，异常时回滚（连接保持打开）
 
-            # 创建索引以加速查询
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_trigger_time
-                ON capture_history(trigger_time)
-            ''')
+        Returns:
+            数据库连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        conn = self._open()
+        self._local.conn = conn
+        with self._lock:
+            # 关闭已退出线程遗留的连接（多渠道并发发送使用临时线程）
+            for thread in [t for t in self._connections if not t.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = conn
+        return conn
+
+    def submit_write(self, operation: WriteOperation) -> Future:
+        """
+        提交写操作到写队列，立即返回
 
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_trigger_type
-                ON capture_history(trigger_type)
-            ''')
+        Args:
+            operation: 写操作，接收写线程连接的游标，返回值作为 Future 的结果
 
-            conn.commit()
-            conn.close()
+        Returns:
+            Future，事务提交后可取得写操作的返回值
+        """
+        return self._writer.submit(operation)
+
+    def _write(self, operation: WriteOperation):
+        """提交写操作并等待提交完成，写操作或提交失败时抛出异常"""
+        return self._writer.execute(operation)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待写队列中已提交的写操作全部完成
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            是否在超时前完成
+        """
+        return self._writer.flush(timeout)
+
+    def close(self):
+        """写完队列中的写操作并关闭所有线程的连接（程序退出时调用），之后的查询会重新打开连接"""
+        self.flush()
+
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._local = threading.local()
+
+        for conn in connections:
+            try:
+                conn.execute('PRAGMA optimize')
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"关闭数据库连接失败: {e}")
+
+        if connections:
+            logger.debug(f"数据库连接已关闭 ({len(connections)} 个)")
+
+    def _init_database(self):
+        """创建数据库表并执行未完成的迁移"""
+        try:
+            migrate(self._connect())
             logger.info("数据库表初始化成功")
 
         except Exception as e:
             logger.error(f"数据库初始化失败: {e}")
             raise
 
+    @staticmethod
+    def to_epoch_ms(value: datetime) -> int:
+        """把本地时间转换为 Unix 毫秒时间戳（trigger_ts 列的取值）"""
+        return int(round(value.timestamp() * 1000))
+
     def add_record(self,
                    trigger_type: str,
                    trigger_time: datetime,
                    camera_path: Optional[Path] = None,
                    screenshot_path: Optional[Path] = None,
                    notification_sent: bool = False,
-                   notification_method: str = 'none') -> int:
+                   notification_method: str = 'none',
+                   images: Optional[List[Dict]] = None) -> int:
         """
-        添加一条历史记录
+        添加一条历史记录（等待写入提交）
 
         Args:
             trigger_type: 触发类型（boot/wake/manual）
@@ -88,39 +182,155 @@ class Database:
             screenshot_path: 屏幕截图路径
             notification_sent: 是否发送通知成功
             notification_method: 通知方式（base64/text/failed/none）
+            images: 本次触发的全部图片（字段见 IMAGE_COLUMNS），与记录在同一事务中写入
 
         Returns:
             记录ID
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            record_id = self.add_record_async(
+                trigger_type, trigger_time, camera_path, screenshot_path,
+                notification_sent, notification_method, images
+            ).result()
+
+            logger.info(f"添加历史记录成功: ID={record_id}, 类型={trigger_type}")
+            return record_id
+
+        except Exception as e:
+            logger.error(f"添加历史记录失败: {e}")
+            return -1
+
+    def add_record_async(self,
+                         trigger_type: str,
+                         trigger_time: datetime,
+                         camera_path: Optional[Path] = None,
+                         screenshot_path: Optional[Path] = None,
+                         notification_sent: bool = False,
+                         notification_method: str = 'none',
+                         images: Optional[List[Dict]] = None) -> Future:
+        """
+        提交一条历史记录，不等待写入提交
 
+        Args:
+            同 add_record
+
+        Returns:
+            Future，结果为记录ID；写入失败时 result() 抛出异常
+        """
+        values = (
+            trigger_type,
+            trigger_time.isoformat(),
+            self.to_epoch_ms(trigger_time),
+            str(camera_path) if camera_path else None,
+            str(screenshot_path) if screenshot_path else None,
+            1 if notification_sent else 0,
+            notification_method,
+            datetime.now().isoformat()
+        )
+
+        def insert(cursor):
             cursor.execute('''
                 INSERT INTO capture_history
-                (trigger_type, trigger_time, camera_path, screenshot_path,
+                (trigger_type, trigger_time, trigger_ts, camera_path, screenshot_path,
                  notification_sent, notification_method, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                trigger_type,
-                trigger_time.isoformat(),
-                str(camera_path) if camera_path else None,
-                str(screenshot_path) if screenshot_path else None,
-                1 if notification_sent else 0,
-                notification_method,
-                datetime.now().isoformat()
-            ))
-
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values)
             record_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-
-            logger.info(f"添加历史记录成功: ID={record_id}, 类型={trigger_type}")
+            if images:
+                self._insert_images(cursor, record_id, images)
             return record_id
 
+        return self.submit_write(insert)
+
+    def _insert_images(self, cursor: sqlite3.Cursor, record_id: int, images: List[Dict]):
+        """在当前写事务中批量插入一条记录的图片行"""
+        created_at = datetime.now().isoformat()
+        placeholders = ', '.join('?' * (len(self.IMAGE_COLUMNS) + 2))
+        cursor.executemany(f'''
+            INSERT INTO capture_images (record_id, {', '.join(self.IMAGE_COLUMNS)}, created_at)
+            VALUES ({placeholders})
+        ''', [
+            (record_id, *(str(image[column]) if column == 'path' else image.get(column)
+                          for column in self.IMAGE_COLUMNS), created_at)
+            for image in images
+        ])
+
+    def add_capture_images(self, record_id: int, images: List[Dict]) -> bool:
+        """
+        为已有的历史记录添加图片（一次写事务）
+
+        Args:
+            record_id: 记录ID
+            images: 图片列表，字段见 IMAGE_COLUMNS
+
+        Returns:
+            是否添加成功
+        """
+        if not images:
+            return True
+
+        try:
+            self._write(lambda cursor: self._insert_images(cursor, record_id, images))
+            logger.debug(f"添加图片成功: 记录={record_id}, {len(images)} 张")
+            return True
+
         except Exception as e:
-            logger.error(f"添加历史记录失败: {e}")
-            return -1
+            logger.error(f"添加图片失败 (记录={record_id}): {e}")
+            return False
+
+    def get_capture_images(self, record_id: int, kind: Optional[str] = None) -> List[Dict]:
+        """
+        获取历史记录关联的图片
+
+        Args:
+            record_id: 记录ID
+            kind: 图片类型（camera/screenshot/monitor/burst/thumbnail），None 表示全部
+
+        Returns:
+            图片列表，按类型和显示器编号排序
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                query = 'SELECT * FROM capture_images WHERE record_id = ?'
+                params = [record_id]
+                if kind:
+                    query += ' AND kind = ?'
+                    params.append(kind)
+                query += ' ORDER BY kind, monitor_index, id'
+
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"查询图片失败 (记录={record_id}): {e}")
+            return []
+
+    def find_images_by_hash(self, content_hash: str) -> List[Dict]:
+        """
+        按内容哈希查找图片（用于发现重复图片）
+
+        Args:
+            content_hash: 图片文件的 SHA-256
+
+        Returns:
+            图片列表
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT * FROM capture_images WHERE content_hash = ? ORDER BY id', (content_hash,))
+                rows = cursor.fetchall()
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"按哈希查询图片失败: {e}")
+            return []
 
     def get_all_records(self, limit: int = 100, offset: int = 0) -> List[Dict]:
         """
@@ -134,18 +344,16 @@ class Database:
             历史记录列表
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
-            cursor = conn.cursor()
+            with self._connect() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                SELECT * FROM capture_history
-                ORDER BY trigger_time DESC
-                LIMIT ? OFFSET ?
-            ''', (limit, offset))
+                cursor.execute('''
+                    SELECT * FROM capture_history
+                    ORDER BY trigger_time DESC, id DESC
+                    LIMIT ? OFFSET ?
+                ''', (limit, offset))
 
-            rows = cursor.fetchall()
-            conn.close()
+                rows = cursor.fetchall()
 
             # 转换为字典列表
             records = [dict(row) for row in rows]
@@ -171,20 +379,11 @@ class Database:
             if end_date is None:
                 end_date = start_date
 
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            # 结束日期当天包含在内：区间为 [开始日期 0 点, 结束日期次日 0 点)
+            start = datetime.fromisoformat(start_date)
+            end = datetime.fromisoformat(end_date) + timedelta(days=1)
+            records = self.get_records_between(start, end)
 
-            cursor.execute('''
-                SELECT * FROM capture_history
-                WHERE DATE(trigger_time) BETWEEN ? AND ?
-                ORDER BY trigger_time DESC
-            ''', (start_date, end_date))
-
-            rows = cursor.fetchall()
-            conn.close()
-
-            records = [dict(row) for row in rows]
             logger.info(f"查询到 {len(records)} 条历史记录（{start_date} ~ {end_date}）")
             return records
 
@@ -192,6 +391,172 @@ class Database:
             logger.error(f"按日期查询历史记录失败: {e}")
             return []
 
+    def get_records_between(self, start: datetime, end: datetime, limit: Optional[int] = None) -> List[Dict]:
+        """
+        查询时间范围 [start, end) 内的历史记录
+
+        条件直接作用于带索引的 trigger_ts 列（不对列做函数运算），查询走索引范围扫描
+
+        Args:
+            start: 开始时间（包含）
+            end: 结束时间（不包含）
+            limit: 返回记录数量限制，None 表示不限制
+
+        Returns:
+            历史记录列表（按触发时间倒序）
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('''
+                    SELECT * FROM capture_history
+                    WHERE trigger_ts >= ? AND trigger_ts < ?
+                    ORDER BY trigger_ts DESC
+                    LIMIT ?
+                ''', (self.to_epoch_ms(start), self.to_epoch_ms(end), -1 if limit is None else limit))
+
+                rows = cursor.fetchall()
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"按时间范围查询历史记录失败: {e}")
+            return []
+
+    @staticmethod
+    def _encode_cursor(direction: str, record: Dict) -> str:
+        """把翻页方向和边界记录的 (trigger_time, id) 编码为不透明游标"""
+        data = json.dumps([direction, record['trigger_time'], record['id']]).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, str, int]:
+        """解析游标，格式错误时抛出 ValueError"""
+        try:
+            direction, trigger_time, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except Exception:
+            raise ValueError(f"无效的分页游标: {cursor}")
+        if direction not in ('next', 'prev'):
+            raise ValueError(f"无效的分页游标: {cursor}")
+        return direction, str(trigger_time), int(record_id)
+
+    def _records_page_query(self,
+                            limit: int,
+                            cursor: Optional[str],
+                            trigger_type: Optional[str],
+                            start_date: Optional[str],
+                            end_date: Optional[str],
+                            notification_sent: Optional[bool],
+                            archived: bool) -> Tuple[str, List, str]:
+        """
+        生成分页查询的 SQL（参数含义同 get_records_page）
+
+        筛选、排序和游标都只用 (trigger_time, id)：日期转换为 trigger_time 的范围条件，
+        是 idx_list_* / idx_archive_time 覆盖索引 trigger_time 列上的范围，
+        按时间倒序直接沿索引读取，不需要临时排序
+
+        Returns:
+            (SQL, 参数, 翻页方向)
+        """
+        conditions = []
+        params = []
+
+        if trigger_type:
+            conditions.append('trigger_type = ?')
+            params.append(trigger_type)
+        # 半开区间，结束日期当天包含在内；边界与写入时一样用 isoformat 生成，字符串比较与时间顺序一致
+        if start_date:
+            conditions.append('trigger_time >= ?')
+            params.append(datetime.fromisoformat(start_date).isoformat())
+        if end_date:
+            conditions.append('trigger_time < ?')
+            params.append((datetime.fromisoformat(end_date) + timedelta(days=1)).isoformat())
+        if notification_sent is not None:
+            conditions.append('notification_sent = ?')
+            params.append(1 if notification_sent else 0)
+
+        direction = 'next'
+        if cursor:
+            direction, trigger_time, record_id = self._decode_cursor(cursor)
+            conditions.append('(trigger_time, id) < (?, ?)' if direction == 'next'
+                              else '(trigger_time, id) > (?, ?)')
+            params.extend([trigger_time, record_id])
+
+        # 向前翻页时按正序取离游标最近的记录，再反转为倒序
+        order = 'DESC' if direction == 'next' else 'ASC'
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        table = 'archive_index' if archived else 'capture_history'
+
+        sql = f'''
+            SELECT {self.LIST_COLUMNS} FROM {table}
+            {where}
+            ORDER BY trigger_time {order}, id {order}
+            LIMIT ?
+        '''
+        return sql, params + [limit + 1], direction
+
+    def get_records_page(self,
+                         limit: int = 50,
+                         cursor: Optional[str] = None,
+                         trigger_type: Optional[str] = None,
+                         start_date: Optional[str] = None,
+                         end_date: Optional[str] = None,
+                         notification_sent: Optional[bool] = None,
+                         archived: bool = False) -> Dict:
+        """
+        按触发时间倒序分页查询历史记录（游标分页）
+
+        以上一页边界记录的 (trigger_time, id) 作为查询起点，走索引直接定位，
+        翻到多深的位置查询代价都相同（OFFSET 需要扫描并丢弃前面所有行）。
+        只返回列表需要的列（LIST_COLUMNS），查询只扫描覆盖索引；完整记录用 get_record_by_id 获取
+
+        Args:
+            limit: 每页记录数
+            cursor: 上一次返回的 next_cursor 或 prev_cursor，None 表示第一页
+            trigger_type: 按触发类型筛选
+            start_date: 开始日期（格式：YYYY-MM-DD）
+            end_date: 结束日期（包含当天）
+            notification_sent: 按通知是否成功筛选
+            archived: 查询已归档的记录（archive_index），完整记录用 HistoryArchive.open_record 获取
+
+        Returns:
+            {'records': 本页记录, 'next_cursor': 下一页（更早）游标, 'prev_cursor': 上一页（更新）游标}，
+            没有对应页时游标为 None
+        """
+        page = {'records': [], 'next_cursor': None, 'prev_cursor': None}
+
+        try:
+            sql, params, direction = self._records_page_query(
+                limit, cursor, trigger_type, start_date, end_date, notification_sent, archived
+            )
+            with self._connect() as conn:
+                rows = conn.execute(sql, params).fetchall()
+
+            # 多取一条用于判断该方向是否还有更多记录
+            has_more = len(rows) > limit
+            records = [dict(row) for row in rows[:limit]]
+            if direction == 'prev':
+                records.reverse()
+
+            page['records'] = records
+            if records:
+                if direction == 'next':
+                    more_before, more_after = has_more, cursor is not None
+                else:
+                    more_before, more_after = True, has_more
+                if more_before:
+                    page['next_cursor'] = self._encode_cursor('next', records[-1])
+                if more_after:
+                    page['prev_cursor'] = self._encode_cursor('prev', records[0])
+
+            logger.debug(f"分页查询到 {len(records)} 条历史记录")
+            return page
+
+        except Exception as e:
+            logger.error(f"分页查询历史记录失败: {e}")
+            return page
+
     def get_records_by_type(self, trigger_type: str, limit: int = 100) -> List[Dict]:
         """
         按触发类型查询历史记录
@@ -204,19 +569,17 @@ class Database:
             历史记录列表
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            with self._connect() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                SELECT * FROM capture_history
-                WHERE trigger_type = ?
-                ORDER BY trigger_time DESC
-                LIMIT ?
-            ''', (trigger_type, limit))
+                cursor.execute('''
+                    SELECT * FROM capture_history
+                    WHERE trigger_type = ?
+                    ORDER BY trigger_time DESC, id DESC
+                    LIMIT ?
+                ''', (trigger_type, limit))
 
-            rows = cursor.fetchall()
-            conn.close()
+                rows = cursor.fetchall()
 
             records = [dict(row) for row in rows]
             logger.info(f"查询到 {len(records)} 条 {trigger_type} 类型记录")
@@ -237,13 +600,11 @@ class Database:
             历史记录字典，不存在则返回None
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            with self._connect() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('SELECT * FROM capture_history WHERE id = ?', (record_id,))
-            row = cursor.fetchone()
-            conn.close()
+                cursor.execute('SELECT * FROM capture_history WHERE id = ?', (record_id,))
+                row = cursor.fetchone()
 
             if row:
                 return dict(row)
@@ -264,12 +625,7 @@ class Database:
             是否删除成功
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('DELETE FROM capture_history WHERE id = ?', (record_id,))
-            conn.commit()
-            conn.close()
+            self._write(lambda cursor: cursor.execute('DELETE FROM capture_history WHERE id = ?', (record_id,)))
 
             logger.info(f"删除历史记录成功: ID={record_id}")
             return True
@@ -278,34 +634,218 @@ class Database:
             logger.error(f"删除历史记录失败: {e}")
             return False
 
+    def purge_records(self, before_ts: Optional[int], keep_latest: Optional[int], limit: int) -> Optional[Dict]:
+        """
+        删除最早的一批过期或超出数量的历史记录（一次写事务）
+
+        从最早的记录开始按时间顺序检查，遇到第一条既未过期也未超出数量的记录即停止；
+        选择和删除在同一事务中完成，多个进程同时清理时不会多删。
+        图片行随记录级联删除，图片文件由调用方在提交后删除
+
+        Args:
+            before_ts: 早于该 Unix 毫秒时间戳的记录视为过期，None 表示不按时间清理
+            keep_latest: 最多保留的最近记录数，None 表示不限
+            limit: 本批最多删除的记录数
+
+        Returns:
+            {'deleted': 删除的记录数, 'paths': 被删除记录的图片路径列表}，失败返回 None
+        """
+        def purge(cursor):
+            excess = 0
+            if keep_latest is not None:
+                cursor.execute("SELECT COALESCE(SUM(total), 0) FROM capture_stats WHERE day = '*'")
+                excess = max(0, cursor.fetchone()[0] - keep_latest)
+
+            cursor.execute('''
+                SELECT id, trigger_ts, camera_path, screenshot_path
+                FROM capture_history
+                ORDER BY trigger_time, id
+                LIMIT ?
+            ''', (limit,))
+
+            record_ids, paths = [], []
+            for position, row in enumerate(cursor.fetchall()):
+                expired = before_ts is not None and row['trigger_ts'] is not None and row['trigger_ts'] < before_ts
+                if position >= excess and not expired:
+                    break
+                record_ids.append(row['id'])
+                paths.extend(path for path in (row['camera_path'], row['screenshot_path']) if path)
+
+            if record_ids:
+                placeholders = ', '.join('?' * len(record_ids))
+                cursor.execute(f'SELECT path FROM capture_images WHERE record_id IN ({placeholders})', record_ids)
+                paths.extend(row[0] for row in cursor.fetchall())
+                cursor.execute(f'DELETE FROM capture_history WHERE id IN ({placeholders})', record_ids)
+
+            return {'deleted': len(record_ids), 'paths': list(dict.fromkeys(paths))}
+
+        try:
+            return self._write(purge)
+
+        except Exception as e:
+            logger.error(f"清理历史记录失败: {e}")
+            return None
+
+    def get_archive_candidates(self, before_ts: int, limit: int) -> List[Dict]:
+        """
+        获取最早的一批待归档记录（含图片行）
+
+        Args:
+            before_ts: 早于该 Unix 毫秒时间戳的记录需要归档
+            limit: 返回数量限制
+
+        Returns:
+            完整历史记录列表（按时间正序），每条记录的 images 为其图片行列表
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('''
+                    SELECT * FROM capture_history
+                    WHERE trigger_ts < ?
+                    ORDER BY trigger_ts, id
+                    LIMIT ?
+                ''', (before_ts, limit))
+                records = [dict(row) for row in cursor.fetchall()]
+
+                if records:
+                    placeholders = ', '.join('?' * len(records))
+                    cursor.execute(f'''
+                        SELECT * FROM capture_images
+                        WHERE record_id IN ({placeholders})
+                        ORDER BY record_id, kind, monitor_index, id
+                    ''', [record['id'] for record in records])
+                    images = cursor.fetchall()
+                else:
+                    images = []
+
+            by_record = {record['id']: record for record in records}
+            for record in records:
+                record['images'] = []
+            for image in images:
+                by_record[image['record_id']]['images'].append(dict(image))
+            return records
+
+        except Exception as e:
+            logger.error(f"查询待归档记录失败: {e}")
+            return []
+
+    def archive_records(self, entries: List[Dict]) -> List[int]:
+        """
+        把已写入归档文件的记录移出历史记录表（一次写事务）
+
+        只处理仍存在的记录（可能已被清理或删除），图片行随记录级联删除
+
+        Args:
+            entries: 归档索引条目，包含 id、trigger_type、trigger_time、trigger_ts、notification_sent、
+                     notification_method、month、image_count、records_offset、record_line
+
+        Returns:
+            实际归档的记录ID列表，失败返回空列表
+        """
+        if not entries:
+            return []
+
+        def move(cursor):
+            placeholders = ', '.join('?' * len(entries))
+            cursor.execute(f'SELECT id FROM capture_history WHERE id IN ({placeholders})',
+                           [entry['id'] for entry in entries])
+            existing = {row[0] for row in cursor.fetchall()}
+            moved = [entry for entry in entries if entry['id'] in existing]
+            if not moved:
+                return []
+
+            archived_at = datetime.now().isoformat()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO archive_index
+                (id, trigger_type, trigger_time, trigger_ts, notification_sent, notification_method,
+                 month, image_count, records_offset, record_line, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                entry['id'], entry['trigger_type'], entry['trigger_time'], entry['trigger_ts'],
+                entry['notification_sent'], entry['notification_method'], entry['month'], entry['image_count'],
+                entry['records_offset'], entry['record_line'], archived_at
+            ) for entry in moved])
+
+            record_ids = [entry['id'] for entry in moved]
+            cursor.execute(f"DELETE FROM capture_history WHERE id IN ({', '.join('?' * len(record_ids))})",
+                           record_ids)
+            return record_ids
+
+        try:
+            return self._write(move)
+
+        except Exception as e:
+            logger.error(f"移出已归档记录失败: {e}")
+            return []
+
+    def get_archived_record(self, record_id: int) -> Optional[Dict]:
+        """
+        根据ID获取归档索引条目
+
+        Args:
+            record_id: 原历史记录ID
+
+        Returns:
+            索引条目（含所在月份 month 和文件位置 records_offset、record_line），不存在时返回None
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT * FROM archive_index WHERE id = ?', (record_id,))
+                row = cursor.fetchone()
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"查询归档记录失败 (ID={record_id}): {e}")
+            return None
+
+    def vacuum(self) -> bool:
+        """
+        重建数据库文件，归还删除记录后的空闲页（需要独占数据库，只在手动维护时调用）
+
+        Returns:
+            是否成功
+        """
+        try:
+            self.flush()
+            conn = self._connect()
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute('VACUUM')
+            logger.info("数据库已重建")
+            return True
+
+        except Exception as e:
+            logger.error(f"重建数据库失败: {e}")
+            return False
+
     def get_statistics(self) -> Dict:
         """
         获取统计信息
 
+        读取触发器维护的累计计数（每种触发类型一行），不扫描历史记录表
+
         Returns:
             统计信息字典
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # 总记录数
-            cursor.execute('SELECT COUNT(*) FROM capture_history')
-            total_count = cursor.fetchone()[0]
-
-            # 各类型记录数
-            cursor.execute('''
-                SELECT trigger_type, COUNT(*) as count
-                FROM capture_history
-                GROUP BY trigger_type
-            ''')
-            type_counts = {row[0]: row[1] for row in cursor.fetchall()}
+            with self._connect() as conn:
+                cursor = conn.cursor()
 
-            # 通知成功率
-            cursor.execute('SELECT COUNT(*) FROM capture_history WHERE notification_sent = 1')
-            notification_success = cursor.fetchone()[0]
+                cursor.execute('''
+                    SELECT trigger_type, total, notification_sent
+                    FROM capture_stats
+                    WHERE day = '*'
+                ''')
+                rows = cursor.fetchall()
 
-            conn.close()
+            type_counts = {row['trigger_type']: row['total'] for row in rows}
+            total_count = sum(type_counts.values())
+            notification_success = sum(row['notification_sent'] for row in rows)
 
             stats = {
                 'total_count': total_count,
@@ -323,12 +863,519 @@ class Database:
             logger.error(f"获取统计信息失败: {e}")
             return {}
 
+    def get_daily_statistics(self, start_date: str, end_date: Optional[str] = None) -> List[Dict]:
+        """
+        获取按日汇总的统计信息
+
+        Args:
+            start_date: 开始日期（格式：YYYY-MM-DD）
+            end_date: 结束日期（包含当天，默认为开始日期当天）
+
+        Returns:
+            [{'day', 'trigger_type', 'total', 'notification_sent'}] 列表，按日期排序
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('''
+                    SELECT day, trigger_type, total, notification_sent
+                    FROM capture_stats
+                    WHERE day >= ? AND day <= ? AND day != '*' AND total > 0
+                    ORDER BY day, trigger_type
+                ''', (start_date, end_date or start_date))
+
+                rows = cursor.fetchall()
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"获取按日统计失败: {e}")
+            return []
+
+    def verify_statistics(self, repair: bool = True) -> bool:
+        """
+        检查统计计数与历史记录是否一致（全表扫描，只在维护时调用），不一致时重建
+
+        Args:
+            repair: 不一致时是否重建计数
+
+        Returns:
+            检查时计数是否一致
+        """
+        def check(cursor):
+            cursor.execute('''
+                SELECT substr(trigger_time, 1, 10) AS day, trigger_type,
+                       COUNT(*) AS total, SUM(notification_sent != 0) AS notification_sent
+                FROM capture_history
+                GROUP BY 1, 2
+            ''')
+            actual = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+            for (day, trigger_type), (total, sent) in list(actual.items()):
+                overall = actual.get(('*', trigger_type), (0, 0))
+                actual[('*', trigger_type)] = (overall[0] + total, overall[1] + sent)
+
+            cursor.execute('SELECT day, trigger_type, total, notification_sent FROM capture_stats WHERE total != 0')
+            counted = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+
+            consistent = actual == counted
+            if not consistent:
+                drifted = sorted(key for key in set(actual) | set(counted) if actual.get(key) != counted.get(key))
+                logger.warning(f"统计计数不一致 ({len(drifted)} 项)，例如: {drifted[:3]}")
+                if repair:
+                    rebuild_capture_stats(cursor)
+                    logger.info("统计计数已重建")
+            return consistent
+
+        try:
+            # 在写事务中检查，检查期间计数不会变化
+            return self._write(check)
+
+        except Exception as e:
+            logger.error(f"检查统计计数失败: {e}")
+            return False
+
+    def update_notification_status(self, record_id: int, notification_sent: bool,
+                                   notification_method: str, only_if_unsent: bool = False) -> bool:
+        """
+        更新历史记录的通知状态
+
+        Args:
+            record_id: 记录ID
+            notification_sent: 是否发送通知成功
+            notification_method: 通知方式
+            only_if_unsent: 只更新尚未标记为已送达的记录（标记失败时使用，
+                不覆盖文字通知或其它渠道已送达的状态）
+
+        Returns:
+            是否更新成功
+        """
+        try:
+            def update(cursor):
+                cursor.execute(f'''
+                    UPDATE capture_history
+                    SET notification_sent = ?, notification_method = ?
+                    WHERE id = ?{' AND notification_sent = 0' if only_if_unsent else ''}
+                ''', (1 if notification_sent else 0, notification_method, record_id))
+
+            self._write(update)
+            return True
+
+        except Exception as e:
+            logger.error(f"更新通知状态失败 (ID={record_id}): {e}")
+            return False
+
+    def add_outbox_entry(self,
+                         record_id: Optional[int],
+                         provider: str,
+                         payload: Dict,
+                         notification_method: str,
+                         next_attempt_at: float) -> int:
+        """
+        添加一条待重试的通知
+
+        Args:
+            record_id: 关联的历史记录ID
+            provider: 通知服务名称
+            payload: 已准备好的请求内容（不含 Token）
+            notification_method: 通知方式（base64/url/text）
+            next_attempt_at: 下次重试时间（Unix 时间戳）
+
+        Returns:
+            发件箱条目ID
+        """
+        try:
+            def insert(cursor):
+                cursor.execute('''
+                    INSERT INTO notification_outbox
+                    (record_id, provider, payload, notification_method, status,
+                     attempts, next_attempt_at, created_at)
+                    VALUES (?, ?, ?, ?, 'pending', 0, ?, ?)
+                ''', (
+                    record_id,
+                    provider,
+                    json.dumps(payload, ensure_ascii=False),
+                    notification_method,
+                    next_attempt_at,
+                    datetime.now().isoformat()
+                ))
+
+                return cursor.lastrowid
+
+            entry_id = self._write(insert)
+            logger.info(f"通知已加入发件箱: ID={entry_id}, 记录={record_id}")
+            return entry_id
+
+        except Exception as e:
+            logger.error(f"添加发件箱条目失败: {e}")
+            return -1
+
+    def get_due_outbox_entries(self, now: float, limit: int = 10) -> List[Dict]:
+        """
+        查询已到重试时间的发件箱条目
+
+        Args:
+            now: 当前时间（Unix 时间戳）
+            limit: 返回数量限制
+
+        Returns:
+            发件箱条目列表，payload 已解析为字典
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('''
+                    SELECT * FROM notification_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at
+                    LIMIT ?
+                ''', (now, limit))
+
+                rows = cursor.fetchall()
+
+            entries = []
+            for row in rows:
+                entry = dict(row)
+                entry['payload'] = json.loads(entry['payload'])
+                entries.append(entry)
+            return entries
+
+        except Exception as e:
+            logger.error(f"查询发件箱失败: {e}")
+            return []
+
+    def claim_outbox_entry(self, entry_id: int, expected_next_attempt_at: float, lease_until: float) -> bool:
+        """
+        领取一条发件箱条目（把下次重试时间推迟到租约结束）
+
+        只有 next_attempt_at 仍为查询时的值才能领取成功，多个进程同时重试时只有一个会成功
+
+        Args:
+            entry_id: 发件箱条目ID
+            expected_next_attempt_at: 查询时读到的下次重试时间
+            lease_until: 租约结束时间（Unix 时间戳）
+
+        Returns:
+            是否领取成功
+        """
+        try:
+            def claim(cursor):
+                cursor.execute('''
+                    UPDATE notification_outbox
+                    SET next_attempt_at = ?
+                    WHERE id = ? AND status = 'pending' AND next_attempt_at = ?
+                ''', (lease_until, entry_id, expected_next_attempt_at))
+
+                return cursor.rowcount == 1
+
+            return self._write(claim)
+
+        except Exception as e:
+            logger.error(f"领取发件箱条目失败 (ID={entry_id}): {e}")
+            return False
+
+    def update_outbox_entry(self,
+                            entry_id: int,
+                            status: str,
+                            attempts: int,
+                            next_attempt_at: float,
+                            last_error: Optional[str] = None) -> bool:
+        """
+        更新发件箱条目状态
+
+        Args:
+            entry_id: 发件箱条目ID
+            status: 状态（pending/sent/dead）
+            attempts: 已尝试次数
+            next_attempt_at: 下次重试时间（Unix 时间戳）
+            last_error: 最近一次失败原因
+
+        Returns:
+            是否更新成功
+        """
+        try:
+            def update(cursor):
+                cursor.execute('''
+                    UPDATE notification_outbox
+                    SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+                    WHERE id = ?
+                ''', (status, attempts, next_attempt_at, last_error, datetime.now().isoformat(), entry_id))
+
+            self._write(update)
+            return True
+
+        except Exception as e:
+            logger.error(f"更新发件箱条目失败 (ID={entry_id}): {e}")
+            return False
+
+    def add_digest_entry(self,
+                         record_id: Optional[int],
+                         trigger_type: str,
+                         trigger_time: datetime,
+                         camera_path: Optional[Path],
+                         screenshot_path: Optional[Path],
+                         created_at: float) -> int:
+        """
+        添加一条等待合并发送的触发
+
+        Args:
+            record_id: 关联的历史记录ID
+            trigger_type: 触发类型
+            trigger_time: 触发时间
+            camera_path: 摄像头图片路径
+            screenshot_path: 屏幕截图路径
+            created_at: 加入时间（Unix 时间戳）
+
+        Returns:
+            合并队列条目ID
+        """
+        try:
+            def insert(cursor):
+                cursor.execute('''
+                    INSERT INTO notification_digest
+                    (record_id, trigger_type, trigger_time, camera_path, screenshot_path, status, created_at)
+                    VALUES (?, ?, ?, ?, ?, 'waiting', ?)
+                ''', (
+                    record_id,
+                    trigger_type,
+                    trigger_time.isoformat(),
+                    str(camera_path) if camera_path else None,
+                    str(screenshot_path) if screenshot_path else None,
+                    created_at
+                ))
+
+                return cursor.lastrowid
+
+            return self._write(insert)
+
+        except Exception as e:
+            logger.error(f"添加合并队列条目失败: {e}")
+            return -1
+
+    def get_digest_entry(self, entry_id: int) -> Optional[Dict]:
+        """
+        根据ID获取合并队列条目
+
+        Args:
+            entry_id: 合并队列条目ID
+
+        Returns:
+            条目字典，不存在时返回None
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT * FROM notification_digest WHERE id = ?', (entry_id,))
+                row = cursor.fetchone()
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"查询合并队列条目失败 (ID={entry_id}): {e}")
+            return None
+
+    def get_first_waiting_digest_entry(self) -> Optional[Dict]:
+        """
+        获取最早的等待中合并队列条目（当前合并窗口的发起者）
+
+        Returns:
+            条目字典，没有等待中的条目时返回None
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('''
+                    SELECT * FROM notification_digest
+                    WHERE status = 'waiting'
+                    ORDER BY id
+                    LIMIT 1
+                ''')
+                row = cursor.fetchone()
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"查询合并队列失败: {e}")
+            return None
+
+    def claim_digest_entries(self, batch_id: int) -> List[Dict]:
+        """
+        领取所有等待中的合并队列条目
+
+        领取在一个事务内完成，多个进程同时领取时每个条目只会被领取一次
+
+        Args:
+            batch_id: 批次ID（发起汇总的条目ID）
+
+        Returns:
+            本次领取的条目列表（按触发时间排序）
+        """
+        try:
+            def claim(cursor):
+                cursor.execute('''
+                    UPDATE notification_digest
+                    SET status = 'flushed', batch_id = ?
+                    WHERE status = 'waiting'
+                ''', (batch_id,))
+
+                cursor.execute('''
+                    SELECT * FROM notification_digest
+                    WHERE batch_id = ?
+                    ORDER BY trigger_time
+                ''', (batch_id,))
+                return cursor.fetchall()
+
+            rows = self._write(claim)
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"领取合并队列条目失败: {e}")
+            return []
+
+    def get_provider_state(self, provider: str) -> Optional[Dict]:
+        """
+        获取通知渠道的速率限制和熔断状态
+
+        Args:
+            provider: 渠道名称
+
+        Returns:
+            状态字典，没有记录时返回None
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT * FROM provider_state WHERE provider = ?', (provider,))
+                row = cursor.fetchone()
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"查询渠道状态失败 ({provider}): {e}")
+            return None
+
+    def take_provider_token(self, provider: str, now: float, rate: float, capacity: float) -> bool:
+        """
+        从渠道的令牌桶中取出一个令牌
+
+        补充和扣减在同一个写事务中完成，多个进程同时发送时不会超发
+
+        Args:
+            provider: 渠道名称
+            now: 当前时间（Unix 时间戳）
+            rate: 每秒补充的令牌数
+            capacity: 令牌桶容量
+
+        Returns:
+            是否取得令牌
+        """
+        try:
+            def take(cursor):
+                cursor.execute('SELECT tokens, refilled_at FROM provider_state WHERE provider = ?', (provider,))
+                row = cursor.fetchone()
+
+                if row is None or row[0] is None:
+                    tokens = capacity
+                else:
+                    tokens = min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+
+                cursor.execute('''
+                    INSERT INTO provider_state (provider, tokens, refilled_at, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(provider) DO UPDATE SET
+                        tokens = excluded.tokens,
+                        refilled_at = excluded.refilled_at,
+                        updated_at = excluded.updated_at
+                ''', (provider, tokens, now, datetime.now().isoformat()))
+
+                return allowed
+
+            return self._write(take)
+
+        except Exception as e:
+            logger.error(f"获取渠道令牌失败 ({provider}): {e}")
+            # 状态库不可用时不阻止发送
+            return True
+
+    def update_provider_breaker(self, provider: str, breaker_state: str, failures: int,
+                                open_until: float) -> bool:
+        """
+        更新渠道熔断器状态
+
+        Args:
+            provider: 渠道名称
+            breaker_state: 熔断器状态（closed/open/half_open）
+            failures: 连续失败次数
+            open_until: 熔断结束时间（Unix 时间戳）
+
+        Returns:
+            是否更新成功
+        """
+        try:
+            def update(cursor):
+                cursor.execute('''
+                    INSERT INTO provider_state (provider, breaker_state, failures, open_until, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(provider) DO UPDATE SET
+                        breaker_state = excluded.breaker_state,
+                        failures = excluded.failures,
+                        open_until = excluded.open_until,
+                        updated_at = excluded.updated_at
+                ''', (provider, breaker_state, failures, open_until, datetime.now().isoformat()))
+
+            self._write(update)
+            return True
+
+        except Exception as e:
+            logger.error(f"更新熔断器状态失败 ({provider}): {e}")
+            return False
+
+    def claim_provider_probe(self, provider: str, expected_open_until: float, probe_until: float) -> bool:
+        """
+        熔断冷却结束后领取唯一的探测机会（熔断器进入半开状态）
+
+        只有 open_until 仍为查询时的值才能领取成功，多个进程同时发送时只有一个会探测
+
+        Args:
+            provider: 渠道名称
+            expected_open_until: 查询时读到的熔断结束时间
+            probe_until: 探测结果未知时再次允许探测的时间（Unix 时间戳）
+
+        Returns:
+            是否领取成功
+        """
+        try:
+            def claim(cursor):
+                cursor.execute('''
+                    UPDATE provider_state
+                    SET breaker_state = 'half_open', open_until = ?, updated_at = ?
+                    WHERE provider = ? AND open_until = ?
+                ''', (probe_until, datetime.now().isoformat(), provider, expected_open_until))
+
+                return cursor.rowcount == 1
+
+            return self._write(claim)
+
+        except Exception as e:
+            logger.error(f"领取熔断探测失败 ({provider}): {e}")
+            return False
+
 
 if __name__ == '__main__':
     # 测试数据库功能
     print("=== 数据库模块测试 ===")
 
-    db = Database()
+    # 使用临时数据库，不写入 data/history.db
+    temp_dir = tempfile.TemporaryDirectory()
+    db = Database(Path(temp_dir.name) / 'history.db')
 
     # 添加测试记录
     print("\n添加测试记录...")
@@ -349,10 +1396,38 @@ if __name__ == '__main__':
         print(f"  ID: {record['id']}, 类型: {record['trigger_type']}, "
               f"时间: {record['trigger_time']}, 通知: {record['notification_method']}")
 
+    # 按日期查询（trigger_ts 半开区间，应使用 idx_trigger_ts 索引）
+    print("\n按日期查询...")
+    today = datetime.now().strftime('%Y-%m-%d')
+    print(f"  今天的记录数: {len(db.get_records_by_date(today))}")
+    plan = db._connect().execute('''
+        EXPLAIN QUERY PLAN
+        SELECT * FROM capture_history WHERE trigger_ts >= ? AND trigger_ts < ? ORDER BY trigger_ts DESC
+    ''', (0, 1)).fetchall()
+    for row in plan:
+        print(f"  查询计划: {row[3]}")
+    assert any('idx_trigger_ts' in row[3] for row in plan), "日期范围查询未使用索引"
+
+    # 按日期分页（含类型、通知状态和游标组合），应沿覆盖索引读取，不能出现临时排序
+    print("\n按日期分页查询...")
+    page_cursor = Database._encode_cursor('next', {'trigger_time': datetime.now().isoformat(), 'id': record_id})
+    for filters in ({}, {'trigger_type': 'manual'}, {'notification_sent': True},
+                    {'cursor': page_cursor}, {'archived': True}):
+        options = dict({'cursor': None, 'trigger_type': None, 'notification_sent': None, 'archived': False}, **filters)
+        sql, params, _ = db._records_page_query(50, options['cursor'], options['trigger_type'], today, today,
+                                                options['notification_sent'], options['archived'])
+        plan = [row[3] for row in db._connect().execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+        print(f"  {'日期 + ' + ', '.join(filters) if filters else '仅日期'}: {'; '.join(plan)}")
+        assert not any('TEMP B-TREE' in detail for detail in plan), f"按日期分页需要临时排序: {filters}"
+        assert any('COVERING INDEX' in detail for detail in plan), f"按日期分页未使用覆盖索引: {filters}"
+    print(f"  今天的记录数（分页）: {len(db.get_records_page(start_date=today, end_date=today)['records'])}")
+
     # 获取统计信息
     print("\n统计信息...")
     stats = db.get_statistics()
     for key, value in stats.items():
         print(f"  {key}: {value}")
 
+    db.close()
+    temp_dir.cleanup()
     print("\n✅ 数据库测试完成")
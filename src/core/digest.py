@@ -0,0 +1,138 @@
+"""
+通知合并模块
+合并窗口内的多次触发（休眠唤醒反复切换、计划任务和托盘同时触发）汇总为一条通知
+
+触发先写入数据库中的合并队列，窗口内第一个触发的进程负责在窗口结束时汇总发送，
+其它进程只登记后返回；优先触发类型到达时立即汇总发送
+"""
+
+import time
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .database import Database
+from .notifier import BaseNotifier
+from ..utils.deadline import Deadline
+from ..utils.logger import Logger
+
+logger = Logger()
+
+
+class TriggerDigest:
+    """触发合并器"""
+
+    # 窗口发起者的进程意外退出后，新触发接管汇总前的额外等待时间（秒）
+    STALE_GRACE = 60
+
+    # 等待窗口结束时检查是否已被其它进程汇总的间隔（秒）
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, db: Database, window: float, priority_triggers: Optional[List[str]] = None,
+                 max_images: int = 2):
+        """
+        初始化合并器
+
+        Args:
+            db: 数据库实例
+            window: 合并窗口（秒）
+            priority_triggers: 立即汇总发送的触发类型
+            max_images: 汇总通知最多附带的图片数
+        """
+        self.db = db
+        self.window = window
+        self.priority_triggers = set(priority_triggers or [])
+        self.max_images = max_images
+
+    def submit(self, record_id: Optional[int], trigger_type: str, trigger_time: datetime,
+               camera_path: Optional[Path] = None, screenshot_path: Optional[Path] = None) -> int:
+        """
+        将触发加入合并队列
+
+        Args:
+            record_id: 关联的历史记录ID
+            trigger_type: 触发类型
+            trigger_time: 触发时间
+            camera_path: 要发送的摄像头照片路径
+            screenshot_path: 要发送的屏幕截图路径
+
+        Returns:
+            合并队列条目ID，失败返回 -1
+        """
+        return self.db.add_digest_entry(
+            record_id=record_id,
+            trigger_type=trigger_type,
+            trigger_time=trigger_time,
+            camera_path=camera_path,
+            screenshot_path=screenshot_path,
+            created_at=time.time()
+        )
+
+    def collect(self, entry_id: int, trigger_type: str, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """
+        等待合并窗口结束并领取窗口内的全部触发
+
+        - 优先触发：立即领取
+        - 窗口发起者（最早的等待条目）：等到窗口结束再领取，期间被其它进程领取则直接返回
+        - 发起者超时未领取（进程已退出）：由当前触发接管并立即领取
+        - 其它情况：由发起者负责发送，返回空列表
+
+        Args:
+            entry_id: submit 返回的条目ID
+            trigger_type: 触发类型
+            deadline: 截止时间，等待窗口最多使用剩余时间的一半，留出发送时间
+
+        Returns:
+            由当前进程负责发送的触发列表，为空表示无需发送
+        """
+        if trigger_type in self.priority_triggers:
+            logger.info(f"优先触发 ({trigger_type})，立即发送汇总通知")
+            return self.db.claim_digest_entries(entry_id)
+
+        first = self.db.get_first_waiting_digest_entry()
+        if first is None:
+            return []  # 已被其它进程领取
+
+        if first['id'] != entry_id:
+            if first['created_at'] + self.window + self.STALE_GRACE < time.time():
+                logger.warning(f"合并窗口发起者未发送 (条目 {first['id']})，接管汇总")
+                return self.db.claim_digest_entries(entry_id)
+
+            logger.info(f"触发已合并到窗口 (条目 {first['id']})，由其发送汇总通知")
+            return []
+
+        close_at = first['created_at'] + self.window
+        if deadline and deadline.limited:
+            close_at = min(close_at, time.time() + deadline.remaining() / 2)
+        logger.info(f"合并窗口已开启，{max(0.0, close_at - time.time()):.1f} 秒后发送汇总通知")
+        while time.time() < close_at:
+            time.sleep(min(self.POLL_INTERVAL, max(0.0, close_at - time.time())))
+            entry = self.db.get_digest_entry(entry_id)
+            if entry is None or entry['status'] != 'waiting':
+                logger.info("合并窗口已被优先触发提前发送")
+                return []
+
+        return self.db.claim_digest_entries(entry_id)
+
+    def send(self, notifier: BaseNotifier, entries: List[Dict]) -> bool:
+        """
+        发送汇总通知（只有一次触发时按普通通知发送）
+
+        Args:
+            notifier: 通知器
+            entries: collect 返回的触发列表
+
+        Returns:
+            是否发送成功
+        """
+        if len(entries) == 1:
+            entry = entries[0]
+            return notifier.send_trigger_notification(
+                entry['trigger_type'],
+                camera_path=entry['camera_path'],
+                screenshot_path=entry['screenshot_path'],
+                trigger_time=datetime.fromisoformat(entry['trigger_time'])
+            )
+
+        logger.info(f"发送汇总通知: {len(entries)} 次触发")
+        return notifier.send_digest_notification(entries, max_images=self.max_images)
@@ -0,0 +1,430 @@
+"""
+数据库迁移模块
+按 PRAGMA user_version 记录的版本号依次执行迁移步骤，为已有的用户数据库添加列、索引和新表
+
+- 每个步骤在独立的写事务（BEGIN IMMEDIATE）中执行，并在同一事务内更新版本号
+- 事务开始后重新检查版本号，命令行和托盘进程同时启动时每个步骤只执行一次
+- 回填等耗时步骤分批执行，每批一个事务，期间其它进程仍可读写数据库
+"""
+
+import sqlite3
+from typing import Callable, List, Optional
+
+from ..utils.logger import Logger
+
+logger = Logger()
+
+
+class Migration:
+    """迁移步骤"""
+
+    def __init__(self, version: int, description: str, apply: Callable[[sqlite3.Cursor], Optional[int]],
+                 count: Optional[Callable[[sqlite3.Cursor], int]] = None):
+        """
+        初始化迁移步骤
+
+        Args:
+            version: 执行后的版本号
+            description: 步骤说明
+            apply: 执行函数；分批步骤每次调用处理一批并返回处理的行数，返回 0 表示完成
+            count: 统计待处理行数的函数（用于进度日志），提供时按分批步骤执行
+        """
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.count = count
+
+    @property
+    def batched(self) -> bool:
+        """是否分批执行"""
+        return self.count is not None
+
+
+# 分批回填时每批处理的记录数
+BATCH_SIZE = 5000
+
+
+def _create_base_schema(cursor: sqlite3.Cursor):
+    """基础表结构（引入迁移前由 CREATE IF NOT EXISTS 创建的表和索引）"""
+    # 历史记录表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS capture_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trigger_type TEXT NOT NULL,
+            trigger_time TEXT NOT NULL,
+            camera_path TEXT,
+            screenshot_path TEXT,
+            notification_sent INTEGER DEFAULT 0,
+            notification_method TEXT,
+            created_at TEXT NOT NULL
+        )
+    ''')
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trigger_time ON capture_history(trigger_time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trigger_type ON capture_history(trigger_type)')
+
+    # 按类型筛选的分页查询（索引隐含 id，等同于 (trigger_type, trigger_time, id)）
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_type_time ON capture_history(trigger_type, trigger_time)')
+
+    # 通知发件箱表（发送失败的通知在此等待重试）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER,
+            provider TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            notification_method TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT
+        )
+    ''')
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_due ON notification_outbox(status, next_attempt_at)')
+
+    # 通知合并队列表（合并窗口内的触发在此等待汇总发送）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_digest (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER,
+            trigger_type TEXT NOT NULL,
+            trigger_time TEXT NOT NULL,
+            camera_path TEXT,
+            screenshot_path TEXT,
+            status TEXT NOT NULL DEFAULT 'waiting',
+            batch_id INTEGER,
+            created_at REAL NOT NULL
+        )
+    ''')
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_digest_status ON notification_digest(status, id)')
+
+    # 通知渠道状态表（速率限制令牌桶和熔断器，供托盘和命令行进程共享）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS provider_state (
+            provider TEXT PRIMARY KEY,
+            tokens REAL,
+            refilled_at REAL,
+            breaker_state TEXT NOT NULL DEFAULT 'closed',
+            failures INTEGER DEFAULT 0,
+            open_until REAL DEFAULT 0,
+            updated_at TEXT
+        )
+    ''')
+
+
+def _add_trigger_ts(cursor: sqlite3.Cursor):
+    """添加 Unix 毫秒时间戳列及索引（迁移前的版本可能已添加该列）"""
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(capture_history)')]
+    if 'trigger_ts' not in columns:
+        cursor.execute('ALTER TABLE capture_history ADD COLUMN trigger_ts INTEGER')
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trigger_ts ON capture_history(trigger_ts)')
+
+
+def _count_missing_trigger_ts(cursor: sqlite3.Cursor) -> int:
+    """统计缺少 trigger_ts 的记录数"""
+    return cursor.execute('SELECT COUNT(*) FROM capture_history WHERE trigger_ts IS NULL').fetchone()[0]
+
+
+def _backfill_trigger_ts(cursor: sqlite3.Cursor) -> int:
+    """
+    回填一批缺少 trigger_ts 的记录
+
+    trigger_time 为本地时间，'utc' 修饰符按本机时区换算，与 Database.to_epoch_ms 的结果一致
+    """
+    cursor.execute('''
+        UPDATE capture_history
+        SET trigger_ts = CAST(ROUND((julianday(trigger_time, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+        WHERE id IN (
+            SELECT id FROM capture_history WHERE trigger_ts IS NULL LIMIT ?
+        )
+    ''', (BATCH_SIZE,))
+    return cursor.rowcount
+
+
+def _add_list_indexes(cursor: sqlite3.Cursor):
+    """
+    按历史窗口的访问方式建立复合覆盖索引
+
+    列表只需要 id、类型、时间和通知状态，按时间、类型+时间、通知状态+时间倒序翻页
+    都可以只扫描索引，不回表也不排序（id 紧跟 trigger_time，与翻页的 (trigger_time, id) 排序一致）；
+    原单列索引是新索引的前缀，予以删除
+    """
+    cursor.execute('DROP INDEX IF EXISTS idx_trigger_time')
+    cursor.execute('DROP INDEX IF EXISTS idx_trigger_type')
+    cursor.execute('DROP INDEX IF EXISTS idx_type_time')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_list_time
+        ON capture_history(trigger_time, id, trigger_type, notification_sent, notification_method)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_list_type_time
+        ON capture_history(trigger_type, trigger_time, id, notification_sent, notification_method)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_list_sent_time
+        ON capture_history(notification_sent, trigger_time, id, trigger_type, notification_method)
+    ''')
+
+    # 采样统计索引选择性，类型和通知状态同时筛选时由查询规划器选择更合适的索引
+    cursor.execute('PRAGMA analysis_limit = 1000')
+    cursor.execute('ANALYZE capture_history')
+
+
+def rebuild_capture_stats(cursor: sqlite3.Cursor):
+    """
+    按历史记录重新计算统计计数（全表扫描一次，在调用方的事务内执行）
+
+    day 为 '*' 的行是各触发类型的累计值，其余为按日期（YYYY-MM-DD）汇总的值
+    """
+    cursor.execute('DELETE FROM capture_stats')
+    cursor.execute('''
+        INSERT INTO capture_stats (day, trigger_type, total, notification_sent)
+        SELECT substr(trigger_time, 1, 10), trigger_type, COUNT(*), SUM(notification_sent != 0)
+        FROM capture_history
+        GROUP BY 1, 2
+    ''')
+    cursor.execute('''
+        INSERT INTO capture_stats (day, trigger_type, total, notification_sent)
+        SELECT '*', trigger_type, SUM(total), SUM(notification_sent)
+        FROM capture_stats
+        GROUP BY trigger_type
+    ''')
+
+
+def _add_capture_stats(cursor: sqlite3.Cursor):
+    """
+    添加由触发器维护的统计计数表
+
+    历史记录的插入、删除和更新由触发器同步更新累计值和按日汇总，
+    统计信息只需读取几行计数，不再扫描整张表
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS capture_stats (
+            day TEXT NOT NULL,
+            trigger_type TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            notification_sent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, trigger_type)
+        ) WITHOUT ROWID
+    ''')
+
+    # 加上一条记录的计数（NEW），用于插入和更新后
+    increment = '''
+        INSERT INTO capture_stats (day, trigger_type, total, notification_sent)
+        VALUES ('*', NEW.trigger_type, 1, NEW.notification_sent != 0),
+               (substr(NEW.trigger_time, 1, 10), NEW.trigger_type, 1, NEW.notification_sent != 0)
+        ON CONFLICT(day, trigger_type) DO UPDATE SET
+            total = total + 1,
+            notification_sent = notification_sent + excluded.notification_sent;
+    '''
+
+    # 减去一条记录的计数（OLD），用于删除和更新后
+    decrement = '''
+        UPDATE capture_stats
+        SET total = total - 1, notification_sent = notification_sent - (OLD.notification_sent != 0)
+        WHERE trigger_type = OLD.trigger_type AND day IN ('*', substr(OLD.trigger_time, 1, 10));
+        DELETE FROM capture_stats
+        WHERE trigger_type = OLD.trigger_type AND day = substr(OLD.trigger_time, 1, 10) AND total <= 0;
+    '''
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_capture_stats_insert
+        AFTER INSERT ON capture_history
+        BEGIN
+            {increment}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_capture_stats_delete
+        AFTER DELETE ON capture_history
+        BEGIN
+            {decrement}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_capture_stats_update
+        AFTER UPDATE OF trigger_type, trigger_time, notification_sent ON capture_history
+        BEGIN
+            {decrement}
+            {increment}
+        END
+    ''')
+
+    rebuild_capture_stats(cursor)
+
+
+def _add_capture_images(cursor: sqlite3.Cursor):
+    """
+    添加图片子表：一次触发可以关联多张图片（摄像头、合成截图、各显示器截图、连拍帧、缩略图等）
+
+    capture_history 的 camera_path 和 screenshot_path 保留为通知使用的主图片，不迁移到子表；
+    删除历史记录时级联删除其图片行（连接需开启 PRAGMA foreign_keys）
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS capture_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL REFERENCES capture_history(id) ON DELETE CASCADE,
+            kind TEXT NOT NULL,
+            monitor_index INTEGER,
+            path TEXT NOT NULL,
+            byte_size INTEGER,
+            width INTEGER,
+            height INTEGER,
+            content_hash TEXT,
+            encode_ms REAL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+
+    # 按记录查询（同时用于级联删除）和按内容哈希查找重复图片
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_capture_images_record
+        ON capture_images(record_id, kind, monitor_index)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_capture_images_hash
+        ON capture_images(content_hash)
+        WHERE content_hash IS NOT NULL
+    ''')
+
+
+def _add_archive_index(cursor: sqlite3.Cursor):
+    """
+    添加归档索引表：已移到按月归档文件中的记录只保留列表需要的列和所在月份
+
+    id 沿用原历史记录ID（capture_history 使用 AUTOINCREMENT，ID 不会被新记录复用）
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive_index (
+            id INTEGER PRIMARY KEY,
+            trigger_type TEXT NOT NULL,
+            trigger_time TEXT NOT NULL,
+            notification_sent INTEGER DEFAULT 0,
+            notification_method TEXT,
+            month TEXT NOT NULL,
+            image_count INTEGER DEFAULT 0,
+            archived_at TEXT NOT NULL
+        )
+    ''')
+
+    # 与 idx_list_time 相同的覆盖索引，归档列表同样使用游标分页
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_archive_time
+        ON archive_index(trigger_time, id, trigger_type, notification_sent, notification_method)
+    ''')
+
+
+def _add_archive_offsets(cursor: sqlite3.Cursor):
+    """
+    归档索引添加记录在归档文件中的位置和 trigger_ts
+
+    records_offset 为记录所在 gzip 成员在月份文件中的字节偏移，record_line 为成员内的行号，
+    读取时直接定位，不需要解压扫描整个月份文件；之前归档的条目两列为空，读取时扫描整个文件
+    """
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(archive_index)')]
+    for column in ('trigger_ts', 'records_offset', 'record_line'):
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE archive_index ADD COLUMN {column} INTEGER')
+
+    cursor.execute('''
+        UPDATE archive_index
+        SET trigger_ts = CAST(ROUND((julianday(trigger_time, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+        WHERE trigger_ts IS NULL
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_ts ON archive_index(trigger_ts)')
+
+
+# 迁移步骤（按版本号排序，只能在末尾追加，已发布的步骤不能修改）
+MIGRATIONS: List[Migration] = [
+    Migration(1, "创建基础表结构", _create_base_schema),
+    Migration(2, "添加 trigger_ts 时间戳列", _add_trigger_ts),
+    Migration(3, "回填 trigger_ts 时间戳", _backfill_trigger_ts, count=_count_missing_trigger_ts),
+    Migration(4, "添加历史列表复合覆盖索引", _add_list_indexes),
+    Migration(5, "添加统计计数表和触发器", _add_capture_stats),
+    Migration(6, "添加图片子表", _add_capture_images),
+    Migration(7, "添加归档索引表", _add_archive_index),
+    Migration(8, "归档索引添加文件位置和时间戳", _add_archive_offsets),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    """读取数据库的版本号"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _run_step(conn: sqlite3.Connection, migration: Migration) -> int:
+    """
+    在一个写事务内执行迁移步骤（分批步骤执行一批）
+
+    Returns:
+        本批处理的行数，0 表示该步骤已完成（版本号已更新）
+    """
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        # 持有写锁后重新检查：其它进程可能已完成该步骤
+        if get_version(conn) >= migration.version:
+            conn.commit()
+            return 0
+
+        affected = migration.apply(cursor)
+        if not migration.batched or not affected:
+            cursor.execute(f'PRAGMA user_version = {int(migration.version)}')
+
+        conn.commit()
+        return affected if migration.batched and affected else 0
+
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    把数据库升级到最新版本
+
+    Args:
+        conn: 数据库连接（未提交的事务会先提交）
+
+    Returns:
+        升级后的版本号
+    """
+    version = get_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+
+    logger.info(f"数据库版本 {version}，升级到 {LATEST_VERSION}")
+
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+
+        logger.info(f"执行迁移 {migration.version}: {migration.description}")
+
+        if not migration.batched:
+            _run_step(conn, migration)
+            continue
+
+        total = migration.count(conn.cursor())
+        processed = 0
+        while True:
+            affected = _run_step(conn, migration)
+            if not affected:
+                break
+            processed += affected
+            logger.info(f"迁移 {migration.version} 进度: {processed}/{total}")
+
+    version = get_version(conn)
+    logger.info(f"数据库已升级到版本 {version}")
+    return version
@@ -4,16 +4,24 @@
 """
 
 import time
+import threading
 from pathlib import Path
-from typing import Optional, Dict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime
 
 from .camera import CameraCapture
 from .screenshot import ScreenCapture
-from .notifier import PushPlusNotifier
+from .channels import create_notifier
 from .database import Database
+from .digest import TriggerDigest
+from .outbox import NotificationOutbox
+from .retention import RetentionEngine
 from ..utils.config import get_config
+from ..utils.image_helper import ImageHelper
 from ..utils.logger import Logger
+from ..utils.network import wait_for_network
+from ..utils.deadline import Deadline
 
 logger = Logger()
 
@@ -21,6 +29,12 @@ logger = Logger()
 class Monitor:
     """监控管理器"""
 
+    # 顺带重试发件箱至少需要的剩余时间（秒）
+    OUTBOX_MIN_SECONDS = 5
+
+    # 命令行触发后顺带清理历史数据的最多批数
+    CLEANUP_BATCHES = 2
+
     def __init__(self):
         """初始化监控器"""
         # 加载配置
@@ -28,12 +42,17 @@ class Monitor:
 
         # 初始化数据库
         self.db = Database()
+        self.outbox = NotificationOutbox(self.db)
+        self.retention = RetentionEngine.from_config(self.db, self.config.get('storage', {}))
 
         # 初始化各个模块
         self._init_components()
 
     def _init_components(self):
         """初始化各个组件"""
+        # 单次触发的总时间预算，0 表示不限时
+        self.deadline_seconds = self.config.get('trigger', {}).get('deadline_seconds', 60)
+
         # 摄像头
         camera_config = self.config.get('camera', {})
         self.camera_enabled = camera_config.get('enabled', True)
@@ -52,6 +71,8 @@ class Monitor:
         if self.screenshot_enabled:
             quality = screenshot_config.get('quality', 85)
             self.screenshot = ScreenCapture(quality=quality)
+            # 多显示器时额外分别截取每个显示器，记录到图片子表
+            self.per_monitor_screenshots = screenshot_config.get('per_monitor', False)
             logger.info(f"截图已初始化: 质量 {quality}")
         else:
             self.screenshot = None
@@ -61,29 +82,46 @@ class Monitor:
         notification_config = self.config.get('notification', {})
         self.notification_enabled = notification_config.get('enabled', True)
         if self.notification_enabled:
-            token = notification_config.get('token', '')
-            if token and token != "请在此处填写您的 PushPlus Token":
-                self.notifier = PushPlusNotifier(token)
+            self.notifier = create_notifier(notification_config, self.db)
+            if self.notifier:
                 self.send_camera_image = notification_config.get('send_camera', True)
                 self.send_screenshot_image = notification_config.get('send_screenshot', True)
+                self.network_wait_seconds = notification_config.get('network_wait_seconds', 20)
+                self.network_probe = notification_config.get('network_probe') or None
+                self.two_phase = notification_config.get('two_phase', False)
+
+                # 通知合并：窗口内的多次触发汇总为一条通知
+                coalesce_seconds = notification_config.get('coalesce_seconds', 0)
+                self.digest = TriggerDigest(
+                    self.db,
+                    window=coalesce_seconds,
+                    priority_triggers=notification_config.get('priority_triggers', ['manual']),
+                    max_images=notification_config.get('digest_max_images', 2)
+                ) if coalesce_seconds > 0 else None
                 logger.info("通知已初始化")
             else:
-                self.notifier = None
-                logger.warning("未配置 PushPlus Token，通知功能已禁用")
+                logger.warning("未配置 PushPlus Token 或其它通知渠道，通知功能已禁用")
         else:
             self.notifier = None
             logger.info("通知已禁用")
 
-    def execute(self, trigger_type: str = 'manual') -> Dict:
+    def execute(self, trigger_type: str = 'manual', deadline: Optional[Deadline] = None) -> Dict:
         """
         执行监控任务
 
+        各阶段（拍照、截图、图片准备、上传、通知、数据库写入）只使用剩余时间，
+        时间不足时降级为更小的图片或纯文字通知；各阶段耗时记录在结果的 stages 中
+
         Args:
             trigger_type: 触发类型，可选 'boot', 'wake', 'manual'
+            deadline: 截止时间，默认使用配置 trigger.deadline_seconds
 
         Returns:
             执行结果字典
         """
+        if deadline is None:
+            deadline = Deadline(self.deadline_seconds)
+
         result = {
             'success': False,
             'trigger_type': trigger_type,
@@ -91,19 +129,45 @@ class Monitor:
             'camera_path': None,
             'screenshot_path': None,
             'notification_sent': False,
+            'time_to_first_alert': None,
+            'time_to_images': None,
+            'stages': deadline.stages,
             'errors': []
         }
 
         logger.info(f"=== 开始执行监控任务 (触发类型: {trigger_type}) ===")
 
+        start = time.monotonic()
+        trigger_time = datetime.now()
+        notify_enabled = self.notification_enabled and self.notifier is not None
+        if notify_enabled:
+            self.notifier.set_deadline(deadline)
+
+        # 两段式通知：拍照截图的同时在后台先发送文字告警
+        alert_thread = None
+        alert_result = {'sent': False}
+        if notify_enabled and self.two_phase:
+            alert_thread = threading.Thread(
+                target=self._send_alert,
+                args=(trigger_type, trigger_time, start, deadline, result, alert_result),
+                name='trigger-alert',
+                daemon=True
+            )
+            alert_thread.start()
+
+        # 本次拍摄的图片 (类型, 路径, 显示器编号, 编码耗时)，保存历史记录时写入图片子表
+        captured: List[Tuple[str, Path, Optional[int], Optional[float]]] = []
+
         # 1. 摄像头拍照
         camera_path = None
         if self.camera_enabled and self.camera:
             try:
                 logger.info("正在拍照...")
-                camera_path = self.camera.capture()
+                with deadline.stage('camera'):
+                    camera_path = self.camera.capture(deadline=deadline)
                 if camera_path:
                     result['camera_path'] = str(camera_path)
+                    captured.append(('camera', camera_path, None, self.camera.encode_times.get(camera_path)))
                     logger.info(f"拍照成功: {camera_path}")
                 else:
                     error_msg = "拍照失败"
@@ -121,14 +185,24 @@ class Monitor:
         if self.screenshot_enabled and self.screenshot:
             try:
                 logger.info("正在截图...")
-                screenshot_path = self.screenshot.capture()
+                with deadline.stage('screenshot'):
+                    screenshot_path = self.screenshot.capture()
                 if screenshot_path:
                     result['screenshot_path'] = str(screenshot_path)
+                    # 显示器编号 0 表示全部显示器合成的截图
+                    captured.append(('screenshot', screenshot_path, 0, self.screenshot.encode_times.get(screenshot_path)))
                     logger.info(f"截图成功: {screenshot_path}")
                 else:
                     error_msg = "截图失败"
                     result['errors'].append(error_msg)
                     logger.error(error_msg)
+
+                if self.per_monitor_screenshots and not deadline.expired():
+                    with deadline.stage('monitors'):
+                        monitor_paths = self.screenshot.capture_all_monitors()
+                    for index, path in enumerate(monitor_paths, start=1):
+                        captured.append(('monitor', path, index, self.screenshot.encode_times.get(path)))
+                    result['monitor_screenshots'] = [str(path) for path in monitor_paths]
             except Exception as e:
                 error_msg = f"截图异常: {e}"
                 result['errors'].append(error_msg)
@@ -136,38 +210,49 @@ class Monitor:
         else:
             logger.info("截图已禁用，跳过截图")
 
+        # 只发送配置中选择的图片，摄像头和截图按权重共享消息预算
+        notify_camera = camera_path if notify_enabled and self.send_camera_image else None
+        notify_screenshot = screenshot_path if notify_enabled and self.send_screenshot_image else None
+        coalesce = notify_enabled and self.digest is not None
+
         # 3. 发送通知
-        if self.notification_enabled and self.notifier:
+        if coalesce:
+            # 合并模式：先保存历史记录，再加入合并队列（见第 5 步）
+            if alert_thread:
+                alert_thread.join()
+            result['notification_sent'] = alert_result['sent']
+        elif notify_enabled:
             try:
-                logger.info("正在发送通知...")
-
-                # 准备要发送的图片
-                images_to_send = []
-                if self.send_camera_image and camera_path:
-                    images_to_send.append(Path(camera_path))
-                if self.send_screenshot_image and screenshot_path:
-                    images_to_send.append(Path(screenshot_path))
-
-                # 根据触发类型发送不同的通知
-                if trigger_type == 'boot':
-                    notification_sent = self.notifier.send_boot_notification(
-                        camera_path=camera_path,
-                        screenshot_path=screenshot_path
-                    )
-                elif trigger_type == 'wake':
-                    notification_sent = self.notifier.send_wake_notification(
-                        camera_path=camera_path,
-                        screenshot_path=screenshot_path
-                    )
-                else:  # manual
-                    notification_sent = self.notifier.send_manual_notification(
-                        camera_path=camera_path,
-                        screenshot_path=screenshot_path
+                with deadline.stage('notification'):
+                    if alert_thread:
+                        # 文字告警已等待过网络，这里只需等它发完，避免两条消息并发使用通知器
+                        alert_thread.join()
+                    else:
+                        # 唤醒后网卡可能尚未重连，网络就绪后立即发送，避免请求白白等待超时
+                        self._wait_for_network(deadline)
+
+                    logger.info("正在发送通知...")
+
+                    images_sent = self.notifier.send_trigger_notification(
+                        trigger_type,
+                        camera_path=notify_camera,
+                        screenshot_path=notify_screenshot,
+                        trigger_time=trigger_time,
+                        follow_up=alert_thread is not None
                     )
 
+                if images_sent:
+                    result['time_to_images'] = round(time.monotonic() - start, 3)
+                    if result['time_to_first_alert'] is None:
+                        result['time_to_first_alert'] = result['time_to_images']
+
+                notification_sent = images_sent or alert_result['sent']
                 result['notification_sent'] = notification_sent
                 if notification_sent:
-                    logger.info("通知发送成功")
+                    logger.info(
+                        f"通知发送成功 (首条告警 {result['time_to_first_alert']} 秒, "
+                        f"图片 {result['time_to_images']} 秒)"
+                    )
                 else:
                     error_msg = "通知发送失败"
                     result['errors'].append(error_msg)
@@ -180,46 +265,249 @@ class Monitor:
         else:
             logger.info("通知已禁用，跳过发送")
 
-        # 4. 保存到数据库
+        # 4. 保存到数据库（交给数据库写线程，只在需要记录ID时等待提交）
+        record_future = None
         try:
             logger.info("保存历史记录到数据库...")
             # 确定通知方式
             notification_method = 'none'
+            has_pending = notify_enabled and bool(self.notifier.get_pending_payloads())
             if result['notification_sent']:
-                # 假设使用了 base64 方式（简化处理，后续可以从 notifier 获取实际方式）
-                notification_method = 'base64'
-            elif self.notification_enabled and self.notifier:
-                notification_method = 'failed'
-
-            record_id = self.db.add_record(
-                trigger_type=trigger_type,
-                trigger_time=datetime.now(),
-                camera_path=Path(camera_path) if camera_path else None,
-                screenshot_path=Path(screenshot_path) if screenshot_path else None,
-                notification_sent=result['notification_sent'],
-                notification_method=notification_method
-            )
-
-            if record_id > 0:
-                logger.info(f"历史记录已保存 (ID: {record_id})")
-                result['record_id'] = record_id
-            else:
-                logger.error("保存历史记录失败")
+                # 两段式通知只有文字告警送达时，通知器的状态已被图片消息重置
+                notification_method = self.notifier.last_method if self.notifier.last_method != 'none' else 'text'
+            elif coalesce:
+                # 汇总通知发送后再更新
+                notification_method = 'coalesced'
+            elif notify_enabled:
+                # 因网络原因失败的通知加入发件箱稍后重试
+                notification_method = 'queued' if has_pending else 'failed'
+
+            with deadline.stage('database'):
+                record_future = self.db.add_record_async(
+                    trigger_type=trigger_type,
+                    trigger_time=trigger_time,
+                    camera_path=Path(camera_path) if camera_path else None,
+                    screenshot_path=Path(screenshot_path) if screenshot_path else None,
+                    notification_sent=result['notification_sent'],
+                    notification_method=notification_method,
+                    images=self._describe_images(captured)
+                )
+
+                # 两段式通知中文字告警已送达时，未送达的图片消息同样加入发件箱
+                if has_pending:
+                    record_id = self._resolve_record(record_future, deadline, result)
+                    self.outbox.enqueue(record_id if record_id > 0 else None, self.notifier)
 
         except Exception as e:
             error_msg = f"保存历史记录异常: {e}"
             result['errors'].append(error_msg)
             logger.error(error_msg)
 
-        # 5. 判断整体是否成功
+        # 5. 合并模式：加入合并队列，由窗口发起者在窗口结束时发送汇总通知
+        if coalesce:
+            try:
+                if record_future is not None and 'record_id' not in result:
+                    self._resolve_record(record_future, deadline, result)
+                with deadline.stage('digest'):
+                    self._send_digest(trigger_type, trigger_time, notify_camera, notify_screenshot,
+                                      start, deadline, result)
+            except Exception as e:
+                error_msg = f"发送汇总通知异常: {e}"
+                result['errors'].append(error_msg)
+                logger.error(error_msg)
+
+        # 6. 顺带重试发件箱中已到期的通知（没有到期条目时只是一次索引查询）
+        if self.notifier and deadline.has(self.OUTBOX_MIN_SECONDS):
+            try:
+                with deadline.stage('outbox'):
+                    self.outbox.process_due(self.notifier)
+            except Exception as e:
+                logger.error(f"重试发件箱通知异常: {e}")
+
+        if notify_enabled:
+            self.notifier.set_deadline(None)
+
+        if record_future is not None and 'record_id' not in result:
+            self._resolve_record(record_future, deadline, result)
+
+        # 7. 判断整体是否成功
         # 至少完成了拍照或截图，且没有严重错误
         has_capture = bool(camera_path or screenshot_path)
         result['success'] = has_capture
+        result['elapsed'] = round(deadline.elapsed(), 3)
+        result['deadline_exceeded'] = deadline.limited and deadline.expired()
+
+        stages = ', '.join(f"{name} {seconds}s" for name, seconds in deadline.stages.items())
+        logger.info(f"各阶段耗时: {stages or '无'} (总计 {result['elapsed']} 秒)")
+        if result['deadline_exceeded']:
+            logger.warning(f"监控任务超出时间预算 ({self.deadline_seconds} 秒)")
 
         logger.info(f"=== 监控任务执行完成 (成功: {result['success']}) ===")
 
         return result
 
+    def cleanup(self, max_batches: Optional[int] = CLEANUP_BATCHES) -> Optional[Dict]:
+        """
+        清理过期的历史记录和图片（在触发任务完成后调用）
+
+        Args:
+            max_batches: 最多处理的批数，None 表示全部清理完
+
+        Returns:
+            清理报告（见 RetentionEngine.run），未开启自动清理时返回 None
+        """
+        if self.retention is None:
+            return None
+
+        try:
+            return self.retention.run(max_batches=max_batches)
+        except Exception as e:
+            logger.error(f"清理历史数据异常: {e}")
+            return None
+
+    def close(self):
+        """写完排队中的历史记录并关闭数据库连接"""
+        self.db.close()
+
+    @staticmethod
+    def _describe_images(captured: List[Tuple[str, Path, Optional[int], Optional[float]]]) -> List[Dict]:
+        """
+        读取本次拍摄图片的大小、尺寸和哈希（在通知发送后执行，不占用告警时间）
+
+        Args:
+            captured: (类型, 路径, 显示器编号, 编码耗时) 列表
+
+        Returns:
+            capture_images 表的图片行列表
+        """
+        images = []
+        for kind, path, monitor_index, encode_ms in captured:
+            info = ImageHelper.describe_image(path)
+            if info:
+                info.update(kind=kind, monitor_index=monitor_index, encode_ms=encode_ms)
+                images.append(info)
+        return images
+
+    def _resolve_record(self, record_future: Future, deadline: Deadline, result: Dict) -> int:
+        """
+        等待历史记录写入提交并取得记录ID，最多等待剩余时间
+
+        超时后记录仍在写线程中提交，close 时写完
+
+        Args:
+            record_future: add_record_async 返回的 Future
+            deadline: 截止时间
+            result: 执行结果字典，成功时写入 record_id
+
+        Returns:
+            记录ID，失败或超时返回 -1
+        """
+        try:
+            record_id = record_future.result(deadline.remaining() if deadline.limited else None)
+        except FutureTimeoutError:
+            logger.warning("历史记录未在时间预算内提交，继续在后台写入")
+            return -1
+        except Exception as e:
+            logger.error(f"保存历史记录失败: {e}")
+            return -1
+
+        logger.info(f"历史记录已保存 (ID: {record_id})")
+        result['record_id'] = record_id
+        return record_id
+
+    def _wait_for_network(self, deadline: Deadline):
+        """等待网络就绪，最长等待时间不超过剩余时间"""
+        budget = min(self.network_wait_seconds, deadline.remaining())
+        if budget > 0:
+            wait_for_network(self.notifier.endpoint, budget=budget, probe_addresses=self.network_probe)
+
+    def _send_digest(self, trigger_type: str, trigger_time: datetime, camera_path: Optional[Path],
+                     screenshot_path: Optional[Path], start: float, deadline: Deadline, result: Dict):
+        """
+        将触发加入合并队列，由当前进程负责时发送汇总通知并更新窗口内所有记录的通知状态
+
+        Args:
+            trigger_type: 触发类型
+            trigger_time: 触发时间
+            camera_path: 要发送的摄像头照片路径
+            screenshot_path: 要发送的屏幕截图路径
+            start: 任务开始时刻（time.monotonic）
+            deadline: 截止时间，合并窗口不超过剩余时间的一半
+            result: 执行结果字典
+        """
+        record_id = result.get('record_id')
+        entry_id = self.digest.submit(record_id, trigger_type, trigger_time, camera_path, screenshot_path)
+        if entry_id > 0:
+            entries = self.digest.collect(entry_id, trigger_type, deadline)
+        else:
+            logger.warning("加入合并队列失败，直接发送通知")
+            entries = [{
+                'record_id': record_id,
+                'trigger_type': trigger_type,
+                'trigger_time': trigger_time.isoformat(),
+                'camera_path': str(camera_path) if camera_path else None,
+                'screenshot_path': str(screenshot_path) if screenshot_path else None
+            }]
+
+        if not entries:
+            return
+
+        self._wait_for_network(deadline)
+
+        sent = self.digest.send(self.notifier, entries)
+        has_pending = bool(self.notifier.get_pending_payloads())
+        if sent:
+            method = self.notifier.last_method
+            result['notification_sent'] = True
+            result['time_to_images'] = round(time.monotonic() - start, 3)
+            if result['time_to_first_alert'] is None:
+                result['time_to_first_alert'] = result['time_to_images']
+            logger.info(f"汇总通知发送成功 ({len(entries)} 次触发, {result['time_to_images']} 秒)")
+        else:
+            method = 'queued' if has_pending else 'failed'
+            logger.error("汇总通知发送失败")
+
+        for entry in entries:
+            if not entry['record_id']:
+                continue
+            # 两段式通知的文字告警已送达时，保留本次记录的通知状态
+            if not sent and entry['record_id'] == record_id and result['notification_sent']:
+                continue
+            self.db.update_notification_status(entry['record_id'], sent, method)
+
+        if has_pending:
+            self.outbox.enqueue(record_id, self.notifier)
+
+    def _send_alert(self, trigger_type: str, trigger_time: datetime, start: float, deadline: Deadline,
+                    result: Dict, alert_result: Dict):
+        """
+        发送两段式通知的文字告警（在后台线程中执行）
+
+        Args:
+            trigger_type: 触发类型
+            trigger_time: 触发时间
+            start: 任务开始时刻（time.monotonic）
+            deadline: 截止时间
+            result: 执行结果字典，写入 time_to_first_alert
+            alert_result: 告警发送结果，写入 sent
+        """
+        try:
+            with deadline.stage('alert'):
+                self._wait_for_network(deadline)
+
+                logger.info("正在发送文字告警...")
+                alert_sent = self.notifier.send_alert(trigger_type, trigger_time)
+
+            if alert_sent:
+                alert_result['sent'] = True
+                result['time_to_first_alert'] = round(time.monotonic() - start, 3)
+                logger.info(f"文字告警已发送 ({result['time_to_first_alert']} 秒)")
+            else:
+                logger.error("文字告警发送失败")
+
+        except Exception as e:
+            logger.error(f"发送文字告警异常: {e}")
+
     def test_all_components(self) -> Dict:
         """
         测试所有组件
@@ -1,33 +1,521 @@
 """
 微信通知模块
 使用 PushPlus 服务发送微信通知
-支持混合图片发送方案
+支持混合图片发送方案和多渠道并发推送
 """
 
 import requests
+from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
+from .throttle import ProviderGuard
 from ..utils.logger import Logger
 from ..utils.image_helper import ImageHelper
+from ..utils.deadline import Deadline
+from ..utils.http_session import get_session, reset_session, DEFAULT_TIMEOUT
 
 logger = Logger()
 
 
-class PushPlusNotifier:
+class BaseNotifier(ABC):
+    """
+    通知渠道基类
+
+    子类实现 send_text / send_with_images / send_payload，
+    开机、唤醒、手动触发等通知内容以及图片选择逻辑由基类统一处理
+    """
+
+    PROVIDER = 'base'
+
+    # 默认图片预算权重
+    DEFAULT_IMAGE_WEIGHTS = {'camera': 3, 'screenshot': 2}
+
+    # 发送图片至少需要的剩余时间（秒），不足时只发送文字通知
+    MIN_IMAGE_SECONDS = 5
+
+    # 各触发类型的通知标题和正文模板
+    TRIGGER_MESSAGES = {
+        'boot': ("电脑已开机", "您的电脑已于 {time} 开机。"),
+        'wake': ("电脑已从休眠唤醒", "您的电脑已于 {time} 从休眠状态唤醒。"),
+        'manual': ("DonTouchMe 手动触发", "手动触发时间: {time}")
+    }
+
+    def __init__(self, image_format: str = 'jpeg', image_weights: Optional[Dict[str, float]] = None,
+                 collage: Optional[Dict] = None, imgbed: Optional[Dict] = None,
+                 connect_timeout: float = DEFAULT_TIMEOUT[0], read_timeout: float = DEFAULT_TIMEOUT[1],
+                 name: Optional[str] = None):
+        """
+        初始化通知器
+
+        Args:
+            image_format: Base64 图片编码格式（jpeg/webp/avif），不支持时降级为 jpeg
+            image_weights: 各类图片分配 Base64 预算的权重，如 {'camera': 3, 'screenshot': 2}
+            collage: 拼图配置，如 {'enabled': True, 'layout': 'horizontal', 'overlay_scale': 0.35}
+            imgbed: 图床配置，Base64 方案失败时上传图床，如 {'service': 'sm.ms'}
+            connect_timeout: 连接超时（秒）
+            read_timeout: 读取超时（秒）
+            name: 渠道名称（同类型多个渠道时各不相同），用作限流熔断状态和发件箱条目的键，默认为 PROVIDER
+        """
+        self.name = name or self.PROVIDER
+        self.image_format = ImageHelper.resolve_format(image_format)
+        self.image_weights = dict(self.DEFAULT_IMAGE_WEIGHTS)
+        if image_weights:
+            self.image_weights.update(image_weights)
+        self.collage = collage or {}
+        self.imgbed = imgbed
+        self.timeout = (connect_timeout, read_timeout)
+
+        # 最近一次发送的结果，供调用方记录通知方式和加入发件箱
+        self.last_method = 'none'
+        self.pending_payload: Optional[Dict] = None
+        self.pending_method: Optional[str] = None
+
+        # 最近一次发送时请求内容的问题（如发件箱重试时附件图片已被清理），由发件箱记录到条目中
+        self.payload_warning: Optional[str] = None
+
+        # 服务端明确限流或拒绝 Token 时由子类置位，熔断器据此立即打开
+        self.blocked = False
+
+        # 最近一次请求没有到达服务端（DNS 解析失败、无法建立连接）时由子类置位，不计入熔断
+        self.network_error = False
+
+        # 速率限制和熔断器，由 create_notifier 按配置设置
+        self.guard: Optional[ProviderGuard] = None
+
+        # 本次触发的截止时间，由 Monitor 设置
+        self.deadline: Optional[Deadline] = None
+
+    @property
+    def endpoint(self) -> str:
+        """通知服务地址（用于发送前的网络探测）"""
+        return ''
+
+    def reset_delivery_state(self):
+        """清除上一次发送的结果"""
+        self.last_method = 'none'
+        self.pending_payload = None
+        self.pending_method = None
+        self.payload_warning = None
+        self.blocked = False
+        self.network_error = False
+
+    def set_deadline(self, deadline: Optional[Deadline]):
+        """设置截止时间，之后的图片准备和请求只使用剩余时间"""
+        self.deadline = deadline
+
+    def _request_timeout(self) -> Tuple[float, float]:
+        """本次请求的超时（连接超时, 读取超时），不超过剩余时间"""
+        return self.deadline.http_timeout(self.timeout) if self.deadline else self.timeout
+
+    def _has_time_for_images(self) -> bool:
+        """剩余时间是否足够准备和发送图片"""
+        if self.deadline and not self.deadline.has(self.MIN_IMAGE_SECONDS):
+            logger.warning(f"剩余时间不足 {self.MIN_IMAGE_SECONDS} 秒，跳过图片，仅发送文字通知")
+            return False
+        return True
+
+    def allow_send(self) -> bool:
+        """检查速率限制和熔断器是否允许发送"""
+        return self.guard is None or self.guard.allow()
+
+    def record_result(self, ok: bool):
+        """把发送结果反馈给熔断器"""
+        network_error, self.network_error = self.network_error, False
+        if self.guard is None:
+            return
+        if ok:
+            self.guard.record_success()
+        else:
+            self.guard.record_failure(blocked=self.blocked, network_error=network_error)
+
+    def _track_request_error(self, error: Optional[Exception] = None):
+        """
+        记录最近一次请求是否没有到达服务端
+
+        Args:
+            error: 请求异常，收到响应时为 None
+        """
+        self.network_error = isinstance(error, requests.ConnectionError)
+
+    def _text_payload(self, title: str, content: str) -> Dict:
+        """构建纯文字通知的请求内容（熔断时直接加入发件箱）"""
+        return {'title': title, 'content': content}
+
+    def _guarded_send(self, title: str, content: str, action: Callable[[], bool]) -> bool:
+        """
+        在速率限制和熔断器保护下发送
+
+        不允许发送时跳过图片准备和请求，把纯文字通知留给发件箱稍后重试
+
+        Args:
+            title: 标题
+            content: 内容
+            action: 实际发送函数
+
+        Returns:
+            是否发送成功
+        """
+        if not self.allow_send():
+            self._remember_pending(self._text_payload(title, content), 'text')
+            return False
+
+        ok = action()
+        self.record_result(ok)
+        return ok
+
+    def _remember_pending(self, payload: Dict, method: str):
+        """记录因网络原因失败的第一份请求内容，以便加入发件箱稍后重试"""
+        if self.pending_payload is None:
+            self.pending_payload = payload
+            self.pending_method = method
+
+    def get_pending_payloads(self) -> List[Tuple[str, Dict, str]]:
+        """
+        获取待重试的请求内容
+
+        Returns:
+            (渠道名称, 请求内容, 通知方式) 列表
+        """
+        if self.pending_payload is None:
+            return []
+        return [(self.name, self.pending_payload, self.pending_method or 'text')]
+
+    def get_channel(self, name: str) -> Optional['BaseNotifier']:
+        """按渠道名称查找通知器"""
+        return self if name == self.name else None
+
+    @abstractmethod
+    def send_text(self, title: str, content: str) -> bool:
+        """发送纯文字通知"""
+
+    @abstractmethod
+    def send_with_images(self, title: str, content: str, image_paths: List[Path],
+                         weights: Optional[List[float]] = None) -> bool:
+        """发送包含图片的通知"""
+
+    @abstractmethod
+    def send_payload(self, payload: Dict) -> bool:
+        """发送已准备好的请求内容（用于发件箱重试）"""
+
+    def _send_trigger_notification(self, title: str, content: str,
+                                   camera_path: Optional[Path] = None,
+                                   screenshot_path: Optional[Path] = None) -> bool:
+        """
+        发送触发通知，摄像头照片和屏幕截图按权重共享消息预算
+
+        Args:
+            title: 标题
+            content: 内容
+            camera_path: 摄像头照片路径
+            screenshot_path: 屏幕截图路径
+
+        Returns:
+            是否发送成功
+        """
+        self.reset_delivery_state()
+
+        return self._guarded_send(
+            title, content,
+            lambda: self._send_trigger_images(title, content, camera_path, screenshot_path)
+        )
+
+    def _send_trigger_images(self, title: str, content: str, camera_path: Optional[Path],
+                             screenshot_path: Optional[Path]) -> bool:
+        """选择要发送的图片（拼图模式下先合成）并发送"""
+        if (camera_path or screenshot_path) and not self._has_time_for_images():
+            return self.send_text(title, f"{content}\n\n注意：时间不足，图片未发送，请在程序中查看历史记录。")
+
+        images = []
+        weights = []
+        for kind, path in (('camera', camera_path), ('screenshot', screenshot_path)):
+            if path and Path(path).exists():
+                images.append(Path(path))
+                weights.append(self.image_weights.get(kind, 1))
+
+        # 拼图模式：两张图片合成一张，只编码一次并独享全部预算
+        if self.collage.get('enabled') and len(images) == 2:
+            collage_path = ImageHelper.compose_collage(
+                images[0], images[1],
+                layout=self.collage.get('layout', 'horizontal'),
+                overlay_scale=self.collage.get('overlay_scale', 0.35)
+            )
+            if collage_path:
+                try:
+                    return self.send_with_images(title, content, [collage_path])
+                finally:
+                    try:
+                        collage_path.unlink()
+                    except:
+                        pass
+            logger.warning("拼图失败，改为分别发送图片")
+
+        return self.send_with_images(title, content, images, weights=weights)
+
+    def build_trigger_message(self, trigger_type: str, trigger_time: Optional[datetime] = None) -> Tuple[str, str]:
+        """
+        生成触发通知的标题和正文
+
+        Args:
+            trigger_type: 触发类型（boot/wake/manual）
+            trigger_time: 触发时间，默认为当前时间
+
+        Returns:
+            (标题, 正文)
+        """
+        title, template = self.TRIGGER_MESSAGES.get(trigger_type, self.TRIGGER_MESSAGES['manual'])
+        current_time = (trigger_time or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        return title, template.format(time=current_time)
+
+    def send_trigger_notification(self, trigger_type: str, camera_path: Optional[Path] = None,
+                                  screenshot_path: Optional[Path] = None,
+                                  trigger_time: Optional[datetime] = None, follow_up: bool = False) -> bool:
+        """
+        发送触发通知
+
+        Args:
+            trigger_type: 触发类型（boot/wake/manual）
+            camera_path: 摄像头照片路径
+            screenshot_path: 屏幕截图路径
+            trigger_time: 触发时间，默认为当前时间
+            follow_up: 是否为两段式通知的第二条（图片跟进）
+
+        Returns:
+            是否发送成功
+        """
+        title, content = self.build_trigger_message(trigger_type, trigger_time)
+        if follow_up:
+            title = f"{title}（图片）"
+
+        return self._send_trigger_notification(title, content, camera_path, screenshot_path)
+
+    def send_alert(self, trigger_type: str, trigger_time: Optional[datetime] = None) -> bool:
+        """
+        立即发送纯文字告警（两段式通知的第一条），图片随后另行发送
+
+        Args:
+            trigger_type: 触发类型（boot/wake/manual）
+            trigger_time: 触发时间，默认为当前时间
+
+        Returns:
+            是否发送成功
+        """
+        self.reset_delivery_state()
+
+        title, content = self.build_trigger_message(trigger_type, trigger_time)
+        content = f"{content}\n\n照片和截图稍后发送。"
+        return self._guarded_send(title, content, lambda: self.send_text(title, content))
+
+    def send_digest_notification(self, triggers: List[Dict], max_images: int = 2) -> bool:
+        """
+        发送合并窗口内多次触发的汇总通知，所有图片共享一条消息的预算
+
+        Args:
+            triggers: 触发列表，每项包含 trigger_type、trigger_time（ISO 格式）、camera_path、screenshot_path
+            max_images: 最多附带的图片数，优先保留最近的触发
+
+        Returns:
+            是否发送成功
+        """
+        self.reset_delivery_state()
+
+        title = f"DonTouchMe 汇总: {len(triggers)} 次触发"
+        lines = []
+        for trigger in triggers:
+            trigger_title = self.TRIGGER_MESSAGES.get(trigger['trigger_type'], self.TRIGGER_MESSAGES['manual'])[0]
+            trigger_time = datetime.fromisoformat(trigger['trigger_time']).strftime("%Y-%m-%d %H:%M:%S")
+            lines.append(f"{trigger_time} {trigger_title}")
+        content = "\n".join(lines)
+
+        images = []
+        weights = []
+        for trigger in reversed(triggers):
+            for kind in ('camera', 'screenshot'):
+                path = trigger.get(f'{kind}_path')
+                if path and Path(path).exists() and len(images) < max_images:
+                    images.append(Path(path))
+                    weights.append(self.image_weights.get(kind, 1))
+
+        if images and not self._has_time_for_images():
+            images, weights = [], []
+            content = f"{content}\n\n注意：时间不足，图片未发送，请在程序中查看历史记录。"
+
+        return self._guarded_send(title, content,
+                                  lambda: self.send_with_images(title, content, images, weights=weights))
+
+    def send_boot_notification(self, camera_path: Optional[Path] = None, screenshot_path: Optional[Path] = None) -> bool:
+        """
+        发送开机通知
+
+        Args:
+            camera_path: 摄像头照片路径
+            screenshot_path: 屏幕截图路径
+
+        Returns:
+            是否发送成功
+        """
+        return self.send_trigger_notification('boot', camera_path, screenshot_path)
+
+    def send_wake_notification(self, camera_path: Optional[Path] = None, screenshot_path: Optional[Path] = None) -> bool:
+        """
+        发送唤醒通知
+
+        Args:
+            camera_path: 摄像头照片路径
+            screenshot_path: 屏幕截图路径
+
+        Returns:
+            是否发送成功
+        """
+        return self.send_trigger_notification('wake', camera_path, screenshot_path)
+
+    def send_manual_notification(self, camera_path: Optional[Path] = None, screenshot_path: Optional[Path] = None) -> bool:
+        """
+        发送手动触发通知
+
+        Args:
+            camera_path: 摄像头照片路径
+            screenshot_path: 屏幕截图路径
+
+        Returns:
+            是否发送成功
+        """
+        return self.send_trigger_notification('manual', camera_path, screenshot_path)
+
+    def test_connection(self) -> bool:
+        """
+        测试通知渠道连接
+
+        Returns:
+            连接是否正常
+        """
+        # 测试不受速率限制和熔断器约束，成功时关闭熔断器
+        ok = self.send_text("DonTouchMe 测试", "这是一条测试消息，如果您收到这条消息，说明配置正确。")
+        self.record_result(ok)
+        return ok
+
+
+class PushPlusNotifier(BaseNotifier):
     """PushPlus 微信通知器"""
 
+    PROVIDER = 'pushplus'
+
     API_URL = "http://www.pushplus.plus/send"
 
-    def __init__(self, token: str):
+    # PushPlus 消息内容上限（字符数）
+    CONTENT_LIMIT = 20000
+
+    # 预留的安全余量（字符数），防止服务端计数方式差异导致超限
+    CONTENT_MARGIN = 200
+
+    # 表示账号受限（超出调用次数）或 Token 无效的返回码，重试没有意义，熔断器立即打开
+    BLOCKING_CODES = (900, 903)
+
+    def __init__(self, token: str, api_url: Optional[str] = None, topic: str = '',
+                 recipients: Optional[List[str]] = None, **options):
         """
         初始化通知器
 
+        群组和好友令牌由 PushPlus 服务端分发，多人接收时仍只发送一次请求
+
         Args:
             token: PushPlus Token
+            api_url: 接口地址，默认为官方地址（测试时可指向 scripts/pushplus_stub.py）
+            topic: 群组编码，消息发送给群组内所有订阅者
+            recipients: 好友令牌列表，消息发送给这些好友
+            options: 通用选项（image_format/image_weights/collage/imgbed/超时），参见 BaseNotifier
         """
+        super().__init__(**options)
         self.token = token
+        self.api_url = api_url or self.API_URL
+        self.topic = topic or ''
+        self.recipients = [r for r in (recipients or []) if r]
+
+    @property
+    def endpoint(self) -> str:
+        return self.api_url
+
+    def _audience(self) -> Dict:
+        """接收者参数（群组编码和逗号分隔的好友令牌），不保存到发件箱，重试时使用当前配置"""
+        audience = {}
+        if self.topic:
+            audience['topic'] = self.topic
+        if self.recipients:
+            audience['to'] = ','.join(self.recipients)
+        return audience
+
+    def _post(self, data: Dict, method: str) -> Dict:
+        """
+        通过共享连接池会话发送请求
+
+        同一进程内的多次发送（包括降级重发和托盘进程的多次触发）复用同一连接；
+        连接异常时重置会话，避免继续使用失效的空闲连接。
+        因网络原因失败的第一份请求内容会被保留，以便加入发件箱稍后重试
+
+        Args:
+            data: 请求表单数据
+            method: 通知方式（base64/url/text）
+
+        Returns:
+            响应 JSON
+        """
+        try:
+            response = get_session().post(self.api_url, data={**data, **self._audience()},
+                                          timeout=self._request_timeout())
+            self._track_request_error()
+            if response.status_code == 429:
+                self.blocked = True
+            result = response.json()
+        except requests.RequestException as e:
+            self._track_request_error(e)
+            self._remember_pending({k: v for k, v in data.items() if k != 'token'}, method)
+            reset_session()
+            raise
+
+        if result.get('code') == 200:
+            self.last_method = method
+        elif result.get('code') in self.BLOCKING_CODES:
+            self.blocked = True
+
+        return result
+
+    def send_payload(self, payload: Dict) -> bool:
+        """
+        发送已准备好的请求内容（用于发件箱重试）
+
+        Args:
+            payload: 不含 Token 的请求表单数据
+
+        Returns:
+            是否发送成功
+        """
+        try:
+            data = dict(payload)
+            data['token'] = self.token
+            data.update(self._audience())
+
+            response = get_session().post(self.api_url, data=data, timeout=self._request_timeout())
+            self._track_request_error()
+            result = response.json()
+
+            if result.get('code') == 200:
+                return True
+
+            self.blocked = result.get('code') in self.BLOCKING_CODES
+            logger.error(f"重发通知失败: {result.get('msg', '未知错误')}")
+            return False
+
+        except requests.ConnectionError as e:
+            self._track_request_error(e)
+            reset_session()
+            logger.error(f"重发通知网络异常: {e}")
+            return False
+
+        except Exception as e:
+            logger.error(f"重发通知异常: {e}")
+            return False
 
     def send_text(self, title: str, content: str) -> bool:
         """
@@ -43,15 +531,10 @@ class PushPlusNotifier:
         try:
             logger.info(f"发送文字通知: {title}")
 
-            data = {
-                'token': self.token,
-                'title': title,
-                'content': content,
-                'template': 'txt'
-            }
+            data = self._text_payload(title, content)
+            data['token'] = self.token
 
-            response = requests.post(self.API_URL, data=data, timeout=30)
-            result = response.json()
+            result = self._post(data, 'text')
 
             if result.get('code') == 200:
                 logger.info("文字通知发送成功")
@@ -65,7 +548,42 @@ class PushPlusNotifier:
             logger.error(f"发送文字通知异常: {e}")
             return False
 
-    def send_with_base64(self, title: str, content: str, base64_list: List[str]) -> bool:
+    def _text_payload(self, title: str, content: str) -> Dict:
+        return {'title': title, 'content': content, 'template': 'txt'}
+
+    @staticmethod
+    def _build_base64_html(content: str, base64_list: List[str], image_format: str) -> str:
+        """构建包含 Base64 图片的 HTML 内容"""
+        mime_type = ImageHelper.get_mime_type(image_format)
+
+        html_content = f"<p>{content}</p>"
+        for i, base64_str in enumerate(base64_list, 1):
+            html_content += f'<p>图片 {i}:</p>'
+            html_content += f'<img src="data:{mime_type};base64,{base64_str}" style="max-width:100%;"/><br>'
+        return html_content
+
+    def allocate_image_budget(self, content: str, weights: List[float]) -> List[float]:
+        """
+        计算每张图片允许的最大大小
+
+        从消息内容上限中扣除 HTML/文字的实际开销，剩余的 Base64 字符预算按权重分配
+
+        Args:
+            content: 通知正文
+            weights: 每张图片的权重
+
+        Returns:
+            每张图片允许的最大大小（KB）
+        """
+        overhead = len(self._build_base64_html(content, [''] * len(weights), self.image_format))
+        available = self.CONTENT_LIMIT - self.CONTENT_MARGIN - overhead
+
+        sizes_kb = ImageHelper.split_base64_budget(available, weights)
+        logger.debug(f"图片预算: 可用 {available} 字符, 分配 {[f'{s:.2f}KB' for s in sizes_kb]}")
+        return sizes_kb
+
+    def send_with_base64(self, title: str, content: str, base64_list: List[str],
+                         image_format: Optional[str] = None) -> bool:
         """
         发送包含 Base64 图片的通知
 
@@ -73,6 +591,7 @@ class PushPlusNotifier:
             title: 标题
             content: 内容
             base64_list: Base64 编码的图片列表
+            image_format: 图片编码格式，默认使用通知器配置的格式
 
         Returns:
             是否发送成功
@@ -80,11 +599,7 @@ class PushPlusNotifier:
         try:
             logger.info(f"发送 Base64 图片通知: {title} ({len(base64_list)} 张图片)")
 
-            # 构建 HTML 内容
-            html_content = f"<p>{content}</p>"
-            for i, base64_str in enumerate(base64_list, 1):
-                html_content += f'<p>图片 {i}:</p>'
-                html_content += f'<img src="data:image/jpeg;base64,{base64_str}" style="max-width:100%;"/><br>'
+            html_content = self._build_base64_html(content, base64_list, image_format or self.image_format)
 
             data = {
                 'token': self.token,
@@ -93,8 +608,7 @@ class PushPlusNotifier:
                 'template': 'html'
             }
 
-            response = requests.post(self.API_URL, data=data, timeout=30)
-            result = response.json()
+            result = self._post(data, 'base64')
 
             if result.get('code') == 200:
                 logger.info("Base64 图片通知发送成功")
@@ -137,8 +651,7 @@ class PushPlusNotifier:
                 'template': 'html'
             }
 
-            response = requests.post(self.API_URL, data=data, timeout=30)
-            result = response.json()
+            result = self._post(data, 'url')
 
             if result.get('code') == 200:
                 logger.info("图片 URL 通知发送成功")
@@ -152,18 +665,21 @@ class PushPlusNotifier:
             logger.error(f"发送图片 URL 通知异常: {e}")
             return False
 
-    def send_with_images(self, title: str, content: str, image_paths: List[Path]) -> bool:
+    def send_with_images(self, title: str, content: str, image_paths: List[Path],
+                         weights: Optional[List[float]] = None) -> bool:
         """
         发送包含图片的通知（简化降级方案）
 
         方案优先级：
-        1. Base64 编码（小于 100KB）
-        2. 仅文字通知（Base64失败时降级）
+        1. Base64 编码（按权重分配消息内容预算）
+        2. 图床 URL（图片无法压缩到预算内时）
+        3. 仅文字通知（前两种方案失败时降级）
 
         Args:
             title: 标题
             content: 内容
             image_paths: 图片路径列表
+            weights: 每张图片的预算权重，默认平均分配
 
         Returns:
             是否发送成功
@@ -173,101 +689,181 @@ class PushPlusNotifier:
 
         logger.info(f"准备发送图片通知 ({len(image_paths)} 张图片)...")
 
+        # PushPlus限制消息内容不超过2万字，扣除HTML开销后按权重分配给各图片
+        if not weights:
+            weights = [1] * len(image_paths)
+        size_limits = self.allocate_image_budget(content, weights)
+
         # 使用混合智能降级方案准备图片
-        # PushPlus限制消息内容不超过2万字，Base64编码后约15KB可满足要求
-        method, data = ImageHelper.prepare_images_for_notification(image_paths, max_size_kb=15)
+        method, data = ImageHelper.prepare_images_for_notification(
+            image_paths, max_size_kb=size_limits, image_format=self.image_format, imgbed=self.imgbed,
+            deadline=self.deadline
+        )
 
         if method == 'base64':
             # 尝试方案1: Base64 编码
             logger.info("尝试使用Base64方案发送图片...")
-            if self.send_with_base64(title, content, data):
+            if self.send_with_base64(title, content, data, image_format=self.image_format):
                 return True
 
+            # 服务端限流或 Token 无效时降级重发也会失败
+            if self.blocked:
+                return False
+
             # Base64失败，降级到纯文字
             logger.warning("Base64发送失败，降级到纯文字方案...")
             fallback_content = f"{content}\n\n注意：图片发送失败，请在程序中查看历史记录。"
             return self.send_text(title, fallback_content)
 
+        elif method == 'url':
+            # 尝试方案2: 图床 URL
+            logger.info("尝试使用图床URL方案发送图片...")
+            if self.send_with_urls(title, content, data):
+                return True
+
+            # 服务端限流或 Token 无效时降级重发也会失败
+            if self.blocked:
+                return False
+
+            logger.warning("图床URL发送失败，降级到纯文字方案...")
+            fallback_content = f"{content}\n\n注意：图片发送失败，请在程序中查看历史记录。"
+            return self.send_text(title, fallback_content)
+
         else:
             # 图片过大，直接使用纯文字
             logger.info("图片过大，使用纯文字方案...")
             fallback_content = f"{content}\n\n注意：图片过大无法发送，请在程序中查看历史记录。"
             return self.send_text(title, fallback_content)
 
-    def send_boot_notification(self, camera_path: Optional[Path] = None, screenshot_path: Optional[Path] = None) -> bool:
-        """
-        发送开机通知
 
-        Args:
-            camera_path: 摄像头照片路径
-            screenshot_path: 屏幕截图路径
+class MultiNotifier(BaseNotifier):
+    """
+    多渠道通知器
 
-        Returns:
-            是否发送成功
-        """
-        title = "电脑已开机"
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        content = f"您的电脑已于 {current_time} 开机。"
+    并发向所有渠道发送，总耗时取决于最慢的渠道而不是各渠道之和。
+    整体是否成功由策略决定：
+    - any: 任一渠道成功即成功
+    - all: 所有渠道都成功才算成功
+    - primary: 以第一个渠道（主渠道）的结果为准，其余渠道尽力发送
+    """
 
-        images = []
-        if camera_path and camera_path.exists():
-            images.append(camera_path)
-        # 只发送摄像头照片，不发送屏幕截图（避免Base64过大）
+    PROVIDER = 'multi'
 
-        return self.send_with_images(title, content, images)
+    POLICIES = ('any', 'all', 'primary')
 
-    def send_wake_notification(self, camera_path: Optional[Path] = None, screenshot_path: Optional[Path] = None) -> bool:
+    def __init__(self, channels: List[BaseNotifier], policy: str = 'any', **options):
         """
-        发送唤醒通知
+        初始化多渠道通知器
 
         Args:
-            camera_path: 摄像头照片路径
-            screenshot_path: 屏幕截图路径
-
-        Returns:
-            是否发送成功
+            channels: 通知渠道列表，第一个为主渠道
+            policy: 成功判定策略（any/all/primary）
+            options: 通用选项，参见 BaseNotifier
         """
-        title = "电脑已从休眠唤醒"
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        content = f"您的电脑已于 {current_time} 从休眠状态唤醒。"
-
-        images = []
-        if camera_path and camera_path.exists():
-            images.append(camera_path)
-        # 只发送摄像头照片，不发送屏幕截图（避免Base64过大）
+        super().__init__(**options)
+        self.channels = channels
+
+        if policy not in self.POLICIES:
+            logger.warning(f"未知的通知策略 {policy}，使用 any")
+            policy = 'any'
+        self.policy = policy
+
+    @property
+    def endpoint(self) -> str:
+        return self.channels[0].endpoint if self.channels else ''
+
+    def reset_delivery_state(self):
+        super().reset_delivery_state()
+        for channel in self.channels:
+            channel.reset_delivery_state()
+
+    def set_deadline(self, deadline: Optional[Deadline]):
+        super().set_deadline(deadline)
+        for channel in self.channels:
+            channel.set_deadline(deadline)
+
+    def get_pending_payloads(self) -> List[Tuple[str, Dict, str]]:
+        pending = []
+        for channel in self.channels:
+            pending.extend(channel.get_pending_payloads())
+        return pending
+
+    def get_channel(self, name: str) -> Optional[BaseNotifier]:
+        for channel in self.channels:
+            found = channel.get_channel(name)
+            if found is not None:
+                return found
+        return None
+
+    @staticmethod
+    def _call_channel(channel: BaseNotifier, action: Callable[[BaseNotifier], bool],
+                      title: Optional[str], content: Optional[str]) -> bool:
+        """调用单个渠道，异常视为失败；提供标题时受该渠道的速率限制和熔断器保护"""
+        def _send() -> bool:
+            try:
+                return bool(action(channel))
+            except Exception as e:
+                logger.error(f"通知渠道 {channel.name} 发送异常: {e}")
+                return False
 
-        return self.send_with_images(title, content, images)
+        if title is None:
+            return _send()
+        return channel._guarded_send(title, content, _send)
 
-    def send_manual_notification(self, camera_path: Optional[Path] = None, screenshot_path: Optional[Path] = None) -> bool:
+    def _fan_out(self, action: Callable[[BaseNotifier], bool], title: Optional[str] = None,
+                 content: Optional[str] = None) -> bool:
         """
-        发送手动触发通知
+        并发调用所有渠道并按策略汇总结果
 
         Args:
-            camera_path: 摄像头照片路径
-            screenshot_path: 屏幕截图路径
+            action: 对单个渠道执行的发送函数
+            title: 标题，提供时各渠道按自身的速率限制和熔断器决定是否发送
+            content: 内容
 
         Returns:
-            是否发送成功
+            整体是否成功
         """
-        title = "DonTouchMe 手动触发"
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        content = f"手动触发时间: {current_time}"
+        if not self.channels:
+            return False
 
-        images = []
-        if camera_path and camera_path.exists():
-            images.append(camera_path)
-        # 只发送摄像头照片，不发送屏幕截图（避免Base64过大）
+        if len(self.channels) == 1:
+            results = [self._call_channel(self.channels[0], action, title, content)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(self.channels), thread_name_prefix='notify') as executor:
+                futures = [executor.submit(self._call_channel, channel, action, title, content)
+                           for channel in self.channels]
+                results = [future.result() for future in futures]
+
+        for channel, ok in zip(self.channels, results):
+            logger.info(f"通知渠道 {channel.name}: {'成功' if ok else '失败'}")
+
+        # 记录实际使用的通知方式：优先取主渠道
+        for channel, ok in zip(self.channels, results):
+            if ok:
+                self.last_method = channel.last_method
+                break
+
+        if self.policy == 'all':
+            return all(results)
+        if self.policy == 'primary':
+            return results[0]
+        return any(results)
+
+    def send_text(self, title: str, content: str) -> bool:
+        return self._fan_out(lambda channel: channel.send_text(title, content), title, content)
 
-        return self.send_with_images(title, content, images)
+    def send_with_images(self, title: str, content: str, image_paths: List[Path],
+                         weights: Optional[List[float]] = None) -> bool:
+        return self._fan_out(lambda channel: channel.send_with_images(title, content, image_paths, weights),
+                             title, content)
 
     def test_connection(self) -> bool:
-        """
-        测试 PushPlus 连接
+        return self._fan_out(lambda channel: channel.test_connection())
 
-        Returns:
-            连接是否正常
-        """
-        return self.send_text("DonTouchMe 测试", "这是一条测试消息，如果您收到这条消息，说明配置正确。")
+    def send_payload(self, payload: Dict) -> bool:
+        # 发件箱按渠道名称找到具体渠道重试，不会直接调用组合通知器
+        logger.error("多渠道通知器不支持直接重发，请通过 get_channel 获取具体渠道")
+        return False
 
 
 if __name__ == '__main__':
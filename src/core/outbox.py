@@ -0,0 +1,198 @@
+"""
+通知发件箱模块
+发送失败的通知连同已准备好的请求内容保存在数据库中，按指数退避加抖动重试
+"""
+
+import time
+import random
+import threading
+from typing import Callable, Optional
+
+from .database import Database
+from .notifier import BaseNotifier
+from ..utils.logger import Logger
+
+logger = Logger()
+
+
+class NotificationOutbox:
+    """通知发件箱"""
+
+    # 首次重试等待秒数，之后每次翻倍
+    BASE_DELAY = 30
+
+    # 最长重试间隔（秒）
+    MAX_DELAY = 3600
+
+    # 最多尝试次数，超过后标记为 dead
+    MAX_ATTEMPTS = 10
+
+    # 重试期间占用条目的时长（秒），防止托盘进程和命令行进程重复发送
+    LEASE_SECONDS = 120
+
+    def __init__(self, db: Database):
+        """
+        初始化发件箱
+
+        Args:
+            db: 数据库实例
+        """
+        self.db = db
+
+    @classmethod
+    def next_delay(cls, attempts: int) -> float:
+        """
+        计算下次重试前的等待时间（指数退避 + 抖动）
+
+        取退避时间的一半作为固定部分，另一半随机，避免多个条目同时重试
+
+        Args:
+            attempts: 已尝试次数
+
+        Returns:
+            等待秒数
+        """
+        delay = min(cls.MAX_DELAY, cls.BASE_DELAY * (2 ** attempts))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def enqueue(self, record_id: Optional[int], notifier: BaseNotifier) -> int:
+        """
+        将通知器中因网络原因未送达的请求加入发件箱（多渠道时每个失败渠道一条）
+
+        Args:
+            record_id: 关联的历史记录ID
+            notifier: 通知器
+
+        Returns:
+            加入发件箱的条目数
+        """
+        count = 0
+        for provider, payload, method in notifier.get_pending_payloads():
+            entry_id = self.db.add_outbox_entry(
+                record_id=record_id,
+                provider=provider,
+                payload=payload,
+                notification_method=method,
+                next_attempt_at=time.time() + self.next_delay(0)
+            )
+            if entry_id > 0:
+                count += 1
+        return count
+
+    def has_due(self) -> bool:
+        """是否有已到重试时间的条目"""
+        return bool(self.db.get_due_outbox_entries(time.time(), limit=1))
+
+    def process_due(self, notifier: BaseNotifier, limit: int = 10) -> int:
+        """
+        重试已到时间的条目
+
+        Args:
+            notifier: 通知器，按条目的渠道名称找到具体渠道重发
+            limit: 本次最多处理的条目数
+
+        Returns:
+            本次成功送达的条目数
+        """
+        entries = self.db.get_due_outbox_entries(time.time(), limit=limit)
+        if not entries:
+            return 0
+
+        logger.info(f"发件箱: {len(entries)} 条通知待重试")
+        sent_count = 0
+
+        for entry in entries:
+            channel = notifier.get_channel(entry['provider'])
+            if channel is None:
+                continue  # 该渠道已不在配置中
+
+            if not channel.allow_send():
+                continue  # 渠道熔断中或超出速率限制，不计入重试次数
+
+            lease_until = time.time() + self.LEASE_SECONDS
+            if not self.db.claim_outbox_entry(entry['id'], entry['next_attempt_at'], lease_until):
+                continue  # 已被其它进程领取
+
+            attempts = entry['attempts'] + 1
+
+            channel.payload_warning = None
+            ok = channel.send_payload(entry['payload'])
+            channel.record_result(ok)
+
+            if ok:
+                # 送达但内容不完整（如附件图片已被清理）时记录原因
+                self.db.update_outbox_entry(entry['id'], 'sent', attempts, lease_until,
+                                            last_error=channel.payload_warning)
+                if entry['record_id']:
+                    self.db.update_notification_status(entry['record_id'], True, entry['notification_method'])
+                logger.info(f"发件箱通知重试成功: ID={entry['id']} (第 {attempts} 次)"
+                            f"{f'，{channel.payload_warning}' if channel.payload_warning else ''}")
+                sent_count += 1
+                continue
+
+            if attempts >= self.MAX_ATTEMPTS:
+                self.db.update_outbox_entry(entry['id'], 'dead', attempts, lease_until,
+                                            last_error="超过最大重试次数")
+                # 两段式通知中文字已送达（或其它渠道已送达）时保留已送达状态
+                if entry['record_id']:
+                    self.db.update_notification_status(entry['record_id'], False, 'failed', only_if_unsent=True)
+                logger.error(f"发件箱通知放弃重试: ID={entry['id']}")
+            else:
+                next_attempt_at = time.time() + self.next_delay(attempts)
+                self.db.update_outbox_entry(entry['id'], 'pending', attempts, next_attempt_at,
+                                            last_error="发送失败")
+                logger.warning(f"发件箱通知重试失败: ID={entry['id']} (第 {attempts} 次)")
+
+        return sent_count
+
+
+class OutboxWorker:
+    """发件箱后台重试线程（托盘程序中使用）"""
+
+    def __init__(self, notifier_factory: Callable, interval: float = 15, db: Optional[Database] = None):
+        """
+        初始化后台线程
+
+        Args:
+            notifier_factory: 创建通知器的函数，有到期条目时才调用，返回 None 表示通知未启用
+            interval: 检查间隔（秒）
+            db: 数据库实例
+        """
+        self.notifier_factory = notifier_factory
+        self.interval = interval
+        self.outbox = NotificationOutbox(db or Database())
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台线程"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-worker', daemon=True)
+        self._thread.start()
+        logger.info("发件箱后台重试已启动")
+
+    def stop(self):
+        """停止后台线程"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self.outbox.db.close()
+        logger.info("发件箱后台重试已停止")
+
+    def _run(self):
+        """后台循环：没有到期条目时只执行一次索引查询"""
+        while not self._stop_event.wait(self.interval):
+            try:
+                if not self.outbox.has_due():
+                    continue
+
+                notifier = self.notifier_factory()
+                if notifier is not None:
+                    self.outbox.process_due(notifier)
+
+            except Exception as e:
+                logger.error(f"发件箱重试异常: {e}")
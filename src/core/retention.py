@@ -0,0 +1,230 @@
+"""
+历史数据保留模块
+按 storage 配置（retention_days、max_images）删除过期的历史记录和对应的图片文件
+
+每批删除在一个短写事务中完成，批次之间暂停，每次运行最多处理固定批数，
+不会长时间占用写锁或磁盘，避免影响前台的触发任务
+"""
+
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .database import Database
+from ..utils.deadline import Deadline
+from ..utils.logger import Logger
+
+logger = Logger()
+
+
+class RetentionEngine:
+    """历史数据清理器"""
+
+    # 每批（一个写事务）最多删除的记录数
+    BATCH_SIZE = 100
+
+    # 每次运行默认最多处理的批数
+    MAX_BATCHES = 10
+
+    # 批次之间的暂停时间（秒），让出写锁和磁盘
+    BATCH_PAUSE = 0.2
+
+    def __init__(self, db: Database, retention_days: float = 30, max_images: int = 100):
+        """
+        初始化清理器
+
+        Args:
+            db: 数据库实例
+            retention_days: 记录保留天数，0 表示不按时间清理
+            max_images: 最多保留最近多少次触发的记录和图片，0 表示不限
+        """
+        self.db = db
+        self.retention_days = retention_days
+        self.max_images = max_images
+
+    @classmethod
+    def from_config(cls, db: Database, storage_config: Dict) -> Optional['RetentionEngine']:
+        """
+        按 storage 配置创建清理器
+
+        Args:
+            db: 数据库实例
+            storage_config: 配置中的 storage 部分
+
+        Returns:
+            清理器，未开启自动清理或开启了归档时返回 None
+
+        归档会把记录移出 capture_history，表中剩下的都是尚未归档的记录：较新的等待到期，
+        较旧的等待归档（如归档落后或刚开启归档时的积压）。此时按天数或按数量删除都会让记录
+        在归档前丢失，因此开启归档时不创建清理器，记录只通过归档移出
+        """
+        if not storage_config.get('auto_cleanup', True):
+            return None
+
+        retention_days = storage_config.get('retention_days', 30)
+        max_images = storage_config.get('max_images', 100)
+        if cls.archive_enabled(storage_config):
+            if retention_days > 0 or max_images > 0:
+                logger.warning(
+                    f"已开启归档，storage.retention_days ({retention_days:g}) 和 max_images ({max_images}) "
+                    f"不再删除记录，旧记录只通过归档移出"
+                )
+            return None
+
+        return cls(db, retention_days=retention_days, max_images=max_images)
+
+    @staticmethod
+    def archive_enabled(storage_config: Dict) -> bool:
+        """storage 配置是否开启了归档（after_days 为 0 时归档不处理任何记录，视为未开启）"""
+        archive_config = storage_config.get('archive', {})
+        return bool(archive_config.get('enabled', False)) and archive_config.get('after_days', 90) > 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否设置了任一清理条件"""
+        return self.retention_days > 0 or self.max_images > 0
+
+    def run(self, max_batches: Optional[int] = MAX_BATCHES, deadline: Optional[Deadline] = None) -> Dict:
+        """
+        执行一次清理
+
+        Args:
+            max_batches: 本次最多处理的批数，None 表示清理到没有可删除的记录为止
+            deadline: 截止时间，时间用完时停止（已开始的批次会完成）
+
+        Returns:
+            {'deleted_records', 'deleted_files', 'bytes_reclaimed', 'complete'}，
+            complete 表示已没有需要清理的记录
+        """
+        report = {'deleted_records': 0, 'deleted_files': 0, 'bytes_reclaimed': 0, 'complete': True}
+        if not self.enabled:
+            return report
+
+        before_ts = None
+        if self.retention_days > 0:
+            before_ts = Database.to_epoch_ms(datetime.now()) - int(self.retention_days * 86400 * 1000)
+        keep_latest = self.max_images if self.max_images > 0 else None
+
+        batches = 0
+        while True:
+            if max_batches is not None and batches >= max_batches:
+                report['complete'] = False
+                break
+            if deadline and deadline.expired():
+                report['complete'] = False
+                break
+            if batches:
+                time.sleep(self.BATCH_PAUSE)
+
+            purged = self.db.purge_records(before_ts, keep_latest, self.BATCH_SIZE)
+            if purged is None:
+                report['complete'] = False
+                break
+
+            batches += 1
+            report['deleted_records'] += purged['deleted']
+            files, size = self.remove_files(purged['paths'])
+            report['deleted_files'] += files
+            report['bytes_reclaimed'] += size
+
+            if purged['deleted'] < self.BATCH_SIZE:
+                break
+
+        if report['deleted_records']:
+            logger.info(
+                f"历史清理: 删除 {report['deleted_records']} 条记录、{report['deleted_files']} 个文件，"
+                f"释放 {report['bytes_reclaimed'] / 1024 / 1024:.1f}MB"
+                f"{'' if report['complete'] else '（未完成，下次继续）'}"
+            )
+        return report
+
+    @staticmethod
+    def remove_files(paths: Iterable[str]) -> Tuple[int, int]:
+        """
+        删除图片文件及压缩时生成的同名副本（xxx_compressed.*）
+
+        Args:
+            paths: 图片路径
+
+        Returns:
+            (删除的文件数, 释放的字节数)
+        """
+        count = 0
+        size = 0
+        for path in paths:
+            image_path = Path(path)
+            candidates = [image_path]
+            if image_path.parent.is_dir():
+                candidates.extend(image_path.parent.glob(f"{image_path.stem}_compressed.*"))
+
+            for candidate in candidates:
+                try:
+                    file_size = candidate.stat().st_size
+                    candidate.unlink()
+                    count += 1
+                    size += file_size
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    logger.warning(f"删除图片失败: {candidate}, 错误: {e}")
+
+        return count, size
+
+
+class RetentionWorker:
+    """历史数据后台清理线程（托盘程序中使用）"""
+
+    def __init__(self, db: Database, jobs: List, interval: float = 3600, initial_delay: float = 300):
+        """
+        初始化后台线程
+
+        Args:
+            db: 各任务使用的数据库实例（停止时关闭）
+            jobs: 依次执行的任务（HistoryArchive、RetentionEngine），run() 返回含 complete 的报告
+            interval: 清理间隔（秒）
+            initial_delay: 启动后首次清理前的等待时间（秒），避开开机时的触发任务
+        """
+        self.db = db
+        self.jobs = jobs
+        self.interval = interval
+        self.initial_delay = initial_delay
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台线程"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='retention-worker', daemon=True)
+        self._thread.start()
+        logger.info("历史数据后台清理已启动")
+
+    def stop(self):
+        """停止后台线程"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self.db.close()
+        logger.info("历史数据后台清理已停止")
+
+    def _run(self):
+        """后台循环：每个任务每轮最多处理 MAX_BATCHES 批，未处理完的留到下一轮"""
+        delay = self.initial_delay
+        while not self._stop_event.wait(delay):
+            delay = self.interval
+            for job in self.jobs:
+                if self._stop_event.is_set():
+                    break
+                try:
+                    report = job.run()
+                    # 未处理完时缩短间隔，分多轮逐步追上
+                    if not report['complete']:
+                        delay = min(self.interval, 60)
+
+                except Exception as e:
+                    logger.error(f"历史数据清理异常: {e}")
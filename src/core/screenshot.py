@@ -4,9 +4,10 @@
 """
 
 import mss
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from PIL import Image
 
 from ..utils.logger import Logger
@@ -26,6 +27,9 @@ class ScreenCapture:
         """
         self.quality = max(1, min(100, quality))
 
+        # 最近一次截图各文件的编码和写入耗时（毫秒）
+        self.encode_times: Dict[Path, float] = {}
+
     def capture(self, save_path: Optional[Path] = None, monitor_number: int = 0) -> Optional[Path]:
         """
         截取屏幕并保存
@@ -37,6 +41,8 @@ class ScreenCapture:
         Returns:
             保存的文件路径，失败返回 None
         """
+        self.encode_times = {}
+
         try:
             logger.info("正在截取屏幕...")
 
@@ -70,7 +76,9 @@ class ScreenCapture:
                     save_path.parent.mkdir(parents=True, exist_ok=True)
 
                 # 保存为 JPEG，可以压缩
+                began = time.perf_counter()
                 img.save(save_path, 'JPEG', quality=self.quality, optimize=True)
+                self.encode_times[save_path] = round((time.perf_counter() - began) * 1000, 1)
 
                 logger.info(f"截图成功，保存到: {save_path}")
                 logger.debug(f"截图分辨率: {img.size}, 质量: {self.quality}")
@@ -92,6 +100,7 @@ class ScreenCapture:
             保存的文件路径列表
         """
         screenshots = []
+        self.encode_times = {}
 
         try:
             with mss.mss() as sct:
@@ -114,7 +123,9 @@ class ScreenCapture:
                     # 截图并保存
                     screenshot = sct.grab(monitor)
                     img = Image.frombytes('RGB', screenshot.size, screenshot.rgb)
+                    began = time.perf_counter()
                     img.save(save_path, 'JPEG', quality=self.quality, optimize=True)
+                    self.encode_times[save_path] = round((time.perf_counter() - began) * 1000, 1)
 
                     screenshots.append(save_path)
                     logger.info(f"显示器 {i} 截图成功: {save_path}")
@@ -0,0 +1,138 @@
+"""
+通知渠道限流模块
+每个渠道一个令牌桶和熔断器，状态保存在数据库中，托盘进程和命令行 trigger 进程共享
+
+熔断器打开时跳过图片压缩、编码和 HTTP 请求，通知直接转入发件箱或由其它渠道发送
+"""
+
+import time
+from typing import Dict, Optional
+
+from .database import Database
+from ..utils.logger import Logger
+
+logger = Logger()
+
+
+class ProviderGuard:
+    """
+    通知渠道的速率限制和熔断器
+
+    - closed: 正常发送，连续失败达到阈值后打开
+    - open: 冷却期内拒绝发送
+    - half_open: 冷却结束后放行一次探测，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, db: Database, provider: str, per_minute: float = 0, burst: float = 1,
+                 failure_threshold: int = 3, reset_seconds: float = 300, blocked_seconds: float = 3600):
+        """
+        初始化限流器
+
+        Args:
+            db: 数据库实例
+            provider: 渠道名称
+            per_minute: 每分钟允许的发送次数，0 表示不限速
+            burst: 允许的突发次数（令牌桶容量）
+            failure_threshold: 连续失败多少次后熔断
+            reset_seconds: 熔断冷却时间（秒）
+            blocked_seconds: 服务端明确限流或拒绝 Token 时的冷却时间（秒）
+        """
+        self.db = db
+        self.provider = provider
+        self.per_minute = per_minute
+        self.burst = max(1.0, burst)
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.blocked_seconds = blocked_seconds
+
+    def allow(self) -> bool:
+        """
+        检查是否允许发送（熔断器未打开且取得令牌）
+
+        Returns:
+            是否允许发送
+        """
+        now = time.time()
+        state = self.db.get_provider_state(self.provider)
+
+        if state and state['breaker_state'] != 'closed':
+            if now < state['open_until']:
+                logger.warning(f"通知渠道 {self.provider} 熔断中，"
+                               f"{state['open_until'] - now:.0f} 秒后重试")
+                return False
+
+            # 冷却结束：只放行一次探测，探测期间其它进程仍视为熔断
+            if not self.db.claim_provider_probe(self.provider, state['open_until'], now + self.reset_seconds):
+                return False
+            logger.info(f"通知渠道 {self.provider} 熔断冷却结束，发送探测请求")
+
+        if self.per_minute > 0 and not self.db.take_provider_token(
+                self.provider, now, self.per_minute / 60.0, self.burst):
+            logger.warning(f"通知渠道 {self.provider} 超出速率限制 ({self.per_minute} 次/分钟)")
+            return False
+
+        return True
+
+    def record_success(self):
+        """记录发送成功，关闭熔断器"""
+        state = self.db.get_provider_state(self.provider)
+        if state and (state['breaker_state'] != 'closed' or state['failures']):
+            self.db.update_provider_breaker(self.provider, 'closed', 0, 0)
+            if state['breaker_state'] != 'closed':
+                logger.info(f"通知渠道 {self.provider} 已恢复")
+
+    def record_failure(self, blocked: bool = False, network_error: bool = False):
+        """
+        记录发送失败
+
+        只有服务端的失败（HTTP 5xx、限流返回码、连接后超时等）计入熔断；
+        本机网络不可用（如唤醒后网卡尚未连接）时请求没有到达服务端，不计入，
+        避免网络恢复后发件箱的重试还要等熔断冷却
+
+        Args:
+            blocked: 服务端是否明确限流或拒绝 Token（立即熔断）
+            network_error: 请求是否因 DNS 解析失败或无法建立连接而没有到达服务端
+        """
+        if network_error and not blocked:
+            logger.info(f"通知渠道 {self.provider} 网络不可用，不计入熔断")
+            return
+
+        state = self.db.get_provider_state(self.provider) or {}
+        failures = (state.get('failures') or 0) + 1
+        half_open = state.get('breaker_state') == 'half_open'
+
+        if blocked or half_open or failures >= self.failure_threshold:
+            cooldown = self.blocked_seconds if blocked else self.reset_seconds
+            self.db.update_provider_breaker(self.provider, 'open', failures, time.time() + cooldown)
+            logger.warning(f"通知渠道 {self.provider} 已熔断 {cooldown:.0f} 秒 (连续失败 {failures} 次)")
+        else:
+            self.db.update_provider_breaker(self.provider, 'closed', failures, 0)
+
+
+def create_guard(db: Database, name: str, rate_limits: Optional[Dict],
+                 breaker: Optional[Dict], provider: Optional[str] = None) -> ProviderGuard:
+    """
+    根据配置创建渠道限流器
+
+    Args:
+        db: 数据库实例
+        name: 渠道名称（限流和熔断状态按名称分别保存）
+        rate_limits: 各渠道的速率配置，按渠道名称或类型，如 {"pushplus": {"per_minute": 10, "burst": 5}}
+        breaker: 熔断配置，如 {"failure_threshold": 3, "reset_seconds": 300, "blocked_seconds": 3600}
+        provider: 渠道类型，没有按名称的速率配置时使用该类型的配置
+
+    Returns:
+        限流器
+    """
+    rate_limits = rate_limits or {}
+    limit = rate_limits.get(name) or rate_limits.get(provider or name, {})
+    breaker = breaker or {}
+    return ProviderGuard(
+        db,
+        name,
+        per_minute=limit.get('per_minute', 0),
+        burst=limit.get('burst', 1),
+        failure_threshold=breaker.get('failure_threshold', 3),
+        reset_seconds=breaker.get('reset_seconds', 300),
+        blocked_seconds=breaker.get('blocked_seconds', 3600)
+    )
@@ -0,0 +1,227 @@
+"""
+数据库写队列模块
+同一数据库文件的所有写操作由一个专用线程按顺序执行，排队中的写操作合并到一个事务中提交
+
+托盘程序中监控线程、发件箱线程和历史窗口各自持有 Database 实例，写操作共用同一个队列，
+进程内不会因为并发写入出现 database is locked；调用方可以拿到 Future 而不必等待提交
+"""
+
+import atexit
+import sqlite3
+import threading
+import queue
+from pathlib import Path
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..utils.logger import Logger
+
+logger = Logger()
+
+# 写操作：接收写线程连接的游标，在事务中执行 SQL，返回值作为 Future 的结果
+WriteOperation = Callable[[sqlite3.Cursor], Any]
+
+
+class WriteQueue:
+    """单写线程队列（每个数据库文件一个）"""
+
+    # 一个事务最多包含的写操作数
+    BATCH_SIZE = 100
+
+    # 队列空闲多久后写线程退出并关闭连接（秒），有新的写操作时重新启动
+    IDLE_SECONDS = 30
+
+    _instances: Dict[Path, 'WriteQueue'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, open_connection: Callable[[], sqlite3.Connection]):
+        """
+        初始化写队列（请使用 for_path 获取共享实例）
+
+        Args:
+            open_connection: 打开写线程连接的函数
+        """
+        self.open_connection = open_connection
+        self._queue: 'queue.Queue[Tuple[WriteOperation, Future]]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # 统计：已提交的事务数和写操作数
+        self.batches = 0
+        self.writes = 0
+
+        # 程序退出前写完队列中剩余的操作
+        atexit.register(self.flush)
+
+    @classmethod
+    def for_path(cls, db_path: Path, open_connection: Callable[[], sqlite3.Connection]) -> 'WriteQueue':
+        """
+        获取数据库文件对应的写队列，同一文件的所有 Database 实例共用一个
+
+        Args:
+            db_path: 数据库文件路径
+            open_connection: 打开写线程连接的函数（首次创建时使用）
+
+        Returns:
+            写队列实例
+        """
+        key = Path(db_path).resolve()
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = cls(open_connection)
+                cls._instances[key] = instance
+            return instance
+
+    def in_writer_thread(self) -> bool:
+        """当前线程是否为写线程"""
+        return threading.current_thread() is self._thread
+
+    def submit(self, operation: WriteOperation) -> Future:
+        """
+        提交写操作，立即返回
+
+        Args:
+            operation: 写操作
+
+        Returns:
+            Future，事务提交后得到写操作的返回值；写操作或提交失败时 result() 抛出异常
+        """
+        future = Future()
+        with self._lock:
+            self._queue.put((operation, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='DatabaseWriter', daemon=True)
+                self._thread.start()
+        return future
+
+    def execute(self, operation: WriteOperation, timeout: Optional[float] = None) -> Any:
+        """
+        提交写操作并等待提交完成
+
+        在写线程内（写操作中嵌套调用）直接在当前事务中执行，避免等待自己
+
+        Args:
+            operation: 写操作
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            写操作的返回值
+        """
+        if self.in_writer_thread():
+            return operation(self._conn.cursor())
+        return self.submit(operation).result(timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待此前提交的写操作全部完成
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            是否在超时前完成
+        """
+        with self._lock:
+            idle = self._thread is None
+        if idle or self.in_writer_thread():
+            return True
+
+        try:
+            self.submit(lambda cursor: None).result(timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"等待数据库写队列完成失败: {e}")
+            return False
+
+    def _run(self):
+        """写线程主循环"""
+        try:
+            conn = self.open_connection()
+        except Exception as e:
+            logger.error(f"数据库写线程打开连接失败: {e}")
+            self._fail_pending(e)
+            return
+
+        self._conn = conn
+        logger.debug("数据库写线程已启动")
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.IDLE_SECONDS)]
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        break
+                continue
+
+            # 合并排队中的写操作
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._commit_batch(conn, batch)
+
+        try:
+            conn.execute('PRAGMA optimize')
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"关闭数据库写连接失败: {e}")
+        logger.debug(f"数据库写线程空闲退出 (累计 {self.batches} 个事务, {self.writes} 次写入)")
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: List[Tuple[WriteOperation, Future]]):
+        """
+        在一个事务中执行一批写操作
+
+        每个写操作使用一个保存点，单个写操作失败只回滚它自己；提交失败时整批失败
+
+        Args:
+            conn: 写线程连接
+            batch: (写操作, Future) 列表
+        """
+        results = []
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                cursor.execute('SAVEPOINT write_operation')
+                try:
+                    results.append((future, operation(cursor), None))
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write_operation')
+                    results.append((future, None, e))
+                cursor.execute('RELEASE write_operation')
+
+            cursor.execute('COMMIT')
+
+        except Exception as e:
+            logger.error(f"数据库写事务失败 ({len(batch)} 次写入): {e}")
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                if not future.done() and (future.running() or future.set_running_or_notify_cancel()):
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.writes += len(results)
+        for future, value, error in results:
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+
+    def _fail_pending(self, error: Exception):
+        """写线程无法启动时让队列中的写操作全部失败"""
+        with self._lock:
+            self._thread = None
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(error)
@@ -4,6 +4,7 @@
 """
 
 import sys
+import json
 from pathlib import Path
 from PyQt5.QtWidgets import (
     QApplication, QSystemTrayIcon, QMenu, QAction,
@@ -14,9 +15,16 @@ from PyQt5.QtCore import QThread, pyqtSignal
 
 from ..core.monitor import Monitor
 from ..core.power_monitor import PowerEventMonitor
+from ..core.outbox import OutboxWorker
+from ..core.channels import create_notifier
+from ..core.database import Database
+from ..core.retention import RetentionEngine, RetentionWorker
+from ..core.archive import HistoryArchive
 from ..utils.logger import Logger
+from ..utils.config import get_config
 from ..utils.boot_detector import is_boot_start
 from ..utils.autostart import AutoStartManager
+from ..utils.http_session import reset_session
 from ..tasks.scheduler import WindowsScheduler
 from .config_window import ConfigWindow
 from .history_window import HistoryWindow
@@ -37,7 +45,10 @@ class MonitorThread(QThread):
         """执行监控任务"""
         try:
             monitor = Monitor()
-            result = monitor.execute(trigger_type=self.trigger_type)
+            try:
+                result = monitor.execute(trigger_type=self.trigger_type)
+            finally:
+                monitor.close()
             self.finished.emit(result)
         except Exception as e:
             logger.error(f"监控线程异常: {e}")
@@ -73,8 +84,50 @@ class DonTouchMeApp(QApplication):
         # 启动电源事件监听
         self._start_power_monitoring()
 
+        # 启动发件箱后台重试（只创建通知器，使用发件箱线程自己的数据库实例）
+        self._outbox_notifier = None
+        self._outbox_notifier_key = None
+        outbox_db = Database()
+        self.outbox_worker = OutboxWorker(
+            notifier_factory=lambda: self._get_outbox_notifier(outbox_db),
+            db=outbox_db
+        )
+        self.outbox_worker.start()
+
+        # 启动历史数据后台归档和清理（均未开启时不启动）
+        self.retention_worker = None
+        db = Database()
+        storage_config = get_config().get('storage', {})
+        jobs = [job for job in (HistoryArchive.from_config(db, storage_config),
+                                RetentionEngine.from_config(db, storage_config)) if job is not None]
+        if jobs:
+            self.retention_worker = RetentionWorker(db, jobs)
+            self.retention_worker.start()
+        else:
+            db.close()
+
         logger.info("DonTouchMe GUI 应用已启动")
 
+    def _get_outbox_notifier(self, db):
+        """
+        发件箱重试使用的通知器，通知配置不变时复用
+
+        Args:
+            db: 发件箱线程的数据库实例
+
+        Returns:
+            通知器，通知未启用时返回 None
+        """
+        notification_config = get_config().get('notification', {})
+        key = json.dumps(notification_config, sort_keys=True, ensure_ascii=False)
+        if key != self._outbox_notifier_key:
+            self._outbox_notifier_key = key
+            self._outbox_notifier = None
+            if notification_config.get('enabled', True):
+                self._outbox_notifier = create_notifier(notification_config, db)
+
+        return self._outbox_notifier
+
     def _init_tray(self):
         """初始化系统托盘"""
         # 创建托盘图标（使用系统默认图标）
@@ -211,6 +264,8 @@ class DonTouchMeApp(QApplication):
             return
 
         logger.info("唤醒事件触发")
+        # 休眠期间网络已断开，池中的长连接均已失效
+        reset_session()
         self._execute_monitor('wake')
 
     def _execute_monitor(self, trigger_type):
@@ -285,6 +340,7 @@ class DonTouchMeApp(QApplication):
 
     def on_config_saved(self):
         """配置保存回调"""
+        get_config().load()
         self.show_notification("配置已保存", "配置已成功保存并生效")
         logger.info("配置已保存")
 
@@ -316,8 +372,13 @@ class DonTouchMeApp(QApplication):
         )
 
         if reply == QMessageBox.Yes:
-            # 停止电源监听
+            # 停止电源监听和发件箱重试
             self._stop_power_monitoring()
+            self.outbox_worker.stop()
+            if self.retention_worker:
+                self.retention_worker.stop()
+            if self.history_window:
+                self.history_window.db.close()
             logger.info("用户退出应用")
             self.tray_icon.hide()
             self.quit()
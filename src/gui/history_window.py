@@ -15,6 +15,7 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPixmap
 
 from ..core.database import Database
+from ..core.archive import HistoryArchive
 from ..utils.logger import Logger
 
 logger = Logger()
@@ -23,10 +24,21 @@ logger = Logger()
 class HistoryWindow(QWidget):
     """历史记录查看窗口"""
 
+    # 每页记录数
+    PAGE_SIZE = 100
+
     def __init__(self):
         super().__init__()
         self.db = Database()
+        self.archive = HistoryArchive(self.db)
         self.current_record = None
+
+        # 分页状态：当前页的查询游标（None 为第一页）和前后页游标
+        self.page_cursor = None
+        self.next_cursor = None
+        self.prev_cursor = None
+        self.page_number = 1
+
         self.init_ui()
         self.load_records()
 
@@ -41,6 +53,13 @@ class HistoryWindow(QWidget):
         # 1. 工具栏
         toolbar_layout = QHBoxLayout()
 
+        # 数据来源：当前记录或已归档记录
+        toolbar_layout.addWidget(QLabel("来源:"))
+        self.filter_source = QComboBox()
+        self.filter_source.addItems(["当前", "归档"])
+        self.filter_source.currentIndexChanged.connect(self.apply_filters)
+        toolbar_layout.addWidget(self.filter_source)
+
         # 类型筛选
         toolbar_layout.addWidget(QLabel("类型:"))
         self.filter_type = QComboBox()
@@ -48,8 +67,27 @@ class HistoryWindow(QWidget):
         self.filter_type.currentIndexChanged.connect(self.apply_filters)
         toolbar_layout.addWidget(self.filter_type)
 
+        # 通知状态筛选
+        toolbar_layout.addWidget(QLabel("通知:"))
+        self.filter_status = QComboBox()
+        self.filter_status.addItems(["全部", "成功", "失败"])
+        self.filter_status.currentIndexChanged.connect(self.apply_filters)
+        toolbar_layout.addWidget(self.filter_status)
+
         toolbar_layout.addStretch()
 
+        # 翻页按钮
+        self.btn_prev = QPushButton("上一页")
+        self.btn_prev.clicked.connect(self.load_prev_page)
+        toolbar_layout.addWidget(self.btn_prev)
+
+        self.page_label = QLabel()
+        toolbar_layout.addWidget(self.page_label)
+
+        self.btn_next = QPushButton("下一页")
+        self.btn_next.clicked.connect(self.load_next_page)
+        toolbar_layout.addWidget(self.btn_next)
+
         # 刷新按钮
         self.btn_refresh = QPushButton("刷新")
         self.btn_refresh.clicked.connect(self.load_records)
@@ -128,66 +166,83 @@ class HistoryWindow(QWidget):
 
         self.setLayout(main_layout)
 
+    def _current_filters(self) -> dict:
+        """当前筛选条件"""
+        type_map = {'开机': 'boot', '唤醒': 'wake', '手动': 'manual'}
+        status_map = {'成功': True, '失败': False}
+        return {
+            'trigger_type': type_map.get(self.filter_type.currentText()),
+            'notification_sent': status_map.get(self.filter_status.currentText()),
+            'archived': self._viewing_archive()
+        }
+
+    def _viewing_archive(self) -> bool:
+        """当前是否在查看归档记录"""
+        return self.filter_source.currentText() == "归档"
+
+    def _load_page(self, cursor=None) -> bool:
+        """
+        按游标加载一页记录
+
+        Args:
+            cursor: 分页游标，None 表示第一页
+
+        Returns:
+            该页是否有记录
+        """
+        page = self.db.get_records_page(limit=self.PAGE_SIZE, cursor=cursor, **self._current_filters())
+        if cursor and not page['records']:
+            # 游标所在位置的记录已被删除，停留在当前页
+            return False
+
+        self.page_cursor = cursor
+        self.next_cursor = page['next_cursor']
+        self.prev_cursor = page['prev_cursor']
+        self._display_records(page['records'])
+
+        self.btn_prev.setEnabled(self.prev_cursor is not None)
+        self.btn_next.setEnabled(self.next_cursor is not None)
+        self.page_label.setText(f"第 {self.page_number} 页")
+
+        logger.info(f"加载了 {len(page['records'])} 条历史记录 (第 {self.page_number} 页)")
+        return True
+
     def load_records(self):
-        """加载历史记录"""
+        """加载历史记录（重新加载当前页）"""
         try:
-            # 获取所有记录
-            records = self.db.get_all_records(limit=1000)
-
-            # 清空表格
-            self.table.setRowCount(0)
-
-            # 填充数据
-            for row_idx, record in enumerate(records):
-                self.table.insertRow(row_idx)
-
-                # ID
-                self.table.setItem(row_idx, 0, QTableWidgetItem(str(record['id'])))
-
-                # 类型
-                type_map = {'boot': '开机', 'wake': '唤醒', 'manual': '手动'}
-                type_text = type_map.get(record['trigger_type'], record['trigger_type'])
-                self.table.setItem(row_idx, 1, QTableWidgetItem(type_text))
-
-                # 时间
-                trigger_time = datetime.fromisoformat(record['trigger_time'])
-                time_text = trigger_time.strftime('%Y-%m-%d %H:%M:%S')
-                self.table.setItem(row_idx, 2, QTableWidgetItem(time_text))
-
-                # 通知状态
-                status_text = "成功" if record['notification_sent'] else "失败"
-                self.table.setItem(row_idx, 3, QTableWidgetItem(status_text))
-
-                # 通知方式
-                self.table.setItem(row_idx, 4, QTableWidgetItem(record['notification_method']))
-
-            # 调整列宽
-            self.table.resizeColumnsToContents()
+            if not self._load_page(self.page_cursor):
+                self.page_number = 1
+                self._load_page(None)
 
             # 更新统计信息
             self.update_statistics()
 
-            logger.info(f"加载了 {len(records)} 条历史记录")
-
         except Exception as e:
             logger.error(f"加载历史记录失败: {e}")
             QMessageBox.critical(self, "错误", f"加载历史记录失败: {e}")
 
+    def load_next_page(self):
+        """加载下一页（更早的记录）"""
+        if self.next_cursor:
+            self.page_number += 1
+            if not self._load_page(self.next_cursor):
+                self.page_number -= 1
+
+    def load_prev_page(self):
+        """加载上一页（更新的记录）"""
+        if self.prev_cursor:
+            self.page_number = max(1, self.page_number - 1)
+            if not self._load_page(self.prev_cursor) or self.prev_cursor is None:
+                # 已回到最新的一页
+                self.page_number = 1
+                self._load_page(None)
+
     def apply_filters(self):
-        """应用筛选条件"""
+        """应用筛选条件（回到第一页）"""
         try:
-            filter_text = self.filter_type.currentText()
-
-            if filter_text == "全部":
-                self.load_records()
-            else:
-                # 类型映射
-                type_map = {'开机': 'boot', '唤醒': 'wake', '手动': 'manual'}
-                trigger_type = type_map.get(filter_text)
-
-                if trigger_type:
-                    records = self.db.get_records_by_type(trigger_type, limit=1000)
-                    self._display_records(records)
+            self.page_number = 1
+            self.page_cursor = None
+            self._load_page(None)
 
         except Exception as e:
             logger.error(f"应用筛选失败: {e}")
@@ -222,7 +277,8 @@ class HistoryWindow(QWidget):
             self.btn_delete.setEnabled(False)
             return
 
-        self.btn_delete.setEnabled(True)
+        # 归档记录只读
+        self.btn_delete.setEnabled(not self._viewing_archive())
 
         # 获取选中的记录ID
         row = selected_rows[0].row()
@@ -234,7 +290,10 @@ class HistoryWindow(QWidget):
     def load_record_detail(self, record_id):
         """加载记录详情"""
         try:
-            record = self.db.get_record_by_id(record_id)
+            if self._viewing_archive():
+                record = self.archive.open_record(record_id)
+            else:
+                record = self.db.get_record_by_id(record_id)
             if not record:
                 return
 
@@ -251,9 +310,15 @@ class HistoryWindow(QWidget):
 通知状态: {'成功' if record['notification_sent'] else '失败'}
 通知方式: {record['notification_method']}
             """.strip()
+            if 'month' in record:
+                detail_text += f"\n归档月份: {record['month']}"
 
             self.detail_label.setText(detail_text)
 
+            if 'month' in record:
+                self._show_archived_images(record)
+                return
+
             # 加载摄像头图片
             if record['camera_path']:
                 camera_path = Path(record['camera_path'])
@@ -295,6 +360,27 @@ class HistoryWindow(QWidget):
         except Exception as e:
             logger.error(f"加载记录详情失败: {e}")
 
+    def _show_archived_images(self, record):
+        """从月份归档容器中读取并显示归档记录的图片"""
+        members = {}
+        for image in record.get('images', []):
+            members.setdefault(image['kind'], image['member'])
+
+        for label, kind, title in ((self.camera_label, 'camera', "摄像头照片"),
+                                   (self.screenshot_label, 'screenshot', "屏幕截图")):
+            data = self.archive.read_image(record['month'], members[kind]) if kind in members else None
+            pixmap = QPixmap()
+            if data and pixmap.loadFromData(data):
+                label.setPixmap(pixmap.scaled(
+                    label.width(),
+                    label.height(),
+                    Qt.KeepAspectRatio,
+                    Qt.SmoothTransformation
+                ))
+            else:
+                label.setText(f"{title}（{'无' if kind not in members else '读取失败'}）")
+                label.setPixmap(QPixmap())
+
     def delete_record(self):
         """删除选中的记录"""
         if not self.current_record:
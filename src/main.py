@@ -25,6 +25,7 @@ if sys.platform == 'win32':
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.core.monitor import Monitor
+from src.utils.deadline import Deadline
 from src.utils.logger import Logger
 from src.utils.config import get_config
 
@@ -59,9 +60,14 @@ def command_trigger(args):
         logger.info(f"延迟 {delay} 秒后开始执行...")
         time.sleep(delay)
 
-    # 执行监控
+    # 执行监控（截止时间从延迟结束后开始计算）
     monitor = Monitor()
-    result = monitor.execute(trigger_type=trigger_type)
+    deadline = Deadline(args.deadline) if args.deadline is not None else None
+    result = monitor.execute(trigger_type=trigger_type, deadline=deadline)
+
+    # 顺带清理少量过期的历史记录和图片，其余留给托盘后台或下次触发
+    cleanup = monitor.cleanup()
+    monitor.close()
 
     # 显示结果
     if result['success']:
@@ -77,6 +83,10 @@ def command_trigger(args):
             print(f"  [成功] 微信通知已发送")
         else:
             print(f"  [失败] 微信通知发送失败或已禁用")
+        print(f"  总耗时: {result['elapsed']} 秒")
+        if cleanup and cleanup['deleted_records']:
+            print(f"  已清理 {cleanup['deleted_records']} 条过期记录，"
+                  f"释放 {cleanup['bytes_reclaimed'] / 1024 / 1024:.1f}MB")
 
     else:
         print(f"\n[失败] 监控任务执行失败")
@@ -230,6 +240,129 @@ def command_info(args):
     return 0
 
 
+def command_stats(args):
+    """
+    显示历史统计信息
+
+    Args:
+        args: 命令行参数
+    """
+    from datetime import datetime, timedelta
+    from src.core.database import Database
+
+    db = Database()
+    try:
+        if args.check:
+            print("正在检查统计计数...")
+            if db.verify_statistics(repair=True):
+                print("✓ 统计计数与历史记录一致")
+            else:
+                print("✗ 统计计数不一致，已重建")
+            print()
+
+        stats = db.get_statistics()
+        print("总体统计:")
+        print(f"  总触发次数: {stats.get('total_count', 0)}")
+        print(f"  开机: {stats.get('boot_count', 0)}  唤醒: {stats.get('wake_count', 0)}  手动: {stats.get('manual_count', 0)}")
+        print(f"  通知成功: {stats.get('notification_success', 0)} ({stats.get('notification_success_rate', '0%')})")
+
+        if args.days > 0:
+            end = datetime.now()
+            start = end - timedelta(days=args.days - 1)
+            rows = db.get_daily_statistics(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+            print()
+            print(f"最近 {args.days} 天:")
+            if not rows:
+                print("  无记录")
+            for row in rows:
+                print(f"  {row['day']}  {row['trigger_type']:<8}{row['total']:>6} 次  通知成功 {row['notification_sent']}")
+    finally:
+        db.close()
+
+    return 0
+
+
+def command_cleanup(args):
+    """
+    清理过期的历史记录和图片
+
+    Args:
+        args: 命令行参数
+    """
+    from src.core.database import Database
+    from src.core.retention import RetentionEngine
+
+    storage_config = dict(get_config().get('storage', {}))
+
+    # 开启归档时清理器不会删除未归档的记录，--days / --keep 不起作用，直接报错而不是静默忽略
+    if RetentionEngine.archive_enabled(storage_config):
+        options = [option for option, value in (('--days', args.days), ('--keep', args.keep)) if value is not None]
+        if options:
+            print(f"[错误] 已开启归档（storage.archive.enabled），{' 和 '.join(options)} 不能使用：旧记录只通过归档移出")
+            print("  请使用 archive 命令归档旧记录，或先关闭 storage.archive.enabled 再清理")
+            return 2
+        print("已开启归档（storage.archive.enabled），旧记录只通过归档移出，请使用 archive 命令")
+        return 1
+
+    if args.days is not None:
+        storage_config['retention_days'] = args.days
+    if args.keep is not None:
+        storage_config['max_images'] = args.keep
+    storage_config['auto_cleanup'] = True
+
+    db = Database()
+    try:
+        engine = RetentionEngine.from_config(db, storage_config)
+        print(f"保留策略: 最近 {engine.retention_days or '不限'} 天，最多 {engine.max_images or '不限'} 次触发")
+        report = engine.run(max_batches=None)
+    finally:
+        db.close()
+
+    print(f"已删除 {report['deleted_records']} 条记录、{report['deleted_files']} 个文件")
+    print(f"释放空间: {report['bytes_reclaimed'] / 1024 / 1024:.1f}MB")
+    return 0
+
+
+def command_archive(args):
+    """
+    把旧的历史记录按月归档到 data/archive
+
+    Args:
+        args: 命令行参数
+    """
+    from src.core.archive import HistoryArchive
+    from src.core.database import Database
+
+    archive_config = dict(get_config().get('storage', {}).get('archive', {}))
+    if args.days is not None:
+        archive_config['after_days'] = args.days
+    archive_config['enabled'] = True
+
+    db = Database()
+    try:
+        archive = HistoryArchive.from_config(db, {'archive': archive_config})
+        print(f"归档 {archive.after_days:g} 天前的记录到: {archive.archive_dir}")
+        report = archive.run(max_batches=None)
+        if report['locked']:
+            print("其它进程（托盘程序）正在归档，请稍后再试")
+            return 1
+
+        print(f"已归档 {report['archived_records']} 条记录、{report['archived_images']} 张图片")
+        if report['months']:
+            print(f"  月份: {', '.join(report['months'])}")
+        print(f"  原图片 {report['bytes_before'] / 1024 / 1024:.1f}MB → "
+              f"归档文件 {report['bytes_after'] / 1024 / 1024:.1f}MB")
+
+        if args.vacuum:
+            size_before = db.db_path.stat().st_size
+            if db.vacuum():
+                print(f"  数据库 {size_before / 1024 / 1024:.1f}MB → {db.db_path.stat().st_size / 1024 / 1024:.1f}MB")
+    finally:
+        db.close()
+
+    return 0
+
+
 def command_install(args):
     """
     安装 Windows 任务计划
@@ -389,6 +522,12 @@ def main():
         default=0,
         help='延迟秒数 (默认: 0)'
     )
+    trigger_parser.add_argument(
+        '--deadline',
+        type=float,
+        default=None,
+        help='总时间预算秒数，不含延迟，0 表示不限时 (默认: 使用配置 trigger.deadline_seconds)'
+    )
     trigger_parser.set_defaults(func=command_trigger)
 
     # test 命令：测试组件
@@ -406,6 +545,29 @@ def main():
     info_parser = subparsers.add_parser('info', help='显示程序信息')
     info_parser.set_defaults(func=command_info)
 
+    # stats 命令：统计信息
+    stats_parser = subparsers.add_parser('stats', help='显示历史统计信息')
+    stats_parser.add_argument(
+        '--days',
+        type=int,
+        default=7,
+        help='显示最近几天的按日统计，0 表示不显示 (默认: 7)'
+    )
+    stats_parser.add_argument('--check', action='store_true', help='检查统计计数与历史记录是否一致，不一致时重建')
+    stats_parser.set_defaults(func=command_stats)
+
+    # cleanup 命令：清理历史数据
+    cleanup_parser = subparsers.add_parser('cleanup', help='清理过期的历史记录和图片')
+    cleanup_parser.add_argument('--days', type=float, default=None, help='保留天数，0 表示不限，开启归档时不可用 (默认: 配置 storage.retention_days)')
+    cleanup_parser.add_argument('--keep', type=int, default=None, help='最多保留的触发次数，0 表示不限，开启归档时不可用 (默认: 配置 storage.max_images)')
+    cleanup_parser.set_defaults(func=command_cleanup)
+
+    # archive 命令：按月归档旧记录
+    archive_parser = subparsers.add_parser('archive', help='把旧的历史记录和图片按月归档')
+    archive_parser.add_argument('--days', type=float, default=None, help='归档多少天前的记录 (默认: 配置 storage.archive.after_days)')
+    archive_parser.add_argument('--vacuum', action='store_true', help='归档后重建数据库文件以缩小体积')
+    archive_parser.set_defaults(func=command_archive)
+
     # install 命令：安装任务计划
     install_parser = subparsers.add_parser('install', help='安装 Windows 任务计划（需要管理员权限）')
     install_parser.set_defaults(func=command_install)
@@ -23,8 +23,43 @@ class Config:
             "enabled": True,
             "provider": "pushplus",
             "token": "",  # 用户需要填写
+            "api_url": "",  # 主渠道接口地址，留空使用官方地址（可指向 scripts/pushplus_stub.py 离线测试）
+            "topic": "",  # PushPlus 群组编码，消息发送给群组内所有订阅者
+            "recipients": [],  # 主渠道的其他接收者：PushPlus 好友令牌（一次请求发送）或 Server酱 SendKey（并发发送）
             "send_camera": True,
-            "send_screenshot": True
+            "send_screenshot": True,
+            "image_format": "jpeg",  # jpeg/webp/avif，webp 和 avif 在同等大小下画质更好
+            "image_weights": {  # 摄像头照片和屏幕截图分配消息预算的权重
+                "camera": 3,
+                "screenshot": 2
+            },
+            "collage": {  # 拼图模式：摄像头照片和屏幕截图合成一张图片发送
+                "enabled": False,
+                "layout": "horizontal",  # horizontal/vertical/overlay
+                "overlay_scale": 0.35
+            },
+            "imgbed": {  # 图床配置，图片无法压缩到消息预算内时使用
+                "service": "sm.ms",  # sm.ms/imgbb/http
+                "api_key": ""
+            },
+            "connect_timeout": 5,  # 连接超时（秒）
+            "read_timeout": 20,  # 读取超时（秒）
+            "network_wait_seconds": 20,  # 发送前等待网络就绪的最长时间（秒），0 表示不等待
+            "network_probe": [],  # 检测路由的地址（如 "192.168.1.1"、"[2001:db8::1]:53"），留空使用内置的 IPv4/IPv6 公共 DNS
+            "two_phase": False,  # 两段式通知：触发时立即发送文字告警，图片准备好后再发送一条
+            "coalesce_seconds": 0,  # 通知合并窗口（秒），窗口内的多次触发汇总为一条通知，0 表示不合并
+            "priority_triggers": ["manual"],  # 立即发送（提前结束合并窗口）的触发类型
+            "digest_max_images": 2,  # 汇总通知最多附带的图片数（所有图片共享一条消息的预算）
+            "channels": [],  # 额外通知渠道（webhook/smtp/serverchan），与主渠道并发发送；同类型多个渠道时可用 name 区分
+            "policy": "any",  # 多渠道成功判定策略：any/all/primary
+            "rate_limits": {  # 各渠道速率限制（令牌桶，按渠道名称或类型），per_minute 为 0 表示不限速
+                "pushplus": {"per_minute": 10, "burst": 5}
+            },
+            "breaker": {
+                "failure_threshold": 3,  # 连续失败多少次后熔断
+                "reset_seconds": 300,  # 熔断冷却时间（秒）
+                "blocked_seconds": 3600  # 服务端限流或 Token 无效时的熔断时间（秒）
+            }
         },
         "camera": {
             "enabled": True,
@@ -35,17 +70,26 @@ class Config:
         "screenshot": {
             "enabled": True,
             "save_local": True,
-            "quality": 85
+            "quality": 85,
+            "per_monitor": False  # 多显示器时额外分别截取每个显示器（记录到历史，不发送）
         },
         "storage": {
-            "max_images": 100,
-            "auto_cleanup": True,
-            "retention_days": 30
+            "max_images": 100,  # 最多保留最近多少次触发的记录和图片，0 表示不限
+            "auto_cleanup": True,  # 托盘后台和命令行触发后自动清理
+            "retention_days": 30,  # 记录和图片保留天数，0 表示不限
+            "archive": {
+                "enabled": False,  # 按月归档旧记录（开启时 retention_days 和 max_images 不再删除记录）
+                "after_days": 90,  # 早于多少天的记录移到 data/archive
+                "image_format": "webp",  # 归档图片格式
+                "image_quality": 60,
+                "max_dimension": 1280  # 归档图片最大边长（像素）
+            }
         },
         "trigger": {
             "on_boot": True,
             "on_wake": True,
-            "delay_seconds": 10
+            "delay_seconds": 10,
+            "deadline_seconds": 60  # 单次触发的总时间预算（秒，不含延迟），0 表示不限时
         },
         "background_monitor": {
             "enabled": True,
@@ -0,0 +1,95 @@
+"""
+截止时间模块
+一次触发的总时间预算，在拍照、图片准备、上传、通知和数据库写入各阶段之间传递，
+每个阶段只使用剩余时间，时间不足时降级（更小的图片、纯文字通知）而不是超时
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+
+class Deadline:
+    """截止时间"""
+
+    # 时间不足时单次操作仍保留的最短超时（秒），避免超时为 0 导致请求立即失败
+    MIN_TIMEOUT = 0.5
+
+    def __init__(self, seconds: Optional[float] = None):
+        """
+        初始化截止时间
+
+        Args:
+            seconds: 从现在起的时间预算（秒），None 或 0 表示不限时
+        """
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds if seconds else None
+
+        # 各阶段耗时（秒）
+        self.stages: Dict[str, float] = {}
+
+    @property
+    def limited(self) -> bool:
+        """是否设置了时间预算"""
+        return self.expires_at is not None
+
+    def remaining(self) -> float:
+        """剩余时间（秒），不限时返回 inf"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        """已用时间（秒）"""
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        """是否已超时"""
+        return self.remaining() <= 0
+
+    def has(self, seconds: float) -> bool:
+        """剩余时间是否还够 seconds 秒"""
+        return self.remaining() >= seconds
+
+    def timeout(self, default: float) -> float:
+        """
+        计算单次操作的超时：不超过默认值，也不超过剩余时间
+
+        Args:
+            default: 默认超时（秒）
+
+        Returns:
+            超时（秒）
+        """
+        return max(self.MIN_TIMEOUT, min(default, self.remaining()))
+
+    def http_timeout(self, timeout: Tuple[float, float]) -> Tuple[float, float]:
+        """
+        计算 HTTP 请求超时（连接超时, 读取超时）
+
+        Args:
+            timeout: 默认超时
+
+        Returns:
+            不超过剩余时间的超时
+        """
+        return self.timeout(timeout[0]), self.timeout(timeout[1])
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        记录一个阶段的耗时
+
+        Args:
+            name: 阶段名称
+        """
+        start = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.stages[name] = round(self.stages.get(name, 0.0) + time.monotonic() - start, 3)
+
+
+def remaining_timeout(deadline: Optional[Deadline], default: float) -> float:
+    """没有截止时间时返回默认超时，否则返回受剩余时间限制的超时"""
+    return deadline.timeout(default) if deadline else default
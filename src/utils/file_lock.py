@@ -0,0 +1,84 @@
+"""
+文件锁模块
+跨进程的独占锁（Windows 使用 msvcrt，其它系统使用 fcntl），
+托盘进程和命令行进程操作同一组文件时用来保证同一时间只有一个进程在写
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from .logger import Logger
+
+logger = Logger()
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    非阻塞的独占文件锁
+
+    锁随进程退出自动释放，进程异常退出不会留下无法获取的锁
+    """
+
+    def __init__(self, path: Path):
+        """
+        初始化文件锁
+
+        Args:
+            path: 锁文件路径（不存在时创建，不会删除）
+        """
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> bool:
+        """
+        尝试获取锁，不等待
+
+        Returns:
+            是否获取成功，锁被其它进程持有时返回 False
+        """
+        if self._fd is not None:
+            return True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if sys.platform == 'win32':
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._fd = fd
+        return True
+
+    def release(self):
+        """释放锁"""
+        if self._fd is None:
+            return
+
+        try:
+            if sys.platform == 'win32':
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except OSError as e:
+            logger.warning(f"释放文件锁失败: {self.path}, 错误: {e}")
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
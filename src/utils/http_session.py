@@ -0,0 +1,62 @@
+"""
+HTTP 会话模块
+提供进程内共享的连接池会话，复用 TCP/TLS 连接
+"""
+
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .logger import Logger
+
+logger = Logger()
+
+# 连接池大小：通知服务和图床各占少量主机，每个主机保留若干空闲长连接
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 8
+
+# 默认超时（连接超时, 读取超时），连接阶段失败应尽快返回
+DEFAULT_TIMEOUT = (5, 20)
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+def _create_session() -> requests.Session:
+    """创建带连接池的会话"""
+    session = requests.Session()
+    # 重试由调用方按业务策略控制，这里不做隐式重试
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                          max_retries=0, pool_block=False)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """获取全局共享会话（线程安全，按需创建）"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _create_session()
+                logger.debug("已创建共享 HTTP 会话")
+    return _session
+
+
+def reset_session():
+    """
+    丢弃共享会话，下次使用时重新创建
+
+    网络环境变化（如从休眠唤醒、连接异常）后，池中的空闲连接可能已失效，应调用此函数。
+    其它线程可能正在用旧会话发送请求（多渠道并发发送、ServerChan 多个 SendKey、批量上传），
+    因此只替换全局引用、不关闭旧会话：正在进行的请求照常完成，
+    旧会话在最后一个使用者释放后被回收，连接随之关闭
+    """
+    global _session
+    with _lock:
+        if _session is not None:
+            _session = None
+            logger.info("共享 HTTP 会话已重置")
@@ -4,14 +4,26 @@
 支持混合智能降级方案
 """
 
+import os
+import time
 import base64
-import requests
+import hashlib
+import numpy as np
 from pathlib import Path
-from typing import Optional, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple, Union, Dict
 from PIL import Image
 from io import BytesIO
 
 from .logger import Logger
+from .deadline import Deadline
+from .image_uploader import ImageUploader, create_uploader
+
+# 旧版 Pillow 需要通过插件支持 AVIF 编码（可选依赖）
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
 
 logger = Logger()
 
@@ -25,88 +37,339 @@ class ImageHelper:
             'url': 'https://sm.ms/api/v2/upload',
             'method': 'POST',
             'file_field': 'smfile',
-            'need_auth': False  # 免费使用不需要认证
+            'need_auth': False,  # 免费使用不需要认证
+            'retries': 2,
+            'backoff': 1.0,
+            'timeout': 30
         },
         'imgbb': {
             'url': 'https://api.imgbb.com/1/upload',
             'method': 'POST',
             'file_field': 'image',
-            'need_auth': True  # 需要 API Key
+            'need_auth': True,  # 需要 API Key
+            'retries': 2,
+            'backoff': 1.0,
+            'timeout': 30
+        },
+        'http': {
+            'url': '',  # 自定义上传地址，支持 {filename} 占位符
+            'method': 'POST',  # POST 为 multipart 上传，PUT 为原始字节
+            'file_field': 'file',
+            'need_auth': False,
+            'retries': 1,
+            'backoff': 0.5,
+            'timeout': 15
+        }
+    }
+
+    # 支持的通知图片格式
+    IMAGE_FORMATS = {
+        'jpeg': {
+            'pil_format': 'JPEG',
+            'mime_type': 'image/jpeg',
+            'suffix': '.jpg',
+            'save_options': {'optimize': True}
+        },
+        'webp': {
+            'pil_format': 'WEBP',
+            'mime_type': 'image/webp',
+            'suffix': '.webp',
+            'save_options': {'method': 4}  # 兼顾编码速度和压缩率
+        },
+        'avif': {
+            'pil_format': 'AVIF',
+            'mime_type': 'image/avif',
+            'suffix': '.avif',
+            'save_options': {'speed': 6}
         }
     }
 
     @staticmethod
-    def compress_image(image_path: Path, max_size_kb: int = 100, quality: int = 85) -> Optional[Path]:
+    def is_format_supported(image_format: str) -> bool:
         """
-        压缩图片到指定大小以下
+        检查当前 Pillow 是否支持以指定格式编码
+
+        Args:
+            image_format: 图片格式（jpeg/webp/avif）
+
+        Returns:
+            是否支持
+        """
+        format_info = ImageHelper.IMAGE_FORMATS.get(image_format)
+        if not format_info:
+            return False
+
+        Image.init()
+        return format_info['pil_format'] in Image.SAVE
+
+    @staticmethod
+    def resolve_format(image_format: str) -> str:
+        """
+        解析实际可用的图片格式，不支持时降级为 JPEG
+
+        Args:
+            image_format: 期望的图片格式
+
+        Returns:
+            实际使用的图片格式
+        """
+        image_format = (image_format or 'jpeg').lower()
+        if image_format == 'jpg':
+            image_format = 'jpeg'
+
+        if ImageHelper.is_format_supported(image_format):
+            return image_format
+
+        logger.warning(f"当前环境不支持 {image_format} 格式，降级为 JPEG")
+        return 'jpeg'
+
+    @staticmethod
+    def get_mime_type(image_format: str) -> str:
+        """获取图片格式对应的 MIME 类型"""
+        format_info = ImageHelper.IMAGE_FORMATS.get(image_format, ImageHelper.IMAGE_FORMATS['jpeg'])
+        return format_info['mime_type']
+
+    @staticmethod
+    def _encode_image(img: Image.Image, image_format: str, quality: int) -> bytes:
+        """按指定格式和质量将图片编码为字节"""
+        format_info = ImageHelper.IMAGE_FORMATS[image_format]
+
+        buffer = BytesIO()
+        img.save(buffer, format=format_info['pil_format'], quality=quality, **format_info['save_options'])
+        return buffer.getvalue()
+
+    @staticmethod
+    def reencode(image_path: Path, image_format: str = 'webp', quality: int = 60,
+                 max_dimension: int = 1280) -> Optional[bytes]:
+        """
+        重新编码图片（归档用）：长边超过 max_dimension 时等比缩小，只编码一次
 
         Args:
             image_path: 原图路径
-            max_size_kb: 最大文件大小（KB）
-            quality: 初始质量（1-100）
+            image_format: 输出格式（jpeg/webp/avif，不支持时降级为 JPEG）
+            quality: 编码质量（1-100）
+            max_dimension: 最大边长（像素），0 表示不缩放
 
         Returns:
-            压缩后的图片路径，如果已经满足要求则返回原路径
+            编码后的图片字节，失败返回 None
         """
         try:
-            image_path = Path(image_path)
-
-            # 检查文件大小
-            current_size_kb = image_path.stat().st_size / 1024
+            with Image.open(image_path) as img:
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                if max_dimension and max(img.size) > max_dimension:
+                    img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+                return ImageHelper._encode_image(img, ImageHelper.resolve_format(image_format), quality)
 
-            if current_size_kb <= max_size_kb:
-                logger.debug(f"图片已满足大小要求: {current_size_kb:.2f}KB <= {max_size_kb}KB")
-                return image_path
+        except Exception as e:
+            logger.error(f"重新编码图片失败: {image_path}, 错误: {e}")
+            return None
 
-            logger.info(f"开始压缩图片: {current_size_kb:.2f}KB -> {max_size_kb}KB")
+    @staticmethod
+    def encode_to_size(image_path: Path, max_size_kb: float = 100, quality: int = 85,
+                       image_format: str = 'jpeg', deadline: Optional[Deadline] = None) -> Optional[bytes]:
+        """
+        将图片编码到指定大小以下（先降低质量，再缩小分辨率）
 
-            # 打开图片
-            img = Image.open(image_path)
+        Args:
+            image_path: 原图路径
+            max_size_kb: 最大大小（KB）
+            quality: 初始质量（1-100）
+            image_format: 输出格式（jpeg/webp/avif）
+            deadline: 截止时间，超时后跳过剩余档位，直接以最小分辨率尝试一次
 
-            # 创建临时文件
-            compressed_path = image_path.parent / f"{image_path.stem}_compressed{image_path.suffix}"
+        Returns:
+            编码后的图片字节，无法满足大小要求时返回 None
+        """
+        try:
+            # 在 with 内读入像素数据，退出时关闭文件句柄（否则清理和归档在 Windows 上无法删除原图）
+            with Image.open(image_path) as source:
+                source.load()
+                img = source if source.mode in ('RGB', 'L') else source.convert('RGB')
 
             # 尝试不同质量级别进行压缩
             for q in range(quality, 10, -5):
-                buffer = BytesIO()
-                img.save(buffer, format='JPEG', quality=q, optimize=True)
+                if deadline and deadline.expired():
+                    return ImageHelper._encode_smallest(img, max_size_kb, image_format)
 
-                size_kb = len(buffer.getvalue()) / 1024
+                data = ImageHelper._encode_image(img, image_format, q)
+                size_kb = len(data) / 1024
 
                 if size_kb <= max_size_kb:
-                    # 保存压缩后的图片
-                    with open(compressed_path, 'wb') as f:
-                        f.write(buffer.getvalue())
-
-                    logger.info(f"压缩成功: 质量 {q}, 大小 {size_kb:.2f}KB")
-                    return compressed_path
+                    logger.info(f"压缩成功 ({image_format}): 质量 {q}, 大小 {size_kb:.2f}KB")
+                    return data
 
             # 如果压缩到质量10还是太大，尝试缩小分辨率
             logger.warning("降低质量无法达到目标大小，开始缩小分辨率")
 
             for scale in [0.8, 0.6, 0.4, 0.2]:
+                if deadline and deadline.expired():
+                    return ImageHelper._encode_smallest(img, max_size_kb, image_format)
+
                 new_size = (int(img.width * scale), int(img.height * scale))
                 resized_img = img.resize(new_size, Image.Resampling.LANCZOS)
 
-                buffer = BytesIO()
-                resized_img.save(buffer, format='JPEG', quality=70, optimize=True)
-
-                size_kb = len(buffer.getvalue()) / 1024
+                data = ImageHelper._encode_image(resized_img, image_format, 70)
+                size_kb = len(data) / 1024
 
                 if size_kb <= max_size_kb:
-                    with open(compressed_path, 'wb') as f:
-                        f.write(buffer.getvalue())
-
-                    logger.info(f"缩放压缩成功: 比例 {scale}, 大小 {size_kb:.2f}KB")
-                    return compressed_path
+                    logger.info(f"缩放压缩成功 ({image_format}): 比例 {scale}, 大小 {size_kb:.2f}KB")
+                    return data
 
             logger.error(f"无法将图片压缩到 {max_size_kb}KB 以下")
             return None
 
+        except Exception as e:
+            logger.error(f"编码图片失败: {e}")
+            return None
+
+    @staticmethod
+    def _encode_smallest(img: Image.Image, max_size_kb: float, image_format: str) -> Optional[bytes]:
+        """时间不足时的降级编码：直接使用最小分辨率和较低质量，只编码一次"""
+        small_img = img.resize((max(1, img.width // 5), max(1, img.height // 5)), Image.Resampling.BILINEAR)
+        data = ImageHelper._encode_image(small_img, image_format, 50)
+
+        if len(data) / 1024 <= max_size_kb:
+            logger.warning(f"时间不足，使用最小分辨率编码 ({image_format}): 大小 {len(data) / 1024:.2f}KB")
+            return data
+
+        logger.error(f"时间不足，无法将图片压缩到 {max_size_kb}KB 以下")
+        return None
+
+    @staticmethod
+    def compress_image(image_path: Path, max_size_kb: int = 100, quality: int = 85,
+                       image_format: str = 'jpeg') -> Optional[Path]:
+        """
+        压缩图片到指定大小以下
+
+        Args:
+            image_path: 原图路径
+            max_size_kb: 最大文件大小（KB）
+            quality: 初始质量（1-100）
+            image_format: 输出格式（jpeg/webp/avif）
+
+        Returns:
+            压缩后的图片路径，如果已经满足要求则返回原路径
+        """
+        try:
+            image_path = Path(image_path)
+            format_info = ImageHelper.IMAGE_FORMATS[image_format]
+
+            # 检查文件大小（只有格式一致时才能直接使用原图）
+            current_size_kb = image_path.stat().st_size / 1024
+            same_format = image_path.suffix.lower() in (format_info['suffix'], f".{image_format}")
+
+            if same_format and current_size_kb <= max_size_kb:
+                logger.debug(f"图片已满足大小要求: {current_size_kb:.2f}KB <= {max_size_kb}KB")
+                return image_path
+
+            logger.info(f"开始压缩图片: {current_size_kb:.2f}KB -> {max_size_kb}KB ({image_format})")
+
+            data = ImageHelper.encode_to_size(image_path, max_size_kb, quality, image_format)
+            if data is None:
+                return None
+
+            # 保存压缩后的图片
+            compressed_path = image_path.parent / f"{image_path.stem}_compressed{format_info['suffix']}"
+            with open(compressed_path, 'wb') as f:
+                f.write(data)
+
+            return compressed_path
+
         except Exception as e:
             logger.error(f"压缩图片失败: {e}")
             return None
 
+    # 并发准备图片的最大线程数
+    MAX_PREPARE_WORKERS = 4
+
+    # 图床上传至少需要的剩余时间（秒），不足时直接降级为纯文字
+    MIN_UPLOAD_SECONDS = 3
+
+    # 拼图布局
+    COLLAGE_LAYOUTS = ('horizontal', 'vertical', 'overlay')
+
+    @staticmethod
+    def _resize_array(arr: np.ndarray, width: int, height: int) -> np.ndarray:
+        """缩放图片数组"""
+        img = Image.fromarray(arr).resize((max(1, width), max(1, height)), Image.Resampling.LANCZOS)
+        return np.asarray(img)
+
+    @staticmethod
+    def compose_collage(camera_path: Path, screenshot_path: Path, layout: str = 'horizontal',
+                        overlay_scale: float = 0.35, output_path: Optional[Path] = None) -> Optional[Path]:
+        """
+        将摄像头照片和缩小后的屏幕截图拼成一张图片
+
+        布局说明：
+        - horizontal: 截图缩放到与照片同高，拼在照片右侧
+        - vertical: 截图缩放到与照片同宽，拼在照片下方
+        - overlay: 截图缩放到照片宽度的 overlay_scale 倍，叠加在照片右下角（画中画）
+
+        拼图以 PNG 无损保存，发送时只进行一次有损编码
+
+        Args:
+            camera_path: 摄像头照片路径
+            screenshot_path: 屏幕截图路径
+            layout: 布局方式
+            overlay_scale: overlay 布局下截图相对照片宽度的比例
+            output_path: 输出路径，默认保存在照片同目录下
+
+        Returns:
+            拼图路径，失败返回 None
+        """
+        try:
+            if layout not in ImageHelper.COLLAGE_LAYOUTS:
+                logger.warning(f"未知的拼图布局 {layout}，使用 horizontal")
+                layout = 'horizontal'
+
+            with Image.open(camera_path) as img:
+                camera = np.asarray(img.convert('RGB'))
+            with Image.open(screenshot_path) as img:
+                screen = np.asarray(img.convert('RGB'))
+            cam_h, cam_w = camera.shape[:2]
+            scr_h, scr_w = screen.shape[:2]
+
+            if layout == 'horizontal':
+                new_w = int(scr_w * cam_h / scr_h)
+                screen = ImageHelper._resize_array(screen, new_w, cam_h)
+                canvas = np.zeros((cam_h, cam_w + screen.shape[1], 3), dtype=np.uint8)
+                canvas[:, :cam_w] = camera
+                canvas[:, cam_w:] = screen
+
+            elif layout == 'vertical':
+                new_h = int(scr_h * cam_w / scr_w)
+                screen = ImageHelper._resize_array(screen, cam_w, new_h)
+                canvas = np.zeros((cam_h + screen.shape[0], cam_w, 3), dtype=np.uint8)
+                canvas[:cam_h] = camera
+                canvas[cam_h:] = screen
+
+            else:  # overlay
+                border = 2
+                margin = max(4, cam_w // 80)
+                new_w = max(1, min(int(cam_w * overlay_scale), cam_w - 2 * (margin + border)))
+                new_h = max(1, min(int(scr_h * new_w / scr_w), cam_h - 2 * (margin + border)))
+                screen = ImageHelper._resize_array(screen, new_w, new_h)
+
+                canvas = camera.copy()
+                bottom = cam_h - margin
+                right = cam_w - margin
+                # 白色边框区分截图和照片
+                canvas[bottom - new_h - 2 * border:bottom, right - new_w - 2 * border:right] = 255
+                canvas[bottom - new_h - border:bottom - border, right - new_w - border:right - border] = screen
+
+            if output_path is None:
+                camera_path = Path(camera_path)
+                output_path = camera_path.parent / f"{camera_path.stem}_collage.png"
+
+            Image.fromarray(canvas).save(output_path, format='PNG', compress_level=1)
+            logger.info(f"拼图成功 ({layout}): {canvas.shape[1]}x{canvas.shape[0]} -> {output_path}")
+            return Path(output_path)
+
+        except Exception as e:
+            logger.error(f"拼图失败: {e}")
+            return None
+
     @staticmethod
     def image_to_base64(image_path: Path) -> Optional[str]:
         """
@@ -130,6 +393,37 @@ class ImageHelper:
             logger.error(f"图片转 Base64 失败: {e}")
             return None
 
+    @staticmethod
+    def get_uploader(imgbed: Optional[Dict] = None) -> Optional[ImageUploader]:
+        """
+        根据配置创建图床上传器
+
+        Args:
+            imgbed: 图床配置，如 {'service': 'imgbb', 'api_key': '...'}，
+                    其余字段覆盖 IMGBED_SERVICES 中的默认值；默认使用 sm.ms
+
+        Returns:
+            上传器，配置无效时返回 None
+        """
+        imgbed = dict(imgbed or {})
+        service = imgbed.pop('service', 'sm.ms')
+
+        if service not in ImageHelper.IMGBED_SERVICES:
+            logger.error(f"不支持的图床服务: {service}")
+            return None
+
+        settings = dict(ImageHelper.IMGBED_SERVICES[service])
+        settings.update({k: v for k, v in imgbed.items() if v not in (None, '')})
+
+        if settings.get('need_auth') and not settings.get('api_key'):
+            logger.warning(f"图床 {service} 需要 API Key，跳过上传")
+            return None
+        if not settings.get('url'):
+            logger.warning(f"图床 {service} 未配置上传地址，跳过上传")
+            return None
+
+        return create_uploader(service, settings)
+
     @staticmethod
     def upload_to_smms(image_path: Path) -> Optional[str]:
         """
@@ -141,40 +435,140 @@ class ImageHelper:
         Returns:
             图片 URL
         """
+        uploader = ImageHelper.get_uploader({'service': 'sm.ms'})
+        return uploader.upload(Path(image_path)) if uploader else None
+
+    @staticmethod
+    def upload_images(image_paths: List[Path], imgbed: Optional[Dict] = None,
+                      deadline: Optional[Deadline] = None) -> List[Optional[str]]:
+        """
+        并发上传多张图片到图床
+
+        Args:
+            image_paths: 图片路径列表
+            imgbed: 图床配置，参见 get_uploader
+            deadline: 截止时间，请求超时和重试不超过剩余时间
+
+        Returns:
+            与输入顺序一致的 URL 列表，失败项为 None
+        """
+        uploader = ImageHelper.get_uploader(imgbed)
+        if uploader is None:
+            return [None] * len(image_paths)
+
+        return uploader.upload_many([Path(p) for p in image_paths], deadline=deadline)
+
+    @staticmethod
+    def split_base64_budget(total_chars: int, weights: List[float]) -> List[float]:
+        """
+        按权重把 Base64 字符预算分配给各张图片
+
+        Base64 每 4 个字符对应 3 个字节，分配结果向下取整到完整的 4 字符块，
+        保证各图片编码后的字符总数不超过 total_chars。
+
+        Args:
+            total_chars: 可用于图片的 Base64 字符总数
+            weights: 每张图片的权重（非正数按 0 处理）
+
+        Returns:
+            每张图片允许的最大原始大小（KB），预算不足时对应项为 0
+        """
+        if not weights:
+            return []
+
+        weights = [max(0.0, float(w)) for w in weights]
+        total_weight = sum(weights)
+        if total_chars <= 0 or total_weight <= 0:
+            return [0.0] * len(weights)
+
+        sizes_kb = []
+        for weight in weights:
+            share_chars = int(total_chars * weight / total_weight)
+            max_bytes = (share_chars // 4) * 3
+            sizes_kb.append(max_bytes / 1024)
+
+        return sizes_kb
+
+    @staticmethod
+    def _prepare_base64_image(image_path: Path, max_size_kb: float, image_format: str,
+                              deadline: Optional[Deadline] = None) -> Dict:
+        """
+        准备单张 Base64 图片（在内存中编码，不产生临时文件）
+
+        Returns:
+            结果字典，包含 path/base64/size_kb/elapsed/error
+        """
+        result = {'path': image_path, 'base64': None, 'size_kb': 0.0, 'elapsed': 0.0, 'error': None}
+        start = time.perf_counter()
+
         try:
-            logger.info(f"正在上传图片到 SM.MS: {image_path.name}")
+            if max_size_kb <= 0:
+                result['error'] = "图片预算不足"
+                return result
 
-            with open(image_path, 'rb') as f:
-                files = {'smfile': f}
-                response = requests.post(
-                    'https://sm.ms/api/v2/upload',
-                    files=files,
-                    timeout=30
-                )
-
-            result = response.json()
-
-            if result.get('success'):
-                url = result['data']['url']
-                logger.info(f"上传成功: {url}")
-                return url
+            image_path = Path(image_path)
+            format_info = ImageHelper.IMAGE_FORMATS[image_format]
+            same_format = image_path.suffix.lower() in (format_info['suffix'], f".{image_format}")
+
+            # 原图格式一致且足够小时直接使用，避免重新编码
+            if same_format and image_path.stat().st_size / 1024 <= max_size_kb:
+                data = image_path.read_bytes()
             else:
-                error_msg = result.get('message', '未知错误')
-                # 如果是已存在的图片，返回已有的URL
-                if result.get('code') == 'image_repeated':
-                    url = result['images']
-                    logger.info(f"图片已存在，使用已有URL: {url}")
-                    return url
-                else:
-                    logger.error(f"上传失败: {error_msg}")
-                    return None
+                data = ImageHelper.encode_to_size(image_path, max_size_kb, image_format=image_format,
+                                                  deadline=deadline)
+
+            if data is None:
+                result['error'] = f"无法压缩到 {max_size_kb:.2f}KB 以下"
+                return result
+
+            result['base64'] = base64.b64encode(data).decode('utf-8')
+            result['size_kb'] = len(data) / 1024
 
         except Exception as e:
-            logger.error(f"上传到 SM.MS 失败: {e}")
-            return None
+            result['error'] = str(e)
+
+        finally:
+            result['elapsed'] = time.perf_counter() - start
+
+        return result
+
+    @staticmethod
+    def prepare_base64_images(image_paths: List[Path], size_limits: List[float], image_format: str = 'jpeg',
+                              max_workers: Optional[int] = None, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """
+        并发准备多张 Base64 图片
+
+        Pillow 编码时会释放 GIL，使用有界线程池即可并行利用多核
+
+        Args:
+            image_paths: 图片路径列表
+            size_limits: 每张图片的最大大小（KB）
+            image_format: 编码格式
+            max_workers: 最大线程数，默认不超过 CPU 核数和 MAX_PREPARE_WORKERS
+            deadline: 截止时间，超时后降级为最小分辨率
+
+        Returns:
+            与输入顺序一致的结果列表，每项包含 path/base64/size_kb/elapsed/error
+        """
+        if not image_paths:
+            return []
+
+        if max_workers is None:
+            max_workers = min(len(image_paths), os.cpu_count() or 1, ImageHelper.MAX_PREPARE_WORKERS)
+
+        if max_workers <= 1:
+            return [ImageHelper._prepare_base64_image(path, limit, image_format, deadline)
+                    for path, limit in zip(image_paths, size_limits)]
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-prep') as executor:
+            futures = [executor.submit(ImageHelper._prepare_base64_image, path, limit, image_format, deadline)
+                       for path, limit in zip(image_paths, size_limits)]
+            return [future.result() for future in futures]
 
     @staticmethod
-    def prepare_images_for_notification(image_paths: List[Path], max_size_kb: int = 100) -> Tuple[str, List[str]]:
+    def prepare_images_for_notification(image_paths: List[Path], max_size_kb: Union[float, List[float]] = 100,
+                                        image_format: str = 'jpeg', imgbed: Optional[Dict] = None,
+                                        deadline: Optional[Deadline] = None) -> Tuple[str, List[str]]:
         """
         准备图片用于通知（混合智能降级方案）
 
@@ -185,7 +579,10 @@ class ImageHelper:
 
         Args:
             image_paths: 图片路径列表
-            max_size_kb: Base64 编码的最大图片大小（KB）
+            max_size_kb: Base64 编码的最大图片大小（KB），也可以为每张图片单独指定
+            image_format: Base64 图片的编码格式（jpeg/webp/avif）
+            imgbed: 图床配置，默认使用 sm.ms
+            deadline: 截止时间，时间不足时缩小图片或跳过图床上传
 
         Returns:
             (方式, 数据列表) - 方式可以是 'base64', 'url', 'text'
@@ -193,51 +590,38 @@ class ImageHelper:
         if not image_paths:
             return ('text', [])
 
-        # 方案1：尝试 Base64（适合小图片）
-        logger.info("尝试方案1: Base64 编码...")
-        base64_list = []
-        all_small_enough = True
-
-        for img_path in image_paths:
-            # 尝试压缩
-            compressed_path = ImageHelper.compress_image(img_path, max_size_kb=max_size_kb)
-
-            if compressed_path:
-                base64_str = ImageHelper.image_to_base64(compressed_path)
-                if base64_str:
-                    base64_list.append(base64_str)
-                else:
-                    all_small_enough = False
-                    break
-
-                # 删除临时压缩文件
-                if compressed_path != img_path:
-                    try:
-                        compressed_path.unlink()
-                    except:
-                        pass
-            else:
-                all_small_enough = False
-                break
+        if isinstance(max_size_kb, (list, tuple)):
+            size_limits = list(max_size_kb)
+        else:
+            size_limits = [max_size_kb] * len(image_paths)
+
+        # 方案1：尝试 Base64（适合小图片），各图片并发编码
+        logger.info(f"尝试方案1: Base64 编码 ({image_format})...")
+        results = ImageHelper.prepare_base64_images(image_paths, size_limits, image_format=image_format,
+                                                    deadline=deadline)
+
+        for item in results:
+            if item['error']:
+                logger.warning(f"图片 Base64 准备失败: {Path(item['path']).name}, {item['error']}")
 
-        if all_small_enough and base64_list:
+        if all(item['base64'] for item in results):
+            base64_list = [item['base64'] for item in results]
             logger.info(f"方案1成功: 使用 Base64 编码 ({len(base64_list)} 张图片)")
             return ('base64', base64_list)
 
-        # 方案2：尝试上传图床
+        # 方案2：尝试上传图床（并发上传），剩余时间不够一次上传时直接降级
+        if deadline and not deadline.has(ImageHelper.MIN_UPLOAD_SECONDS):
+            logger.warning("剩余时间不足，跳过图床上传，降级到方案3: 仅文字通知")
+            return ('text', [])
+
         logger.info("方案1失败，尝试方案2: 上传图床...")
-        url_list = []
+        url_list = ImageHelper.upload_images(image_paths, imgbed, deadline=deadline)
 
-        for img_path in image_paths:
-            url = ImageHelper.upload_to_smms(img_path)
-            if url:
-                url_list.append(url)
-            else:
-                # 上传失败，降级到方案3
-                logger.warning(f"图片上传失败: {img_path.name}")
-                break
+        for img_path, url in zip(image_paths, url_list):
+            if not url:
+                logger.warning(f"图片上传失败: {Path(img_path).name}")
 
-        if len(url_list) == len(image_paths):
+        if url_list and all(url_list):
             logger.info(f"方案2成功: 使用图床 URL ({len(url_list)} 张图片)")
             return ('url', url_list)
 
@@ -253,6 +637,41 @@ class ImageHelper:
         except:
             return 0.0
 
+    @staticmethod
+    def describe_image(image_path: Path) -> Optional[Dict]:
+        """
+        读取图片文件的元数据（写入 capture_images 表）
+
+        只解析图片头获取尺寸，不解码像素
+
+        Args:
+            image_path: 图片路径
+
+        Returns:
+            {'path', 'byte_size', 'width', 'height', 'content_hash'}，失败返回 None
+        """
+        try:
+            image_path = Path(image_path)
+            digest = hashlib.sha256()
+            with open(image_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+
+            with Image.open(image_path) as img:
+                width, height = img.size
+
+            return {
+                'path': str(image_path),
+                'byte_size': image_path.stat().st_size,
+                'width': width,
+                'height': height,
+                'content_hash': digest.hexdigest()
+            }
+
+        except Exception as e:
+            logger.warning(f"读取图片信息失败: {image_path}, 错误: {e}")
+            return None
+
 
 if __name__ == '__main__':
     # 测试图片处理功能
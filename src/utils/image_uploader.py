@@ -0,0 +1,253 @@
+"""
+图床上传模块
+统一封装 SM.MS、imgbb 和通用 HTTP 上传目标
+使用共享连接池会话，支持并发上传和按服务配置的重试退避
+"""
+
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from .deadline import Deadline, remaining_timeout
+from .http_session import get_session
+from .logger import Logger
+
+logger = Logger()
+
+
+class ImageUploader(ABC):
+    """图床上传器基类"""
+
+    # 可以重试的 HTTP 状态码
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, name: str, url: str, method: str = 'POST', file_field: str = 'file',
+                 api_key: str = '', retries: int = 2, backoff: float = 1.0, timeout: float = 30,
+                 **options):
+        """
+        初始化上传器
+
+        Args:
+            name: 服务名称
+            url: 上传地址
+            method: 请求方法（POST/PUT）
+            file_field: multipart 上传时的文件字段名
+            api_key: API Key（部分服务需要）
+            retries: 失败后的重试次数
+            backoff: 首次重试等待秒数，之后每次翻倍
+            timeout: 单次请求超时（秒）
+            options: 服务特定的其它配置
+        """
+        self.name = name
+        self.url = url
+        self.method = method.upper()
+        self.file_field = file_field
+        self.api_key = api_key
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.timeout = timeout
+        self.options = options
+
+    def _send_request(self, image_path: Path, timeout: float) -> requests.Response:
+        """发送上传请求（multipart 表单）"""
+        with open(image_path, 'rb') as f:
+            files = {self.file_field: (image_path.name, f)}
+            return get_session().request(self.method, self.url, files=files, timeout=timeout)
+
+    @abstractmethod
+    def _parse_response(self, response: requests.Response) -> Optional[str]:
+        """从响应中解析图片 URL，子类实现"""
+
+    def upload(self, image_path: Path, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """
+        上传单张图片（失败时按退避策略重试）
+
+        Args:
+            image_path: 图片路径
+            deadline: 截止时间，单次超时不超过剩余时间，剩余时间不够退避等待时不再重试
+
+        Returns:
+            图片 URL，失败返回 None
+        """
+        image_path = Path(image_path)
+
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                delay = self.backoff * (2 ** (attempt - 1))
+                if deadline and not deadline.has(delay + Deadline.MIN_TIMEOUT):
+                    logger.warning(f"{self.name} 剩余时间不足，停止重试")
+                    return None
+                logger.info(f"{self.name} 上传重试 ({attempt}/{self.retries})，等待 {delay:.1f} 秒...")
+                time.sleep(delay)
+
+            try:
+                logger.info(f"正在上传图片到 {self.name}: {image_path.name}")
+                response = self._send_request(image_path, remaining_timeout(deadline, self.timeout))
+
+                if response.status_code in self.RETRY_STATUS_CODES:
+                    logger.warning(f"{self.name} 上传失败: HTTP {response.status_code}")
+                    continue
+
+                url = self._parse_response(response)
+                if url:
+                    logger.info(f"上传成功: {url}")
+                    return url
+
+                # 服务端明确拒绝，重试没有意义
+                return None
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logger.warning(f"{self.name} 上传网络异常: {e}")
+            except Exception as e:
+                logger.error(f"上传到 {self.name} 失败: {e}")
+                return None
+
+        logger.error(f"上传到 {self.name} 失败: 已重试 {self.retries} 次")
+        return None
+
+    def upload_many(self, image_paths: List[Path], max_workers: int = 4,
+                    deadline: Optional[Deadline] = None) -> List[Optional[str]]:
+        """
+        并发上传多张图片
+
+        Args:
+            image_paths: 图片路径列表
+            max_workers: 最大并发数
+            deadline: 截止时间
+
+        Returns:
+            与输入顺序一致的 URL 列表，失败项为 None
+        """
+        if not image_paths:
+            return []
+
+        workers = max(1, min(max_workers, len(image_paths)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-upload') as executor:
+            return list(executor.map(lambda path: self.upload(path, deadline), image_paths))
+
+
+class SmmsUploader(ImageUploader):
+    """SM.MS 图床上传器"""
+
+    def _send_request(self, image_path: Path, timeout: float) -> requests.Response:
+        headers = {'Authorization': self.api_key} if self.api_key else None
+        with open(image_path, 'rb') as f:
+            files = {self.file_field: (image_path.name, f)}
+            return get_session().request(self.method, self.url, files=files,
+                                         headers=headers, timeout=timeout)
+
+    def _parse_response(self, response: requests.Response) -> Optional[str]:
+        result = response.json()
+
+        if result.get('success'):
+            return result['data']['url']
+
+        # 如果是已存在的图片，返回已有的URL
+        if result.get('code') == 'image_repeated':
+            url = result['images']
+            logger.info(f"图片已存在，使用已有URL: {url}")
+            return url
+
+        logger.error(f"上传失败: {result.get('message', '未知错误')}")
+        return None
+
+
+class ImgbbUploader(ImageUploader):
+    """imgbb 图床上传器"""
+
+    def _send_request(self, image_path: Path, timeout: float) -> requests.Response:
+        with open(image_path, 'rb') as f:
+            files = {self.file_field: (image_path.name, f)}
+            return get_session().request(self.method, self.url, params={'key': self.api_key},
+                                         files=files, timeout=timeout)
+
+    def _parse_response(self, response: requests.Response) -> Optional[str]:
+        result = response.json()
+
+        if result.get('success'):
+            return result['data']['url']
+
+        error = result.get('error', {})
+        logger.error(f"上传失败: {error.get('message', '未知错误') if isinstance(error, dict) else error}")
+        return None
+
+
+class HttpUploader(ImageUploader):
+    """
+    通用 HTTP 上传器
+
+    - POST: multipart 表单上传，文件字段为 file_field
+    - PUT: 请求体为图片原始字节
+    - url 可以包含 {filename} 占位符
+    - 返回地址从 JSON 响应的 url_field（支持 a.b.c 路径）读取，
+      或使用 public_url 模板（同样支持 {filename}）
+    """
+
+    def _target_url(self, image_path: Path) -> str:
+        return self.url.replace('{filename}', image_path.name)
+
+    def _send_request(self, image_path: Path, timeout: float) -> requests.Response:
+        headers = dict(self.options.get('headers') or {})
+        if self.api_key:
+            headers.setdefault('Authorization', self.api_key)
+
+        target = self._target_url(image_path)
+        if self.method == 'PUT':
+            return get_session().put(target, data=image_path.read_bytes(),
+                                     headers=headers, timeout=timeout)
+
+        with open(image_path, 'rb') as f:
+            files = {self.file_field: (image_path.name, f)}
+            return get_session().request(self.method, target, files=files,
+                                         headers=headers, timeout=timeout)
+
+    def _parse_response(self, response: requests.Response) -> Optional[str]:
+        if not response.ok:
+            logger.error(f"上传失败: HTTP {response.status_code}")
+            return None
+
+        public_url = self.options.get('public_url')
+        if public_url:
+            filename = Path(requests.utils.urlparse(response.request.url).path).name
+            return public_url.replace('{filename}', filename)
+
+        url_field = self.options.get('url_field', 'url')
+        value: Any = response.json()
+        for key in url_field.split('.'):
+            if not isinstance(value, dict) or key not in value:
+                logger.error(f"上传失败: 响应中没有 {url_field} 字段")
+                return None
+            value = value[key]
+
+        return str(value) if value else None
+
+
+# 服务名称到上传器类的映射
+UPLOADER_CLASSES = {
+    'sm.ms': SmmsUploader,
+    'imgbb': ImgbbUploader,
+    'http': HttpUploader
+}
+
+
+def create_uploader(service: str, settings: Dict) -> ImageUploader:
+    """
+    创建上传器
+
+    Args:
+        service: 服务名称（sm.ms/imgbb/http）
+        settings: 合并后的服务配置
+
+    Returns:
+        上传器实例
+    """
+    uploader_class = UPLOADER_CLASSES.get(service)
+    if uploader_class is None:
+        raise ValueError(f"不支持的图床服务: {service}")
+
+    settings = {k: v for k, v in settings.items() if k != 'need_auth'}
+    return uploader_class(name=service, **settings)
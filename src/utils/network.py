@@ -0,0 +1,176 @@
+"""
+网络就绪检测模块
+唤醒后网卡重新连接需要时间，在发送通知前用轻量探测等待网络可用
+"""
+
+import time
+import queue
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from .logger import Logger
+
+logger = Logger()
+
+# 用于检测默认路由的公网地址（UDP connect 不会发送数据包），IPv4 不可用时尝试 IPv6
+ROUTE_PROBE_ADDRESSES = (('223.5.5.5', 53), ('2400:3200::1', 53))
+
+
+def parse_probe_address(value: str) -> Tuple[str, int]:
+    """
+    解析探测地址配置
+
+    Args:
+        value: IP 地址，可带端口，如 '1.1.1.1'、'1.1.1.1:53'、'[2606:4700::1111]:53'
+
+    Returns:
+        (地址, 端口)，未指定端口时为 53
+    """
+    value = value.strip()
+    if value.startswith('['):
+        host, _, port = value[1:].partition(']')
+        return host, int(port.lstrip(':') or 53)
+    if value.count(':') == 1:
+        host, port = value.split(':')
+        return host, int(port)
+    return value, 53
+
+
+def has_route(addresses: Optional[Sequence[Tuple[str, int]]] = None) -> bool:
+    """
+    检查是否存在可用的网络路由（网卡已连接并获得地址）
+
+    依次尝试各探测地址，任一地址族有路由即可
+
+    Args:
+        addresses: 探测地址列表，默认为 ROUTE_PROBE_ADDRESSES
+
+    Returns:
+        是否有路由
+    """
+    for host, port in addresses or ROUTE_PROBE_ADDRESSES:
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        try:
+            with socket.socket(family, socket.SOCK_DGRAM) as sock:
+                sock.connect((host, port))
+                local_ip = sock.getsockname()[0]
+        except OSError:
+            continue
+
+        if family == socket.AF_INET and not local_ip.startswith('0.'):
+            return True
+        if family == socket.AF_INET6 and local_ip not in ('::', '::1') and not local_ip.startswith('fe80'):
+            return True
+
+    return False
+
+
+class _Resolver:
+    """
+    单线程域名解析器
+
+    getaddrinfo 本身不支持超时，解析在一个常驻的守护线程中执行，调用方限时等待结果；
+    同一域名的解析还没返回时复用它的结果，不会重复排队
+    """
+
+    def __init__(self):
+        self._queue: 'queue.Queue[Tuple[str, Future]]' = queue.Queue()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, host: str) -> Future:
+        """提交解析请求，返回结果为是否解析成功的 Future"""
+        with self._lock:
+            future = self._pending.get(host)
+            if future is not None:
+                return future
+
+            future = Future()
+            self._pending[host] = future
+            self._queue.put((host, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dns-probe', daemon=True)
+                self._thread.start()
+            return future
+
+    def _run(self):
+        while True:
+            host, future = self._queue.get()
+            try:
+                socket.getaddrinfo(host, None)
+                resolved = True
+            except OSError:
+                resolved = False
+
+            with self._lock:
+                self._pending.pop(host, None)
+            future.set_result(resolved)
+
+
+_resolver = _Resolver()
+
+
+def resolve_host(host: str, timeout: float) -> bool:
+    """
+    在限定时间内解析域名
+
+    Args:
+        host: 域名
+        timeout: 超时（秒）
+
+    Returns:
+        是否解析成功
+    """
+    try:
+        return _resolver.submit(host).result(timeout)
+    except FutureTimeoutError:
+        return False
+
+
+def wait_for_network(url_or_host: str, budget: float = 20, probe_timeout: float = 1.0,
+                     interval: float = 0.25, probe_addresses: Optional[Sequence[str]] = None) -> bool:
+    """
+    等待网络可用（有路由且能解析目标域名）
+
+    网络已就绪时立即返回；否则以短超时反复探测，直到成功或用完预算
+
+    Args:
+        url_or_host: 目标 URL 或域名
+        budget: 最长等待时间（秒），0 表示只探测一次
+        probe_timeout: 单次 DNS 探测超时（秒）
+        interval: 探测失败后的间隔（秒）
+        probe_addresses: 检测路由的地址（见 parse_probe_address），默认为 ROUTE_PROBE_ADDRESSES
+
+    Returns:
+        网络是否可用
+    """
+    host: Optional[str] = urlparse(url_or_host).hostname if '://' in url_or_host else url_or_host
+    if not host:
+        return True
+
+    addresses = [parse_probe_address(value) for value in probe_addresses or []]
+
+    start = time.monotonic()
+    deadline = start + max(0.0, budget)
+    attempts = 0
+
+    while True:
+        attempts += 1
+        remaining = deadline - time.monotonic()
+
+        if has_route(addresses) and resolve_host(host, max(0.05, min(probe_timeout, remaining))):
+            elapsed = time.monotonic() - start
+            if attempts > 1:
+                logger.info(f"网络已就绪: {host} (等待 {elapsed:.2f} 秒, 探测 {attempts} 次)")
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning(f"等待网络超时: {host} ({budget} 秒内未就绪)")
+            return False
+
+        time.sleep(min(interval, remaining))